@@ -1,400 +1,522 @@
+import logging
+import os
+
 import dash
-from dash import Dash, dcc, html, dash_table, Input, Output, State
-import plotly.express as px
+from dash import ClientsideFunction, Dash, DiskcacheManager, dcc, html, dash_table, Input, Output, State, no_update
+import diskcache
+from dash.exceptions import MissingCallbackContextException, PreventUpdate
+from flask import Response, abort, jsonify, request
+from flask_caching import Cache
 import pandas as pd
 
-# --- Lettura dei dati ---
-df_iniziative = pd.read_excel("Partecipate Brescia copia.xlsx", sheet_name="Attività generali")
-df_composizione = pd.read_excel("Partecipate Brescia copia.xlsx", sheet_name="Genere nelle aziende ")
-
-# Pulizia minima: rimuove spazi indesiderati
-df_iniziative["Nome azienda"] = df_iniziative["Nome azienda"].str.strip()
-df_composizione["Nome azienda"] = df_composizione["Nome azienda"].str.strip()
-
-# --- Funzione per creare le opzioni dei dropdown ---
-def crea_opzioni(colonna, df):
-    valori = sorted(df[colonna].dropna().unique())
-    return [{"label": "Tutti", "value": "all"}] + [{"label": str(val), "value": val} for val in valori]
-
-# Dropdown comuni per le sezioni relative a df_iniziative
-opzioni_anno = crea_opzioni("Anno", df_iniziative)
-opzioni_azienda = crea_opzioni("Nome azienda", df_iniziative)
-opzioni_area = crea_opzioni("Area Prassi", df_iniziative)
-opzioni_categoria = crea_opzioni("Categoria di diversità", df_iniziative)
-
-# Dropdown per la sezione Composizione di Genere (basati su df_composizione)
-opzioni_anno_genere = crea_opzioni("Anno", df_composizione)
-opzioni_azienda_genere = crea_opzioni("Nome azienda", df_composizione)
-opzioni_posizione_genere = crea_opzioni("Posizione", df_composizione)
-
-# Palette personalizzata
-PALETTE = ["#c0c0c0", "#c10a13"]
-
-# --- Funzione per calcolare il D&I Index per ciascuna azienda ---
-# --- Nuova funzione per calcolare i 3 indici e quello finale ---
-def calcola_tre_indici(df_iniziative, df_genere):
-    # -------- indice iniziative ----------
-    n_iniziative = df_iniziative.groupby("Nome azienda")["Titolo dell'attività"].count()
-    min_iniz, max_iniz = n_iniziative.min(), n_iniziative.max()
-    indice_iniziative = (
-        ((n_iniziative - min_iniz) / (max_iniz - min_iniz)) * 100
-        if max_iniz != min_iniz else 0
-    )
+from dati import COLONNA_SORGENTE, memoria_dataframe
+from esportazione import FORMATI, esporta
+from grafici import (
+    COLORE_DONNE, COLORE_UOMINI, barre, barre_raggruppate, figura_in_cache, figura_vuota, linea, linee,
+    template_ridotto, torta
+)
+from indici import indici_per_anno, tre_indici
+from interrogazioni import (
+    iniziative_per_anno, medie_genere, numero_aziende, numero_iniziative, righe_per, totali_genere
+)
+from metriche import fase, memoria_processo, strumenta_app
+from ricarica import INTERVALLO_RICARICA, GestoreDati
+from filtri import maschera_valori, valori_filtro
+from tabelle import applica_filter_query, pagina_tabella
 
-    # -------- indice categorie ----------
-    categorie_rilevanti = ["Genere", "Età", "Disabilità", "Cultura", "LGBTQI+"]
-    def _idx_cat(gruppo):
-    # quante delle categorie_rilevanti compaiono almeno una volta?
-        presenti = (
-         gruppo.loc[gruppo["Categoria di diversità"].isin(categorie_rilevanti),
-                    "Categoria di diversità"]
-            .unique()
-      )
-        return (len(presenti) / len(categorie_rilevanti)) * 100
-    indice_categorie = df_iniziative.groupby("Nome azienda").apply(_idx_cat)
-
-
-    # -------- indice parità di genere ----------
-    df_board = df_genere[df_genere["Posizione"] == "Board"].copy()      # <‑‑ usa df_genere!
-    # conversione robusta: funziona sia se sono stringhe "42%" sia se sono già numeri 42/0.42
-    df_board["Percentuale donne"] = (
-        pd.to_numeric(
-            df_board["Percentuale donne"].astype(str).str.replace('%', ''),
-            errors="coerce"
-        )
-    )
-    # se Excel restituisce 0–1 anziché 0–100 trasformo
-    if df_board["Percentuale donne"].max() <= 1:
-        df_board["Percentuale donne"] *= 100
-
-    def _idx_parita(gruppo):
-        perc = gruppo["Percentuale donne"].mean()
-        return 100 - abs(50 - perc) * 2        # 50 → 100, 0/100 → 0
-
-    indice_parita_genere = df_board.groupby("Nome azienda").apply(_idx_parita)
-
-    # -------- unisco tutto ----------
-    risultati = (
-        pd.DataFrame({
-            "Indice iniziative": indice_iniziative,
-            "Indice categorie": indice_categorie,
-            "Indice parità genere": indice_parita_genere,
-        })
-        .fillna(0)
-        .reset_index(names="Nome azienda")      # così il nome della colonna è esplicito
-    )
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+# --- Lettura dei dati ---
+# Il workbook viene letto da Excel solo quando cambia; negli altri avvii i due fogli
+# arrivano dallo snapshot colonnare in .snapshot/ (vedi dati.py). Con DASHBOARD_DATASET
+# i dati sono invece le partizioni di più workbook scritte da ingestione.py, e ogni
+# sezione ha un filtro per sorgente (nascosto se la sorgente è una sola). I dati, gli indici di
+# filtro, il cubo della Panoramica e le opzioni dei dropdown stanno in una VersioneDati
+# che viene sostituita quando il workbook cambia (vedi ricarica.py): le callback la
+# leggono da gestore_dati.corrente, una volta per chiamata.
+gestore_dati = GestoreDati()
 
-    risultati["Indice diversità finale"] = risultati[
-        ["Indice iniziative", "Indice categorie", "Indice parità genere"]
-    ].mean(axis=1)
+# Esecuzione clientside: Panoramica e grafici delle iniziative vengono ricalcolati nel
+# browser dal cubo spedito una volta in store-cubo (assets/dashboard.js).
+# Con DASHBOARD_CLIENTSIDE=0 si torna alle callback lato server.
+ESECUZIONE_CLIENTSIDE = os.environ.get("DASHBOARD_CLIENTSIDE", "1") == "1"
 
-    return risultati
+# Esecuzione in background del D&I Index: la callback gira in un processo figlio gestito
+# da Dash (risultati e avanzamento passano da una cache diskcache su disco), così il
+# worker gunicorn resta libero per le altre schede mentre il calcolo è in corso.
+# Con DASHBOARD_BACKGROUND=0 la callback torna sincrona.
+ESECUZIONE_BACKGROUND = os.environ.get("DASHBOARD_BACKGROUND", "1") == "1"
 
+# Indici selezionabili nel grafico dell'andamento negli anni
+INDICI_ANDAMENTO = ["Indice diversità finale", "Indice iniziative", "Indice categorie", "Indice parità genere"]
 
+# Passi del calcolo del D&I Index mostrati nella barra di avanzamento
+PASSI_INDICE = 3
 
+# --- Grafici dei singoli indici (calcolati in indici.py) ---
 def crea_grafici_indici(risultati):
-    fig_iniziative = px.bar(
-        risultati,
-        x="Nome azienda",
-        y="Indice iniziative",
-        title="Indice Iniziative (0–100)",
-        color="Indice iniziative",
-        color_continuous_scale=PALETTE
+    fig_iniziative = figura_in_cache(
+        barre, risultati[["Nome azienda", "Indice iniziative"]],
+        "Nome azienda", "Indice iniziative", "Indice Iniziative (0–100)"
     )
-    fig_iniziative.update_layout(plot_bgcolor="#f7f7f7", paper_bgcolor="#f7f7f7", font_color="#080808")
-
-    fig_categorie = px.bar(
-        risultati,
-        x="Nome azienda",
-        y="Indice categorie",
-        title="Indice Categorie (0–100)",
-        color="Indice categorie",
-        color_continuous_scale=PALETTE
+    fig_categorie = figura_in_cache(
+        barre, risultati[["Nome azienda", "Indice categorie"]],
+        "Nome azienda", "Indice categorie", "Indice Categorie (0–100)"
     )
-    fig_categorie.update_layout(plot_bgcolor="#f7f7f7", paper_bgcolor="#f7f7f7", font_color="#080808")
-
-    fig_parita = px.bar(
-        risultati,
-        x="Nome azienda",
-        y="Indice parità genere",
-        title="Indice Parità di Genere (0–100)",
-        color="Indice parità genere",
-        color_continuous_scale=PALETTE
+    fig_parita = figura_in_cache(
+        barre, risultati[["Nome azienda", "Indice parità genere"]],
+        "Nome azienda", "Indice parità genere", "Indice Parità di Genere (0–100)"
     )
-    fig_parita.update_layout(plot_bgcolor="#f7f7f7", paper_bgcolor="#f7f7f7", font_color="#080808")
-
-    fig_media = px.bar(
-        risultati,
-        x="Nome azienda",
-        y="Indice diversità finale",
-        title="Indice Diversità Finale (Media dei tre indici)",
-        color="Indice diversità finale",
-        color_continuous_scale=PALETTE
+    fig_media = figura_in_cache(
+        barre, risultati[["Nome azienda", "Indice diversità finale"]],
+        "Nome azienda", "Indice diversità finale", "Indice Diversità Finale (Media dei tre indici)"
     )
-    fig_media.update_layout(plot_bgcolor="#f7f7f7", paper_bgcolor="#f7f7f7", font_color="#080808")
-
     return fig_iniziative, fig_categorie, fig_parita, fig_media
 
 # --- Creazione dell'app Dash ---
-app = Dash(__name__)
+gestore_background = None
+if ESECUZIONE_BACKGROUND:
+    gestore_background = DiskcacheManager(
+        diskcache.Cache(os.environ.get("DASHBOARD_BACKGROUND_DIR", ".cache-background"))
+    )
+# Compressione delle risposte (zstd/brotli/gzip secondo Accept-Encoding, con flask-compress):
+# JSON delle callback, layout e asset. DASHBOARD_COMPRESS=0 la disattiva.
+COMPRESSIONE = os.environ.get("DASHBOARD_COMPRESS", "1") == "1"
+app = Dash(__name__, background_callback_manager=gestore_background, compress=COMPRESSIONE)
 server = app.server
 
-app.layout = html.Div([
-    dcc.Tabs(id="tabs", value="tab-introduzione", children=[
-        # Tab Panoramica
-        # ---------- TAB INTRODUZIONE (sostituisci tutta la tua versione con questa) ----------
-dcc.Tab(
-    label="Introduzione",
-    value="tab-introduzione",
-    children=[
-        html.Div(
-            [
-                # ---------- intestazione rossa ----------
-                html.Div(
-                    html.H1(
-                        "Dashboard D&I - Metodo e Fonti",
-                        style={"margin": "0", "padding": "20px", "color": "#ffffff"},
-                    ),
-                    style={"backgroundColor": "#c10b13", "textAlign": "center"},
-                ),
+# Tempi per fase e dimensione delle risposte di ogni callback, esposti su /metrics
+strumenta_app(app)
 
-                # ---------- contenuto bianco ----------
-                html.Div(
-                    [
-                        html.H2("Metodo", style={"color": "#080808"}),
-
-                        html.P(
-                            "Questa Dashboard è stata realizzata con l'obiettivo di analizzare e "
-                            "visualizzare le iniziative in ambito Diversity & Inclusion promosse "
-                            "dalle aziende partecipate del Comune di Brescia. I dati sono stati "
-                            "raccolti, aggregati e analizzati a partire da fonti ufficiali, con "
-                            "particolare attenzione alla presenza di attività concrete, pratiche "
-                            "inclusive e alla composizione di genere nei ruoli aziendali.",
-                            style={
-                                "fontSize": "16px",
-                                "lineHeight": "1.6",
-                                "color": "#080808",
-                            },
-                        ),
-
-                        html.P(
-                            "La costruzione degli indicatori sintetici (D&I Index) si basa su tre "
-                            "dimensioni principali:",
-                            style={
-                                "fontSize": "16px",
-                                "lineHeight": "1.6",
-                                "color": "#080808",
-                            },
-                        ),
-
-                        # elenco puntato delle tre componenti
-                        html.Ul(
-                            [
-                                html.Li(
-                                    [
-                                        html.B("Indice Iniziative – "),
-                                        "numero totale di iniziative promosse da ogni azienda.",
-                                    ]
-                                ),
-                                html.Li(
-                                    [
-                                        html.B("Indice Categorie – "),
-                                        "copertura delle sette categorie di diversità considerate "
-                                        "(Genere, Età, Disabilità, LGBTQI+, Religione e credo, Etnia, e infine attività generali (Cultura)); l’azienda ottiene "
-                                        "il 100 % solo se ha almeno un’iniziativa per ciascuna categoria.",
-                                    ]
-                                ),
-                                html.Li(
-                                    [
-                                        html.B("Indice Parità di Genere – "),
-                                        "distanza dall’equilibrio 50 / 50 nella composizione del Board "
-                                        "aziendale, rimappata su una scala 0‑100.",
-                                    ]
-                                ),
-                            ],
-                            style={
-                                "fontSize": "16px",
-                                "lineHeight": "1.6",
-                                "color": "#080808",
-                                "marginLeft": "20px",
-                            },
-                        ),
-
-                        html.P(
-                            "La media dei tre punteggi, normalizzati su scala 0‑100, restituisce "
-                            "il valore finale del D&I Index, che permette il confronto omogeneo tra aziende.",
-                            style={
-                                "fontSize": "16px",
-                                "lineHeight": "1.6",
-                                "color": "#080808",
-                            },
-                        ),
-
-                        # ---------- fonti dei dati ----------
-                        html.H2("Fonti dei Dati", style={"color": "#080808", "marginTop": "30px"}),
-                        html.Ul(
-                            [
-                                html.Li("Bilanci di sostenibilità delle aziende partecipate"),
-                                html.Li("Siti istituzionali e documentazione pubblica delle aziende"),
-                                html.Li("Database Orbis (Bureau van Dijk) per informazioni anagrafiche e di governance"),
-                            ],
-                            style={"fontSize": "16px", "color": "#080808"},
-                        ),
-
-                        html.P(
-                            "I dati sono stati raccolti ed elaborati manualmente con un processo di "
-                            "verifica incrociata, per garantire la coerenza e l'affidabilità delle "
-                            "informazioni visualizzate.",
-                            style={
-                                "fontSize": "16px",
-                                "lineHeight": "1.6",
-                                "color": "#080808",
-                            },
-                        ),
-                    ],
-                    style={"padding": "30px"},
-                ),
+# Il controllo del workbook parte alla prima richiesta di ogni processo (dopo il fork)
+server.before_request(gestore_dati.avvia)
+
+# --- Cache dei risultati del D&I Index ---
+# Backend su filesystem: la stessa cartella è condivisa da tutti i worker gunicorn (e dai
+# processi delle callback in background). Le chiavi contengono l'impronta dei dati,
+# quindi un workbook modificato invalida da sé le voci vecchie, che escono poi dalla
+# cache al superamento della soglia.
+cache_indici = Cache(server, config={
+    "CACHE_TYPE": "FileSystemCache",
+    "CACHE_DIR": os.environ.get("DASHBOARD_CACHE_DIR", ".cache-indici"),
+    "CACHE_THRESHOLD": 500,
+    "CACHE_DEFAULT_TIMEOUT": 0,
+})
+statistiche_cache_indici = {"hit": 0, "miss": 0}
+
+
+def _in_cache(chiave, calcola):
+    risultato = cache_indici.get(chiave)
+    if risultato is not None:
+        statistiche_cache_indici["hit"] += 1
+        return risultato
+    statistiche_cache_indici["miss"] += 1
+    risultato = calcola()
+    cache_indici.set(chiave, risultato)
+    return risultato
+
+
+# Sorgenti scelte come parte delle chiavi di cache: "all" o i nomi in ordine
+def chiave_sorgenti(sorgente):
+    sorgenti = valori_filtro(sorgente)
+    return "all" if sorgenti is None else ",".join(sorted(map(str, sorgenti)))
+
+
+# Pannello anno × azienda di tutti gli indici, calcolato in un solo passaggio per
+# versione dei dati e sorgenti scelte (vedi indici.calcola_indici_per_anno)
+def pannello_in_cache(dati, sorgente="all"):
+    return _in_cache(
+        f"pannello:{dati.impronta}:{chiave_sorgenti(sorgente)}",
+        lambda: indici_per_anno(dati.interrogazioni, {COLONNA_SORGENTE: sorgente}),
+    )
+
+
+# Tabella degli indici di tutte le aziende per un anno (o "all" = tutti gli anni insieme),
+# indicizzata per nome azienda. La normalizzazione è sempre fatta sull'intera popolazione
+# del periodo: la vista di una singola azienda è una sua riga, non un ricalcolo sui
+# suoi soli dati (che darebbe indice iniziative 0, essendo minimo e massimo uguali).
+# Con una scelta di sorgenti la popolazione è quella delle sole sorgenti scelte.
+def tabella_indici(dati, year, sorgente="all"):
+    chiave = ("indici", year, chiave_sorgenti(sorgente))
+    tabella = dati.cache_locale.get(chiave)
+    if tabella is None:
+        if year == "all":
+            tabella = _in_cache(
+                f"indici:{dati.impronta}:all:{chiave_sorgenti(sorgente)}",
+                lambda: tre_indici(dati.interrogazioni, {COLONNA_SORGENTE: sorgente}),
+            )
+        else:
+            pannello = pannello_in_cache(dati, sorgente)
+            tabella = pannello[pannello["Anno"] == year].drop(columns="Anno")
+        tabella = tabella.set_axis(pd.Index(tabella["Nome azienda"].astype(object)), axis=0)
+        dati.cache_locale[chiave] = tabella
+    return tabella
+
+
+# `azienda` e `sorgente` sono un valore, una lista di valori o "all" (vedi filtri.valori_filtro)
+def indici_in_cache(dati, mode, year, azienda, sorgente="all"):
+    if mode == "aggregato":
+        year = "all"
+    risultati = tabella_indici(dati, year, sorgente)
+    aziende = valori_filtro(azienda)
+    if aziende is not None:
+        # ricerca per chiave nell'indice della tabella
+        risultati = risultati.loc[[nome for nome in aziende if nome in risultati.index]]
+    return risultati
+
+
+# --- API: indici per anno e azienda ---
+# /api/indici-per-anno restituisce l'intero pannello, ?azienda=...&azienda=... solo le aziende
+# indicate; ?sorgente=... calcola gli indici sulle sole sorgenti indicate
+@server.route("/api/indici-per-anno")
+def api_indici_per_anno():
+    pannello = pannello_in_cache(gestore_dati.corrente, request.args.getlist("sorgente") or "all")
+    aziende = request.args.getlist("azienda")
+    if aziende:
+        pannello = pannello[maschera_valori(pannello["Nome azienda"], aziende)]
+    return jsonify(pannello.to_dict("records"))
+
+
+# Contatori hit/miss della cache degli indici (per singolo worker)
+@server.route("/stato/cache-indici")
+def stato_cache_indici():
+    return jsonify(pid=os.getpid(), impronta=gestore_dati.corrente.impronta, **statistiche_cache_indici)
+
+
+# --- Memoria del worker che risponde ---
+# Byte dei due DataFrame per colonna e rss/pss/uss del processo (vedi metriche.py)
+@server.route("/stato/memoria")
+def stato_memoria():
+    dati = gestore_dati.corrente
+    return jsonify(
+        pid=os.getpid(),
+        processo=memoria_processo(),
+        iniziative={col: int(b) for col, b in memoria_dataframe(dati.df_iniziative).items()},
+        composizione={col: int(b) for col, b in memoria_dataframe(dati.df_composizione).items()},
+    )
+
+# --- Dati del cubo per i grafici clientside ---
+def dati_store_cubo(dati):
+    if not ESECUZIONE_CLIENTSIDE:
+        return None
+    # template con i soli tipi di traccia disegnati da assets/dashboard.js
+    return {**dati.cubo_iniziative.esporta(), "template": template_ridotto(("bar", "pie", "scatter"))}
+
+# --- Filtro per sorgente di una sezione ---
+# Visibile solo se i dati vengono da più workbook (dataset partizionato)
+def filtro_sorgente(id_dropdown, dati, chiave, stile=None):
+    stile = stile or {"width": "24%", "display": "inline-block", "marginTop": "10px"}
+    if not dati.piu_sorgenti:
+        stile = {**stile, "display": "none"}
+    return html.Div([
+        html.Label("Sorgente", style={"color": "#080808", "fontWeight": "bold"}),
+        dcc.Dropdown(id=id_dropdown, options=dati.opzioni[chiave], value="all", multi=True)
+    ], style=stile)
+
+# --- Pulsante di esportazione di una sezione (vedi update_download_*) ---
+def controlli_esportazione(sezione):
+    return html.Div([
+        dcc.RadioItems(
+            id=f"formato-esporta-{sezione}",
+            options=[
+                {"label": "CSV", "value": "csv"},
+                {"label": "Parquet", "value": "parquet"},
+                {"label": "Excel", "value": "xlsx"}
             ],
-            style={
-                "fontFamily": "Arial, sans-serif",
-                "backgroundColor": "#f7f7f7",
-                "padding": "20px",
-            },
-        )
-    ],
-),
+            value="csv",
+            inline=True,
+            style={"display": "inline-block", "marginRight": "10px", "color": "#080808"}
+        ),
+        html.Button("Scarica dati", id=f"bottone-esporta-{sezione}", n_clicks=0,
+                    style={"backgroundColor": "#c10b13", "color": "white", "border": "none", "padding": "6px 12px"}),
+        dcc.Download(id=f"download-{sezione}")
+    ], style={"margin": "10px 20px"})
+
+# --- Layout ---
+# La pagina parte con la sola Introduzione: le altre schede hanno un contenitore vuoto
+# che update_scheda riempie la prima volta che vengono aperte, con le opzioni dei
+# dropdown della versione dei dati corrente e le uscite delle callback per i filtri
+# predefiniti già calcolate (vedi uscite_predefinite). Il contenuto resta poi nella
+# pagina, con i filtri scelti, anche quando si cambia scheda.
+def scheda_introduzione():
+    return html.Div(
+        [
+            # ---------- intestazione rossa ----------
+            html.Div(
+                html.H1(
+                    "Dashboard D&I - Metodo e Fonti",
+                    style={"margin": "0", "padding": "20px", "color": "#ffffff"},
+                ),
+                style={"backgroundColor": "#c10b13", "textAlign": "center"},
+            ),
 
-        dcc.Tab(label="Panoramica", value="tab-overview", children=[
+            # ---------- contenuto bianco ----------
+            html.Div(
+                [
+                    html.H2("Metodo", style={"color": "#080808"}),
+
+                    html.P(
+                        "Questa Dashboard è stata realizzata con l'obiettivo di analizzare e "
+                        "visualizzare le iniziative in ambito Diversity & Inclusion promosse "
+                        "dalle aziende partecipate del Comune di Brescia. I dati sono stati "
+                        "raccolti, aggregati e analizzati a partire da fonti ufficiali, con "
+                        "particolare attenzione alla presenza di attività concrete, pratiche "
+                        "inclusive e alla composizione di genere nei ruoli aziendali.",
+                        style={
+                            "fontSize": "16px",
+                            "lineHeight": "1.6",
+                            "color": "#080808",
+                        },
+                    ),
+
+                    html.P(
+                        "La costruzione degli indicatori sintetici (D&I Index) si basa su tre "
+                        "dimensioni principali:",
+                        style={
+                            "fontSize": "16px",
+                            "lineHeight": "1.6",
+                            "color": "#080808",
+                        },
+                    ),
+
+                    # elenco puntato delle tre componenti
+                    html.Ul(
+                        [
+                            html.Li(
+                                [
+                                    html.B("Indice Iniziative – "),
+                                    "numero totale di iniziative promosse da ogni azienda.",
+                                ]
+                            ),
+                            html.Li(
+                                [
+                                    html.B("Indice Categorie – "),
+                                    "copertura delle sette categorie di diversità considerate "
+                                    "(Genere, Età, Disabilità, LGBTQI+, Religione e credo, Etnia, e infine attività generali (Cultura)); l’azienda ottiene "
+                                    "il 100 % solo se ha almeno un’iniziativa per ciascuna categoria.",
+                                ]
+                            ),
+                            html.Li(
+                                [
+                                    html.B("Indice Parità di Genere – "),
+                                    "distanza dall’equilibrio 50 / 50 nella composizione del Board "
+                                    "aziendale, rimappata su una scala 0‑100.",
+                                ]
+                            ),
+                        ],
+                        style={
+                            "fontSize": "16px",
+                            "lineHeight": "1.6",
+                            "color": "#080808",
+                            "marginLeft": "20px",
+                        },
+                    ),
+
+                    html.P(
+                        "La media dei tre punteggi, normalizzati su scala 0‑100, restituisce "
+                        "il valore finale del D&I Index, che permette il confronto omogeneo tra aziende.",
+                        style={
+                            "fontSize": "16px",
+                            "lineHeight": "1.6",
+                            "color": "#080808",
+                        },
+                    ),
+
+                    # ---------- fonti dei dati ----------
+                    html.H2("Fonti dei Dati", style={"color": "#080808", "marginTop": "30px"}),
+                    html.Ul(
+                        [
+                            html.Li("Bilanci di sostenibilità delle aziende partecipate"),
+                            html.Li("Siti istituzionali e documentazione pubblica delle aziende"),
+                            html.Li("Database Orbis (Bureau van Dijk) per informazioni anagrafiche e di governance"),
+                        ],
+                        style={"fontSize": "16px", "color": "#080808"},
+                    ),
+
+                    html.P(
+                        "I dati sono stati raccolti ed elaborati manualmente con un processo di "
+                        "verifica incrociata, per garantire la coerenza e l'affidabilità delle "
+                        "informazioni visualizzate.",
+                        style={
+                            "fontSize": "16px",
+                            "lineHeight": "1.6",
+                            "color": "#080808",
+                        },
+                    ),
+                ],
+                style={"padding": "30px"},
+            ),
+        ],
+        style={
+            "fontFamily": "Arial, sans-serif",
+            "backgroundColor": "#f7f7f7",
+            "padding": "20px",
+        },
+    )
+
+
+# Tab Panoramica
+def scheda_panoramica(dati, uscite):
+    kpi_aziende, kpi_iniziative, kpi_inclusive, fig_distribuzione = uscite["panoramica"]
+    return html.Div([
+        html.Div([
+            html.H1("Dashboard D&I - Sezione Panoramica", style={"margin": "0", "padding": "20px", "color": "#ffffff"})
+        ], style={"backgroundColor": "#c10b13", "textAlign": "center"}),
+        html.Div([
             html.Div([
-                html.Div([
-                    html.H1("Dashboard D&I - Sezione Panoramica", style={"margin": "0", "padding": "20px", "color": "#ffffff"})
-                ], style={"backgroundColor": "#c10b13", "textAlign": "center"}),
-                html.Div([
-                    html.Div([
-                        html.Label("Azienda", style={"color": "#080808", "fontWeight": "bold"}),
-                        dcc.Dropdown(id="dropdown-azienda-overview", options=opzioni_azienda, value="all")
-                    ], style={"width": "24%", "display": "inline-block", "margin-right": "1%"}),
-                    html.Div([
-                        html.Label("Area Prassi", style={"color": "#080808", "fontWeight": "bold"}),
-                        dcc.Dropdown(id="dropdown-area-overview", options=opzioni_area, value="all")
-                    ], style={"width": "24%", "display": "inline-block", "margin-right": "1%"}),
-                    html.Div([
-                        html.Label("Categoria di diversità", style={"color": "#080808", "fontWeight": "bold"}),
-                        dcc.Dropdown(id="dropdown-categoria-overview", options=opzioni_categoria, value="all")
-                    ], style={"width": "24%", "display": "inline-block", "margin-right": "1%"}),
-                    html.Div([
-                        html.Label("Anno", style={"color": "#080808", "fontWeight": "bold"}),
-                        dcc.Dropdown(id="dropdown-anno-overview", options=opzioni_anno, value="all")
-                    ], style={"width": "24%", "display": "inline-block"})
-                ], style={"margin": "20px 0"}),
-                html.Div([
-                    html.Div([
-                        html.H3("Numero totale di aziende", style={"color": "#080808"}),
-                        html.H4(id="kpi-aziende-overview", style={"color": "#c30c13"})
-                    ], style={"width": "30%", "display": "inline-block", "textAlign": "center",
-                              "border": "2px solid #c30c13", "padding": "10px", "borderRadius": "5px", "margin": "10px"}),
-                    html.Div([
-                        html.H3("Numero totale di iniziative", style={"color": "#080808"}),
-                        html.H4(id="kpi-iniziative-overview", style={"color": "#ab0404"})
-                    ], style={"width": "30%", "display": "inline-block", "textAlign": "center",
-                              "border": "2px solid #ab0404", "padding": "10px", "borderRadius": "5px", "margin": "10px"}),
-                    html.Div([
-                        html.H3("% aziende con linguaggio inclusivo", style={"color": "#080808"}),
-                        html.H4(id="kpi-inclusive-overview", style={"color": "#c2222c"})
-                    ], style={"width": "30%", "display": "inline-block", "textAlign": "center",
-                              "border": "2px solid #c2222c", "padding": "10px", "borderRadius": "5px", "margin": "10px"})
-                ], style={"margin-bottom": "50px"}),
-                dcc.Graph(id="graph-distribuzione-overview")
-            ], style={"fontFamily": "Arial, sans-serif", "backgroundColor": "#f7f7f7", "padding": "20px"})
-        ]),
-        # Tab Iniziative D&I
-        dcc.Tab(label="Iniziative D&I", value="tab-initiatives", children=[
+                html.Label("Azienda", style={"color": "#080808", "fontWeight": "bold"}),
+                dcc.Dropdown(id="dropdown-azienda-overview", options=dati.opzioni["azienda"], value="all", multi=True)
+            ], style={"width": "24%", "display": "inline-block", "margin-right": "1%"}),
             html.Div([
-                html.Div([
-                    html.H1("Dashboard D&I - Sezione Iniziative D&I", style={"margin": "0", "padding": "20px", "color": "#ffffff"})
-                ], style={"backgroundColor": "#c10b13", "textAlign": "center"}),
-                html.Div([
-                    html.Div([
-                        html.Label("Azienda", style={"color": "#080808", "fontWeight": "bold"}),
-                        dcc.Dropdown(id="dropdown-azienda-table", options=opzioni_azienda, value="all")
-                    ], style={"width": "24%", "display": "inline-block", "margin-right": "1%"}),
-                    html.Div([
-                        html.Label("Area Prassi", style={"color": "#080808", "fontWeight": "bold"}),
-                        dcc.Dropdown(id="dropdown-area-table", options=opzioni_area, value="all")
-                    ], style={"width": "24%", "display": "inline-block", "margin-right": "1%"}),
-                    html.Div([
-                        html.Label("Categoria di diversità", style={"color": "#080808", "fontWeight": "bold"}),
-                        dcc.Dropdown(id="dropdown-categoria-table", options=opzioni_categoria, value="all")
-                    ], style={"width": "24%", "display": "inline-block", "margin-right": "1%"}),
-                    html.Div([
-                        html.Label("Anno", style={"color": "#080808", "fontWeight": "bold"}),
-                        dcc.Dropdown(id="dropdown-anno-table", options=opzioni_anno, value="all")
-                    ], style={"width": "24%", "display": "inline-block"})
-                ], style={"margin": "20px 0"}),
-                dcc.Tabs(id="tabs-initiatives", value="tab-table", children=[
-                    dcc.Tab(label="Tabella Iniziative", value="tab-table", children=[
-                        html.Div([
-                            dash_table.DataTable(
-                                id="table-iniziative",
-                                columns=[{"name": col, "id": col} for col in df_iniziative.columns],
-                                data=df_iniziative.to_dict("records"),
-                                page_size=10,
-                                style_table={"overflowX": "auto"},
-                                style_header={"backgroundColor": "#c10b13", "color": "white", "fontWeight": "bold"},
-                                style_cell={"textAlign": "left", "padding": "5px"}
-                            )
-                        ], style={"margin": "20px"})
-                    ]),
-                    dcc.Tab(label="Grafici Iniziative", value="tab-graphs", children=[
-                        html.Div([
-                            dcc.Graph(id="graph-area-prassi"),
-                            dcc.Graph(id="graph-categoria-diversita"),
-                            dcc.Graph(id="graph-evoluzione")
-                        ], style={"margin": "20px"})
-                    ])
-                ])
-            ], style={"fontFamily": "Arial, sans-serif", "backgroundColor": "#f7f7f7", "padding": "20px"})
-        ]),
-        # Tab Composizione di Genere (versione funzionante di prima)
-        dcc.Tab(label="Composizione di Genere", value="tab-genere", children=[
+                html.Label("Area Prassi", style={"color": "#080808", "fontWeight": "bold"}),
+                dcc.Dropdown(id="dropdown-area-overview", options=dati.opzioni["area"], value="all", multi=True)
+            ], style={"width": "24%", "display": "inline-block", "margin-right": "1%"}),
             html.Div([
-                html.Div([
-                    html.H1("Dashboard D&I - Composizione di Genere", style={"margin": "0", "padding": "20px", "color": "#ffffff"})
-                ], style={"backgroundColor": "#c10b13", "textAlign": "center"}),
-                html.Div([
-                    html.Div([
-                        html.Label("Azienda", style={"color": "#080808", "fontWeight": "bold"}),
-                        dcc.Dropdown(id="dropdown-azienda-genere", options=opzioni_azienda_genere, value="all", multi=True)
-                    ], style={"width": "33%", "display": "inline-block", "margin-right": "1%"}),
-                    html.Div([
-                        html.Label("Anno", style={"color": "#080808", "fontWeight": "bold"}),
-                        dcc.Dropdown(id="dropdown-anno-genere", options=opzioni_anno_genere, value="all")
-                    ], style={"width": "33%", "display": "inline-block", "margin-right": "1%"}),
-                    html.Div([
-                        html.Label("Posizione", style={"color": "#080808", "fontWeight": "bold"}),
-                        dcc.Dropdown(id="dropdown-posizione-genere", options=opzioni_posizione_genere, value="all")
-                    ], style={"width": "33%", "display": "inline-block"})
-                ], style={"margin": "20px 0"}),
+                html.Label("Categoria di diversità", style={"color": "#080808", "fontWeight": "bold"}),
+                dcc.Dropdown(id="dropdown-categoria-overview", options=dati.opzioni["categoria"], value="all", multi=True)
+            ], style={"width": "24%", "display": "inline-block", "margin-right": "1%"}),
+            html.Div([
+                html.Label("Anno", style={"color": "#080808", "fontWeight": "bold"}),
+                dcc.Dropdown(id="dropdown-anno-overview", options=dati.opzioni["anno"], value="all", multi=True)
+            ], style={"width": "24%", "display": "inline-block"}),
+            filtro_sorgente("dropdown-sorgente-overview", dati, "sorgente")
+        ], style={"margin": "20px 0"}),
+        html.Div([
+            html.Div([
+                html.H3("Numero totale di aziende", style={"color": "#080808"}),
+                html.H4(kpi_aziende, id="kpi-aziende-overview", style={"color": "#c30c13"})
+            ], style={"width": "30%", "display": "inline-block", "textAlign": "center",
+                      "border": "2px solid #c30c13", "padding": "10px", "borderRadius": "5px", "margin": "10px"}),
+            html.Div([
+                html.H3("Numero totale di iniziative", style={"color": "#080808"}),
+                html.H4(kpi_iniziative, id="kpi-iniziative-overview", style={"color": "#ab0404"})
+            ], style={"width": "30%", "display": "inline-block", "textAlign": "center",
+                      "border": "2px solid #ab0404", "padding": "10px", "borderRadius": "5px", "margin": "10px"}),
+            html.Div([
+                html.H3("% aziende con linguaggio inclusivo", style={"color": "#080808"}),
+                html.H4(kpi_inclusive, id="kpi-inclusive-overview", style={"color": "#c2222c"})
+            ], style={"width": "30%", "display": "inline-block", "textAlign": "center",
+                      "border": "2px solid #c2222c", "padding": "10px", "borderRadius": "5px", "margin": "10px"})
+        ], style={"margin-bottom": "50px"}),
+        dcc.Graph(id="graph-distribuzione-overview", figure=fig_distribuzione)
+    ], style={"fontFamily": "Arial, sans-serif", "backgroundColor": "#f7f7f7", "padding": "20px"})
+
+
+# Tab Iniziative D&I
+def scheda_iniziative(dati, uscite):
+    fig_area, fig_categoria, fig_evoluzione = uscite["iniziative"]
+    righe_tabella, pagine_tabella, _ = uscite["tabella_iniziative"]
+    return html.Div([
+        html.Div([
+            html.H1("Dashboard D&I - Sezione Iniziative D&I", style={"margin": "0", "padding": "20px", "color": "#ffffff"})
+        ], style={"backgroundColor": "#c10b13", "textAlign": "center"}),
+        html.Div([
+            html.Div([
+                html.Label("Azienda", style={"color": "#080808", "fontWeight": "bold"}),
+                dcc.Dropdown(id="dropdown-azienda-table", options=dati.opzioni["azienda"], value="all", multi=True)
+            ], style={"width": "24%", "display": "inline-block", "margin-right": "1%"}),
+            html.Div([
+                html.Label("Area Prassi", style={"color": "#080808", "fontWeight": "bold"}),
+                dcc.Dropdown(id="dropdown-area-table", options=dati.opzioni["area"], value="all", multi=True)
+            ], style={"width": "24%", "display": "inline-block", "margin-right": "1%"}),
+            html.Div([
+                html.Label("Categoria di diversità", style={"color": "#080808", "fontWeight": "bold"}),
+                dcc.Dropdown(id="dropdown-categoria-table", options=dati.opzioni["categoria"], value="all", multi=True)
+            ], style={"width": "24%", "display": "inline-block", "margin-right": "1%"}),
+            html.Div([
+                html.Label("Anno", style={"color": "#080808", "fontWeight": "bold"}),
+                dcc.Dropdown(id="dropdown-anno-table", options=dati.opzioni["anno"], value="all", multi=True)
+            ], style={"width": "24%", "display": "inline-block"}),
+            filtro_sorgente("dropdown-sorgente-table", dati, "sorgente")
+        ], style={"margin": "20px 0"}),
+        controlli_esportazione("iniziative"),
+        dcc.Tabs(id="tabs-initiatives", value="tab-table", children=[
+            dcc.Tab(label="Tabella Iniziative", value="tab-table", children=[
                 html.Div([
                     dash_table.DataTable(
-                        id="table-genere",
-                        columns=[{"name": col, "id": col} for col in df_composizione.columns if col != "Linguaggio inclusivo"],
-                        data=df_composizione.to_dict("records"),
+                        id="table-iniziative",
+                        columns=[{"name": col, "id": col} for col in dati.colonne_tabella_iniziative],
+                        data=righe_tabella,
+                        page_count=pagine_tabella,
+                        page_current=0,
                         page_size=10,
+                        page_action="custom",
+                        sort_action="custom",
+                        sort_mode="multi",
+                        sort_by=[],
+                        filter_action="custom",
+                        filter_query="",
                         style_table={"overflowX": "auto"},
                         style_header={"backgroundColor": "#c10b13", "color": "white", "fontWeight": "bold"},
                         style_cell={"textAlign": "left", "padding": "5px"}
                     )
-                ], style={"margin": "20px"}),
+                ], style={"margin": "20px"})
+            ]),
+            dcc.Tab(label="Grafici Iniziative", value="tab-graphs", children=[
                 html.Div([
-                    dcc.Graph(id="graph-bar-genere"),
-                    dcc.Graph(id="graph-pie-genere")
+                    dcc.Graph(id="graph-area-prassi", figure=fig_area),
+                    dcc.Graph(id="graph-categoria-diversita", figure=fig_categoria),
+                    dcc.Graph(id="graph-evoluzione", figure=fig_evoluzione)
                 ], style={"margin": "20px"})
-            ], style={"fontFamily": "Arial, sans-serif", "backgroundColor": "#f7f7f7", "padding": "20px"})
-        ]),
-        # Tab Indicatori sintetici (D&I Index) - ultima tab a destra
-        dcc.Tab(label="Indicatori sintetici", value="tab-index", children=[
-    html.Div([
+            ])
+        ])
+    ], style={"fontFamily": "Arial, sans-serif", "backgroundColor": "#f7f7f7", "padding": "20px"})
+
+
+# Tab Composizione di Genere (versione funzionante di prima)
+def scheda_genere(dati, uscite):
+    fig_bar, fig_pie = uscite["genere"]
+    righe_tabella, pagine_tabella, _ = uscite["tabella_genere"]
+    return html.Div([
+        html.Div([
+            html.H1("Dashboard D&I - Composizione di Genere", style={"margin": "0", "padding": "20px", "color": "#ffffff"})
+        ], style={"backgroundColor": "#c10b13", "textAlign": "center"}),
+        html.Div([
+            html.Div([
+                html.Label("Azienda", style={"color": "#080808", "fontWeight": "bold"}),
+                dcc.Dropdown(id="dropdown-azienda-genere", options=dati.opzioni["azienda_genere"], value="all", multi=True)
+            ], style={"width": "33%", "display": "inline-block", "margin-right": "1%"}),
+            html.Div([
+                html.Label("Anno", style={"color": "#080808", "fontWeight": "bold"}),
+                dcc.Dropdown(id="dropdown-anno-genere", options=dati.opzioni["anno_genere"], value="all", multi=True)
+            ], style={"width": "33%", "display": "inline-block", "margin-right": "1%"}),
+            html.Div([
+                html.Label("Posizione", style={"color": "#080808", "fontWeight": "bold"}),
+                dcc.Dropdown(id="dropdown-posizione-genere", options=dati.opzioni["posizione_genere"], value="all", multi=True)
+            ], style={"width": "33%", "display": "inline-block"}),
+            filtro_sorgente("dropdown-sorgente-genere", dati, "sorgente_genere")
+        ], style={"margin": "20px 0"}),
+        controlli_esportazione("genere"),
+        html.Div([
+            dash_table.DataTable(
+                id="table-genere",
+                columns=[{"name": col, "id": col} for col in dati.colonne_tabella_genere],
+                data=righe_tabella,
+                page_count=pagine_tabella,
+                page_current=0,
+                page_size=10,
+                page_action="custom",
+                sort_action="custom",
+                sort_mode="multi",
+                sort_by=[],
+                filter_action="custom",
+                filter_query="",
+                style_table={"overflowX": "auto"},
+                style_header={"backgroundColor": "#c10b13", "color": "white", "fontWeight": "bold"},
+                style_cell={"textAlign": "left", "padding": "5px"}
+            )
+        ], style={"margin": "20px"}),
+        html.Div([
+            dcc.Graph(id="graph-bar-genere", figure=fig_bar),
+            dcc.Graph(id="graph-pie-genere", figure=fig_pie)
+        ], style={"margin": "20px"})
+    ], style={"fontFamily": "Arial, sans-serif", "backgroundColor": "#f7f7f7", "padding": "20px"})
+
+
+# Tab Indicatori sintetici (D&I Index) - ultima tab a destra
+def scheda_indice(dati, uscite):
+    fig_index, righe_tabella, fig_iniziative, fig_categorie, fig_genere = uscite["indice"]
+    return html.Div([
         html.Div([
             html.H1("Dashboard D&I - Indicatori sintetici (D&I Index)", style={"margin": "0", "padding": "20px", "color": "#ffffff"})
         ], style={"backgroundColor": "#c10b13", "textAlign": "center"}),
@@ -412,17 +534,24 @@ dcc.Tab(
 
             html.Div(id="div-dropdown-index-year", children=[
                 html.Label("Seleziona Anno:", style={"color": "#080808", "fontWeight": "bold"}),
-                dcc.Dropdown(id="dropdown-index-year", options=opzioni_anno, value="all")
+                dcc.Dropdown(id="dropdown-index-year", options=dati.opzioni["anno"], value="all")
             ], style={"display": "none", "marginTop": "10px"}),
 
             html.Div([
                 html.Label("Seleziona Azienda:", style={"color": "#080808", "fontWeight": "bold"}),
-                dcc.Dropdown(id="dropdown-index-azienda", options=opzioni_azienda, value="all")
-            ], style={"marginTop": "10px"})
+                dcc.Dropdown(id="dropdown-index-azienda", options=dati.opzioni["azienda"], value="all", multi=True)
+            ], style={"marginTop": "10px"}),
+            filtro_sorgente("dropdown-index-sorgente", dati, "sorgente", {"marginTop": "10px"}),
+
+            # Avanzamento del calcolo, visibile solo mentre la callback in background è in corso
+            html.Div([
+                html.Progress(id="progresso-indice", value="0", max=str(PASSI_INDICE)),
+                html.Span(" Calcolo degli indici in corso…", style={"color": "#080808"})
+            ], id="div-progresso-indice", style={"visibility": "hidden", "marginTop": "10px"})
         ], style={"width": "60%", "margin": "20px auto"}),
 
         html.Div([
-            dcc.Graph(id="graph-index"),
+            dcc.Graph(id="graph-index", figure=fig_index),
 
             dash_table.DataTable(
                 id="table-index",
@@ -430,292 +559,643 @@ dcc.Tab(
                     {"name": "Nome azienda", "id": "Nome azienda"},
                     {"name": "Indice Diversità Finale", "id": "Indice diversità finale"}
                 ],
-                data=[],
+                data=righe_tabella,
                 sort_action="native",
                 style_table={"overflowX": "auto"},
                 style_header={"backgroundColor": "#c10b13", "color": "white", "fontWeight": "bold"},
                 style_cell={"textAlign": "left", "padding": "5px"}
             ),
+            controlli_esportazione("indici"),
 
             html.Br(),
             html.H3("Indice Iniziative", style={"color": "#080808"}),
-            dcc.Graph(id="graph-indice-iniziative"),
+            dcc.Graph(id="graph-indice-iniziative", figure=fig_iniziative),
 
             html.H3("Indice Categorie di diversità", style={"color": "#080808"}),
-            dcc.Graph(id="graph-indice-categorie"),
+            dcc.Graph(id="graph-indice-categorie", figure=fig_categorie),
 
             html.H3("Indice Parità di genere (Board)", style={"color": "#080808"}),
-            dcc.Graph(id="graph-indice-genere")
+            dcc.Graph(id="graph-indice-genere", figure=fig_genere),
+
+            # Andamento negli anni, dal pannello anno × azienda
+            html.H3("Andamento negli anni", style={"color": "#080808"}),
+            html.Div([
+                html.Label("Indice:", style={"color": "#080808", "fontWeight": "bold"}),
+                dcc.Dropdown(
+                    id="dropdown-andamento-indice",
+                    options=[{"label": indice, "value": indice} for indice in INDICI_ANDAMENTO],
+                    value="Indice diversità finale",
+                    clearable=False
+                )
+            ], style={"width": "40%"}),
+            dcc.Graph(id="graph-andamento-indice", figure=uscite["andamento"])
         ], style={"margin": "20px"})
     ], style={"fontFamily": "Arial, sans-serif", "backgroundColor": "#f7f7f7", "padding": "20px"})
-])
-        ])
+
+
+# Contenuto di ogni scheda caricata su richiesta
+SCHEDE = {
+    "tab-overview": scheda_panoramica,
+    "tab-initiatives": scheda_iniziative,
+    "tab-genere": scheda_genere,
+    "tab-index": scheda_indice,
+}
+
+
+def crea_layout():
+    dati = gestore_dati.corrente
+    return html.Div([
+    dcc.Tabs(id="tabs", value="tab-introduzione", children=[
+        dcc.Tab(label="Introduzione", value="tab-introduzione", children=[scheda_introduzione()]),
+        dcc.Tab(label="Panoramica", value="tab-overview", children=[html.Div(id="contenuto-tab-overview")]),
+        dcc.Tab(label="Iniziative D&I", value="tab-initiatives", children=[html.Div(id="contenuto-tab-initiatives")]),
+        dcc.Tab(label="Composizione di Genere", value="tab-genere", children=[html.Div(id="contenuto-tab-genere")]),
+        dcc.Tab(label="Indicatori sintetici", value="tab-index", children=[html.Div(id="contenuto-tab-index")]),
+    ]),
+    # schede già caricate nella pagina (vedi update_scheda)
+    dcc.Store(id="store-schede", data=[]),
+    dcc.Store(id="store-cubo", data=dati_store_cubo(dati)),
+    # versione dei dati mostrata nella pagina, controllata periodicamente (vedi update_versione_dati)
+    dcc.Store(id="store-versione", data=dati.stato()),
+    dcc.Interval(id="intervallo-versione", interval=INTERVALLO_RICARICA * 1000, disabled=not INTERVALLO_RICARICA)
     ])
 
+app.layout = crea_layout
+
+# --- Id del componente che ha attivato la callback (None se chiamata fuori da Dash) ---
+def componente_attivante():
+    try:
+        return dash.ctx.triggered_id
+    except MissingCallbackContextException:
+        return None
+
+# --- Filtri comuni per Panoramica e Iniziative D&I ---
+def filtri_iniziative(azienda, area, categoria, anno, sorgente="all"):
+    return {
+        "Nome azienda": azienda,
+        "Area Prassi": area,
+        "Categoria di diversità": categoria,
+        "Anno": anno,
+        COLONNA_SORGENTE: sorgente,
+    }
+
+# Il risultato può essere dati.df_iniziative stesso (nessun filtro attivo): va trattato in sola lettura
+def filtra_iniziative(dati, azienda, area, categoria, anno, sorgente="all"):
+    return dati.motore_iniziative.filtra(filtri_iniziative(azienda, area, categoria, anno, sorgente))
+
 # --- Callback per aggiornare la sezione Panoramica ---
-@app.callback(
-    [Output("kpi-aziende-overview", "children"),
-     Output("kpi-iniziative-overview", "children"),
-     Output("kpi-inclusive-overview", "children"),
-     Output("graph-distribuzione-overview", "figure")],
-    [Input("dropdown-azienda-overview", "value"),
-     Input("dropdown-area-overview", "value"),
-     Input("dropdown-categoria-overview", "value"),
-     Input("dropdown-anno-overview", "value")]
-)
-def update_overview(azienda, area, categoria, anno):
-    df_filtered = df_iniziative.copy()
-    if azienda != "all":
-        df_filtered = df_filtered[df_filtered["Nome azienda"] == azienda]
-    if area != "all":
-        df_filtered = df_filtered[df_filtered["Area Prassi"] == area]
-    if categoria != "all":
-        df_filtered = df_filtered[df_filtered["Categoria di diversità"] == categoria]
-    if anno != "all":
-        df_filtered = df_filtered[df_filtered["Anno"] == anno]
-    
-    num_aziende_filtered = df_filtered["Nome azienda"].nunique()
-    num_iniziative_filtered = df_filtered["Titolo dell'attività"].count()
-    
-    aziende_filtered = df_filtered["Nome azienda"].unique()
-    df_comp_filtered = df_composizione[df_composizione["Nome azienda"].isin(aziende_filtered)]
-    if anno != "all":
-        df_comp_filtered = df_comp_filtered[df_comp_filtered["Anno"] == anno]
-    df_inclusive_filtered = df_comp_filtered[df_comp_filtered["Linguaggio inclusivo"] == "Sì"]
-    aziende_inclusive = df_inclusive_filtered["Nome azienda"].unique()
-    num_inclusive = sum(azienda in aziende_inclusive for azienda in aziende_filtered)
-    perc_inclusive_filtered = (num_inclusive / len(aziende_filtered)) * 100 if len(aziende_filtered) > 0 else 0
-
-    if df_filtered.empty:
-        fig_overview = px.bar(title="Nessun dato disponibile per i filtri selezionati")
-    else:
-        df_dist = df_filtered.groupby("Anno")["Titolo dell'attività"].count().reset_index(name="Numero iniziative")
-        fig_overview = px.bar(
-            df_dist,
-            x="Anno",
-            y="Numero iniziative",
-            title="Distribuzione delle iniziative per Anno",
-            color="Numero iniziative",
-            color_continuous_scale=PALETTE
-        )
-        fig_overview.update_layout(plot_bgcolor="#f7f7f7", paper_bgcolor="#f7f7f7", font_color="#080808")
-        
+OUTPUT_PANORAMICA = [
+    Output("kpi-aziende-overview", "children"),
+    Output("kpi-iniziative-overview", "children"),
+    Output("kpi-inclusive-overview", "children"),
+    Output("graph-distribuzione-overview", "figure"),
+]
+INPUT_PANORAMICA = [
+    Input("dropdown-azienda-overview", "value"),
+    Input("dropdown-area-overview", "value"),
+    Input("dropdown-categoria-overview", "value"),
+    Input("dropdown-anno-overview", "value"),
+    Input("dropdown-sorgente-overview", "value"),
+]
+
+def update_overview(azienda, area, categoria, anno, sorgente, versione=None):
+    # KPI e distribuzione per anno come interrogazioni del backend (con pandas le risolve
+    # il cubo pre-aggregato, senza toccare le singole righe; le aziende inclusive sono
+    # lette dalla tabella booleana del cubo per i codici delle aziende selezionate)
+    backend = gestore_dati.corrente.interrogazioni
+    filtri = filtri_iniziative(azienda, area, categoria, anno, sorgente)
+    with fase("aggregazione"):
+        num_aziende_filtered = int(backend.aggrega(numero_aziende(filtri))["aziende"].iloc[0])
+        num_iniziative_filtered = int(backend.aggrega(numero_iniziative(filtri))["iniziative"].iloc[0])
+        perc_inclusive_filtered = 0
+        if num_aziende_filtered:
+            num_inclusive = backend.aziende_inclusive(filtri, anno, sorgente)
+            perc_inclusive_filtered = num_inclusive / num_aziende_filtered * 100
+        df_dist = backend.aggrega(iniziative_per_anno(filtri))
+
+    with fase("grafici"):
+        if df_dist.empty:
+            fig_overview = figura_vuota("Nessun dato disponibile per i filtri selezionati")
+        else:
+            fig_overview = figura_in_cache(
+                barre, df_dist, "Anno", "Numero iniziative", "Distribuzione delle iniziative per Anno"
+            )
+
     return (f"{num_aziende_filtered}",
             f"{num_iniziative_filtered}",
             f"{perc_inclusive_filtered:.2f}%",
             fig_overview)
 
+if ESECUZIONE_CLIENTSIDE:
+    app.clientside_callback(
+        ClientsideFunction(namespace="dashboard", function_name="panoramica"),
+        OUTPUT_PANORAMICA,
+        INPUT_PANORAMICA + [Input("store-cubo", "data")],
+        prevent_initial_call=True
+    )
+else:
+    app.callback(OUTPUT_PANORAMICA, INPUT_PANORAMICA + [Input("store-versione", "data")],
+                 prevent_initial_call=True)(update_overview)
+
 # --- Callback per aggiornare la sezione Iniziative D&I ---
+OUTPUT_INIZIATIVE = [
+    Output("graph-area-prassi", "figure"),
+    Output("graph-categoria-diversita", "figure"),
+    Output("graph-evoluzione", "figure"),
+]
+INPUT_INIZIATIVE = [
+    Input("dropdown-azienda-table", "value"),
+    Input("dropdown-area-table", "value"),
+    Input("dropdown-categoria-table", "value"),
+    Input("dropdown-anno-table", "value"),
+    Input("dropdown-sorgente-table", "value"),
+]
+
+def update_initiatives(azienda, area, categoria, anno, sorgente, versione=None):
+    backend = gestore_dati.corrente.interrogazioni
+    filtri = filtri_iniziative(azienda, area, categoria, anno, sorgente)
+    with fase("aggregazione"):
+        df_area, df_cat, df_evo = (
+            backend.aggrega(righe_per(colonna, filtri))
+            for colonna in ("Area Prassi", "Categoria di diversità", "Anno")
+        )
+
+    # l'anno non è mai mancante (vedi dati.normalizza_iniziative): nessun anno, nessuna riga
+    if df_evo.empty:
+        with fase("grafici"):
+            fig_vuota = figura_vuota("Nessun dato disponibile")
+        return fig_vuota, fig_vuota, fig_vuota
+
+    with fase("grafici"):
+        fig_area = figura_in_cache(barre, df_area, "Area Prassi", "Count", "Frequenza iniziative per Area Prassi")
+        fig_cat = figura_in_cache(
+            torta, df_cat, "Categoria di diversità", "Count", "Frequenza per Categoria di diversità"
+        )
+        fig_evo = figura_in_cache(linea, df_evo, "Anno", "Count", "Evoluzione delle iniziative nel tempo")
+    
+    return fig_area, fig_cat, fig_evo
+
+if ESECUZIONE_CLIENTSIDE:
+    app.clientside_callback(
+        ClientsideFunction(namespace="dashboard", function_name="iniziative"),
+        OUTPUT_INIZIATIVE,
+        INPUT_INIZIATIVE + [Input("store-cubo", "data")],
+        prevent_initial_call=True
+    )
+else:
+    app.callback(OUTPUT_INIZIATIVE, INPUT_INIZIATIVE + [Input("store-versione", "data")],
+                 prevent_initial_call=True)(update_initiatives)
+
+# --- Callback per la tabella delle iniziative (paginata lato server) ---
 @app.callback(
     [Output("table-iniziative", "data"),
-     Output("graph-area-prassi", "figure"),
-     Output("graph-categoria-diversita", "figure"),
-     Output("graph-evoluzione", "figure")],
+     Output("table-iniziative", "page_count"),
+     Output("table-iniziative", "page_current")],
     [Input("dropdown-azienda-table", "value"),
      Input("dropdown-area-table", "value"),
      Input("dropdown-categoria-table", "value"),
-     Input("dropdown-anno-table", "value")]
+     Input("dropdown-anno-table", "value"),
+     Input("dropdown-sorgente-table", "value"),
+     Input("table-iniziative", "page_current"),
+     Input("table-iniziative", "page_size"),
+     Input("table-iniziative", "sort_by"),
+     Input("table-iniziative", "filter_query"),
+     Input("store-versione", "data")],
+    prevent_initial_call=True
 )
-def update_initiatives(azienda, area, categoria, anno):
-    df_filtered = df_iniziative.copy()
-    if azienda != "all":
-        df_filtered = df_filtered[df_filtered["Nome azienda"] == azienda]
-    if area != "all":
-        df_filtered = df_filtered[df_filtered["Area Prassi"] == area]
-    if categoria != "all":
-        df_filtered = df_filtered[df_filtered["Categoria di diversità"] == categoria]
-    if anno != "all":
-        df_filtered = df_filtered[df_filtered["Anno"] == anno]
-    
-    table_data = df_filtered.to_dict("records")
-    
-    if df_filtered.empty:
-        fig_area = px.bar(title="Nessun dato disponibile")
-    else:
-        df_area = df_filtered.groupby("Area Prassi").size().reset_index(name="Count")
-        fig_area = px.bar(
-            df_area,
-            x="Area Prassi",
-            y="Count",
-            title="Frequenza iniziative per Area Prassi",
-            color="Count", color_continuous_scale=PALETTE
-        )
-        fig_area.update_layout(plot_bgcolor="#f7f7f7", paper_bgcolor="#f7f7f7", font_color="#080808")
-    
-    if df_filtered.empty:
-        fig_cat = px.pie(title="Nessun dato disponibile")
-    else:
-        df_cat = df_filtered.groupby("Categoria di diversità").size().reset_index(name="Count")
-        fig_cat = px.pie(
-            df_cat,
-            names="Categoria di diversità",
-            values="Count",
-            title="Frequenza per Categoria di diversità",
-            color_discrete_sequence=PALETTE
-        )
-        fig_cat.update_layout(plot_bgcolor="#f7f7f7", paper_bgcolor="#f7f7f7", font_color="#080808")
-        
-    
-    if df_filtered.empty:
-        fig_evo = px.line(title="Nessun dato disponibile")
-    else:
-        df_evo = df_filtered.groupby("Anno").size().reset_index(name="Count")
-        fig_evo = px.line(
-            df_evo,
-            x="Anno",
-            y="Count",
-            title="Evoluzione delle iniziative nel tempo",
-            markers=True
-        )
-        fig_evo.update_traces(line_color="#c10a13", marker_color="#c10a13")
-        fig_evo.update_layout(plot_bgcolor="#f7f7f7", paper_bgcolor="#f7f7f7", font_color="#080808")
-    
-    return table_data, fig_area, fig_cat, fig_evo
+def update_table_iniziative(azienda, area, categoria, anno, sorgente, page_current, page_size, sort_by,
+                            filter_query, versione=None):
+    # un cambio dei dropdown riporta la tabella alla prima pagina
+    if componente_attivante() not in ("table-iniziative", None):
+        page_current = 0
+    dati = gestore_dati.corrente
+    with fase("filtro"):
+        df_filtered = filtra_iniziative(dati, azienda, area, categoria, anno, sorgente)
+        return pagina_tabella(df_filtered, page_current, page_size, sort_by, filter_query,
+                              colonne=dati.colonne_tabella_iniziative)
+
+# --- Filtro comune per grafici e tabella della Composizione di Genere ---
+# Come filtra_iniziative: il risultato può essere dati.df_composizione stesso
+def filtra_composizione(dati, aziende, anno, posizione, sorgente="all"):
+    return dati.motore_composizione.filtra({
+        "Nome azienda": aziende,
+        "Anno": anno,
+        "Posizione": posizione,
+        COLONNA_SORGENTE: sorgente,
+    })
 
 # --- Callback per aggiornare la sezione Composizione di Genere ---
 @app.callback(
-    [Output("table-genere", "data"),
-     Output("graph-bar-genere", "figure"),
+    [Output("graph-bar-genere", "figure"),
      Output("graph-pie-genere", "figure")],
     [Input("dropdown-azienda-genere", "value"),
      Input("dropdown-anno-genere", "value"),
-     Input("dropdown-posizione-genere", "value")]
+     Input("dropdown-posizione-genere", "value"),
+     Input("dropdown-sorgente-genere", "value"),
+     Input("store-versione", "data")],
+    prevent_initial_call=True
 )
-def update_genere(aziende, anno, posizione):
-    df_genere = df_composizione.copy()
-    if aziende != "all":
-        if isinstance(aziende, str):
-            aziende = [aziende]
-        df_genere = df_genere[df_genere["Nome azienda"].isin(aziende)]
-    if anno != "all":
-        df_genere = df_genere[df_genere["Anno"] == anno]
-    if posizione != "all":
-        df_genere = df_genere[df_genere["Posizione"] == posizione]
-    
-    table_data = df_genere.drop(columns=["Linguaggio inclusivo"], errors="ignore").to_dict("records")
-    
-    df_genere = df_genere.copy()
-    try:
-        df_genere["Percentuale donne"] = df_genere["Percentuale donne"].str.rstrip('%').astype(float)
-        df_genere["Percentuale uomini"] = df_genere["Percentuale uomini"].str.rstrip('%').astype(float)
-    except Exception:
-        df_genere["Percentuale donne"] = df_genere["Percentuale donne"]
-        df_genere["Percentuale uomini"] = df_genere["Percentuale uomini"]
-    
-    if df_genere.empty:
-        fig_bar = px.bar(title="Nessun dato disponibile")
-    else:
-        df_bar = df_genere.groupby(["Nome azienda", "Posizione"]).agg({
-            "Percentuale donne": "mean",
-            "Percentuale uomini": "mean"
-        }).reset_index()
+def update_genere(aziende, anno, posizione, sorgente, versione=None):
+    backend = gestore_dati.corrente.interrogazioni
+    filtri = {"Nome azienda": aziende, "Anno": anno, "Posizione": posizione, COLONNA_SORGENTE: sorgente}
+    with fase("aggregazione"):
+        totali = backend.aggrega(totali_genere(filtri))
+
+    if totali["righe"].iloc[0] == 0:
+        with fase("grafici"):
+            fig_vuota = figura_vuota("Nessun dato disponibile")
+        return fig_vuota, fig_vuota
+
+    with fase("aggregazione"):
+        df_bar = backend.aggrega(medie_genere(filtri))
+
+        df_pie = pd.DataFrame({
+            "Genere": ["Donne", "Uomini"],
+            "Count": [totali["Donne"].iloc[0], totali["Uomini"].iloc[0]]
+        })
+
+    with fase("grafici"):
         color_discrete_map = {
-            "Percentuale donne": "#c30c13",
-            "Percentuale uomini": "#c3c3c3"
+            "Percentuale donne": COLORE_DONNE,
+            "Percentuale uomini": COLORE_UOMINI
         }
-        fig_bar = px.bar(
+        fig_bar = figura_in_cache(
+            barre_raggruppate,
             df_bar,
-            x="Nome azienda",
-            y=["Percentuale donne", "Percentuale uomini"],
-            barmode="group",
-            title="Confronto percentuale donne e uomini per Azienda",
-            labels={"value": "Percentuale", "variable": "Genere"},
-            color_discrete_map=color_discrete_map
+            "Nome azienda",
+            ["Percentuale donne", "Percentuale uomini"],
+            "Confronto percentuale donne e uomini per Azienda",
+            color_discrete_map,
+            "Percentuale",
+            "Genere"
         )
-        fig_bar.update_layout(plot_bgcolor="#f7f7f7", paper_bgcolor="#f7f7f7", font_color="#080808")
-    
-    if df_genere.empty:
-        fig_pie = px.pie(title="Nessun dato disponibile")
-    else:
-        total_donne = df_genere["Numero donne"].sum()
-        total_uomini = df_genere["Numero uomini"].sum()
-        df_pie = pd.DataFrame({
-            "Genere": ["Donne", "Uomini"],
-            "Count": [total_donne, total_uomini]
-        })
+
         color_discrete_map_pie = {
-            "Donne": "#c30c13",
-            "Uomini": "#c3c3c3"
+            "Donne": COLORE_DONNE,
+            "Uomini": COLORE_UOMINI
         }
-        fig_pie = px.pie(
-            df_pie,
-            names="Genere",
-            values="Count",
-            title="Composizione complessiva: Donne vs Uomini",
-            hole=0.4,
-            color="Genere",
-            color_discrete_map=color_discrete_map_pie
+        fig_pie = figura_in_cache(
+            torta, df_pie, "Genere", "Count", "Composizione complessiva: Donne vs Uomini",
+            colori=color_discrete_map_pie, hole=0.4
         )
-        fig_pie.update_layout(plot_bgcolor="#f7f7f7", paper_bgcolor="#f7f7f7", font_color="#080808")
     
-    return table_data, fig_bar, fig_pie
+    return fig_bar, fig_pie
+
+# --- Callback per la tabella della Composizione di Genere (paginata lato server) ---
+@app.callback(
+    [Output("table-genere", "data"),
+     Output("table-genere", "page_count"),
+     Output("table-genere", "page_current")],
+    [Input("dropdown-azienda-genere", "value"),
+     Input("dropdown-anno-genere", "value"),
+     Input("dropdown-posizione-genere", "value"),
+     Input("dropdown-sorgente-genere", "value"),
+     Input("table-genere", "page_current"),
+     Input("table-genere", "page_size"),
+     Input("table-genere", "sort_by"),
+     Input("table-genere", "filter_query"),
+     Input("store-versione", "data")],
+    prevent_initial_call=True
+)
+def update_table_genere(aziende, anno, posizione, sorgente, page_current, page_size, sort_by, filter_query,
+                        versione=None):
+    if componente_attivante() not in ("table-genere", None):
+        page_current = 0
+    dati = gestore_dati.corrente
+    with fase("filtro"):
+        df_genere = filtra_composizione(dati, aziende, anno, posizione, sorgente)
+        return pagina_tabella(df_genere, page_current, page_size, sort_by, filter_query,
+                              colonne=dati.colonne_tabella_genere)
 
 # --- Callback per aggiornare la sezione Indicatori sintetici (D&I Index) ---
-# AGGIORNA LA CALLBACK update_index QUI SOTTO:
+OUTPUT_INDICE = [
+    Output("graph-index", "figure"),
+    Output("table-index", "data"),
+    Output("graph-indice-iniziative", "figure"),
+    Output("graph-indice-categorie", "figure"),
+    Output("graph-indice-genere", "figure"),
+]
+INPUT_INDICE = [
+    Input("dropdown-index-mode", "value"),
+    Input("dropdown-index-year", "value"),
+    Input("dropdown-index-azienda", "value"),
+    Input("dropdown-index-sorgente", "value"),
+    Input("store-versione", "data"),
+]
+
+# `avanzamento(passo)` viene chiamata al termine di ogni passo (da 1 a PASSI_INDICE)
+def update_index(mode, year, azienda, sorgente, versione=None, avanzamento=None):
+    # Calcolo indici (memorizzato per modalità, anno e sorgenti)
+    with fase("aggregazione"):
+        risultati = indici_in_cache(gestore_dati.corrente, mode, year, azienda, sorgente)
+        risultati = risultati.sort_values("Indice diversità finale", ascending=False)
+    if avanzamento:
+        avanzamento(1)
+
+    with fase("grafici"):
+        # Grafico indice finale
+        fig_index = figura_in_cache(
+            barre, risultati[["Nome azienda", "Indice diversità finale"]],
+            "Nome azienda", "Indice diversità finale", "Indice Diversità Finale (0-100)"
+        )
+        if avanzamento:
+            avanzamento(2)
+
+        # Grafici singoli
+        fig1, fig2, fig3, _ = crea_grafici_indici(risultati)
+    if avanzamento:
+        avanzamento(3)
 
+    # Tabella dati
+    table_data = risultati[["Nome azienda", "Indice diversità finale"]].to_dict("records")
+
+    return fig_index, table_data, fig1, fig2, fig3
+
+if ESECUZIONE_BACKGROUND:
+    # Un nuovo cambio dei dropdown mentre il calcolo è in corso fa terminare a Dash il
+    # processo della richiesta vecchia (oldJob) prima di avviare quella nuova.
+    # Le metriche registrate nel processo figlio arrivano su /metrics solo con
+    # PROMETHEUS_MULTIPROC_DIR; la cache degli indici è su disco e resta condivisa.
+    def update_index_background(set_progress, mode, year, azienda, sorgente, versione):
+        return update_index(mode, year, azienda, sorgente, versione,
+                            avanzamento=lambda passo: set_progress((str(passo), str(PASSI_INDICE))))
+
+    app.callback(
+        OUTPUT_INDICE,
+        INPUT_INDICE,
+        background=True,
+        progress=[Output("progresso-indice", "value"), Output("progresso-indice", "max")],
+        progress_default=["0", str(PASSI_INDICE)],
+        running=[(
+            Output("div-progresso-indice", "style"),
+            {"visibility": "visible", "marginTop": "10px"},
+            {"visibility": "hidden", "marginTop": "10px"},
+        )],
+        interval=500,
+        prevent_initial_call=True,
+    )(update_index_background)
+else:
+    app.callback(OUTPUT_INDICE, INPUT_INDICE, prevent_initial_call=True)(update_index)
+
+
+# --- Callback per l'andamento degli indici negli anni ---
+# Una linea per azienda (o solo quella selezionata), dal pannello in cache
 @app.callback(
-    [
-        Output("graph-index", "figure"),
-        Output("table-index", "data"),
-        Output("graph-indice-iniziative", "figure"),
-        Output("graph-indice-categorie", "figure"),
-        Output("graph-indice-genere", "figure")
-    ],
-    [
-        Input("dropdown-index-mode", "value"),
-        Input("dropdown-index-year", "value"),
-        Input("dropdown-index-azienda", "value")  # NUOVO INPUT
-    ]
+    Output("graph-andamento-indice", "figure"),
+    [Input("dropdown-andamento-indice", "value"),
+     Input("dropdown-index-azienda", "value"),
+     Input("dropdown-index-sorgente", "value"),
+     Input("store-versione", "data")],
+    prevent_initial_call=True
 )
-def update_index(mode, year, azienda):
-    # Filtro per anno
-    if mode == "aggregato" or year == "all":
-        df_index = df_iniziative.copy()
-        df_genere = df_composizione.copy()
+def update_andamento(indice, azienda, sorgente, versione=None):
+    with fase("aggregazione"):
+        pannello = pannello_in_cache(gestore_dati.corrente, sorgente)
+        aziende = valori_filtro(azienda)
+        if aziende is not None:
+            pannello = pannello[maschera_valori(pannello["Nome azienda"], aziende)]
+        df_andamento = pannello[["Anno", "Nome azienda", indice]]
+
+    with fase("grafici"):
+        if df_andamento.empty:
+            return figura_vuota("Nessun dato disponibile")
+        return figura_in_cache(linee, df_andamento, "Anno", indice, "Nome azienda", f"{indice} negli anni")
+
+
+# --- Esportazione dei dati filtrati ---
+# Stessi filtri dei dropdown (e del filter_query delle tabelle); i file sono scritti a
+# blocchi di righe da esportazione.py. /esporta/<sezione>.<formato> li invia in streaming,
+# i pulsanti "Scarica dati" delle schede passano da dcc.Download.
+FOGLI_ESPORTAZIONE = {"iniziative": "Iniziative", "genere": "Composizione", "indici": "Indici"}
+FILTRI_ESPORTAZIONE = {
+    "iniziative": ["azienda", "area", "categoria", "anno", "sorgente", "filter_query"],
+    "genere": ["azienda", "anno", "posizione", "sorgente", "filter_query"],
+    "indici": ["mode", "year", "azienda", "sorgente"],
+}
+
+
+def tabella_esportazione(dati, sezione, filtri):
+    if sezione == "iniziative":
+        df = filtra_iniziative(dati, filtri["azienda"], filtri["area"], filtri["categoria"], filtri["anno"],
+                               filtri.get("sorgente", "all"))
+        df = df[dati.colonne_tabella_iniziative]
+    elif sezione == "genere":
+        df = filtra_composizione(dati, filtri["azienda"], filtri["anno"], filtri["posizione"],
+                                 filtri.get("sorgente", "all"))
+        df = df[dati.colonne_tabella_genere]
     else:
-        df_index = df_iniziative[df_iniziative["Anno"] == year].copy()
-        df_genere = df_composizione[df_composizione["Anno"] == year].copy()
-
-    # Filtro per azienda
-    if azienda != "all":
-        df_index = df_index[df_index["Nome azienda"] == azienda]
-        df_genere = df_genere[df_genere["Nome azienda"] == azienda]
-
-    # Calcolo indici
-    risultati = calcola_tre_indici(df_index, df_genere)
-    risultati = risultati.sort_values("Indice diversità finale", ascending=False)
-
-    # Grafico indice finale
-    fig_index = px.bar(
-        risultati,
-        x="Nome azienda",
-        y="Indice diversità finale",
-        title="Indice Diversità Finale (0-100)",
-        color="Indice diversità finale",
-        color_continuous_scale=PALETTE
+        df = indici_in_cache(dati, filtri["mode"], filtri["year"], filtri["azienda"], filtri.get("sorgente", "all"))
+        df = df.sort_values("Indice diversità finale", ascending=False).reset_index(drop=True)
+    return applica_filter_query(df, filtri.get("filter_query"))
+
+
+# Filtri della query string che sono colonne intere: gli anni
+FILTRI_INTERI = ("anno", "year")
+
+# Valore di un filtro dalla query string: gli anni diventano interi (aziende, aree,
+# categorie, posizioni e sorgenti restano nomi, anche se fatti di cifre); i filtri
+# ammettono più valori (?azienda=A&azienda=B), modalità e anno degli indici uno solo
+def _filtro_richiesta(nome):
+    if nome == "filter_query":
+        return request.args.get(nome, "")
+    valori = request.args.getlist(nome)
+    if nome in FILTRI_INTERI:
+        valori = [int(valore) if valore.isdigit() else valore for valore in valori]
+    if not valori:
+        return "aggregato" if nome == "mode" else "all"
+    if nome in ("mode", "year"):
+        return valori[-1]
+    return valori
+
+
+@server.route("/esporta/<sezione>.<formato>")
+def api_esporta(sezione, formato):
+    if sezione not in FILTRI_ESPORTAZIONE or formato not in FORMATI:
+        abort(404)
+    filtri = {nome: _filtro_richiesta(nome) for nome in FILTRI_ESPORTAZIONE[sezione]}
+    df = tabella_esportazione(gestore_dati.corrente, sezione, filtri)
+    return Response(
+        esporta(df, formato, FOGLI_ESPORTAZIONE[sezione]),
+        mimetype=FORMATI[formato][0],
+        headers={"Content-Disposition": f'attachment; filename="{sezione}.{formato}"'},
     )
-    fig_index.update_layout(plot_bgcolor="#f7f7f7", paper_bgcolor="#f7f7f7", font_color="#080808")
 
-    # Grafici singoli
-    fig1, fig2, fig3, _ = crea_grafici_indici(risultati)
 
-    # Tabella dati
-    table_data = risultati[["Nome azienda", "Indice diversità finale"]].to_dict("records")
+def invia_esportazione(sezione, formato, filtri):
+    df = tabella_esportazione(gestore_dati.corrente, sezione, filtri)
 
-    return fig_index, table_data, fig1, fig2, fig3
+    def scrivi(file):
+        for blocco in esporta(df, formato, FOGLI_ESPORTAZIONE[sezione]):
+            file.write(blocco)
+
+    return dcc.send_bytes(scrivi, f"{sezione}.{formato}")
 
 
-# --- Callback per mostrare/nascondere il dropdown per l'anno nella sezione Indicatori sintetici ---
 @app.callback(
+    Output("download-iniziative", "data"),
+    [Input("bottone-esporta-iniziative", "n_clicks")],
+    [State("formato-esporta-iniziative", "value"),
+     State("dropdown-azienda-table", "value"),
+     State("dropdown-area-table", "value"),
+     State("dropdown-categoria-table", "value"),
+     State("dropdown-anno-table", "value"),
+     State("dropdown-sorgente-table", "value"),
+     State("table-iniziative", "filter_query")],
+    prevent_initial_call=True
+)
+def update_download_iniziative(n_clicks, formato, azienda, area, categoria, anno, sorgente, filter_query):
+    return invia_esportazione("iniziative", formato, {
+        "azienda": azienda, "area": area, "categoria": categoria, "anno": anno, "sorgente": sorgente,
+        "filter_query": filter_query,
+    })
+
+
+@app.callback(
+    Output("download-genere", "data"),
+    [Input("bottone-esporta-genere", "n_clicks")],
+    [State("formato-esporta-genere", "value"),
+     State("dropdown-azienda-genere", "value"),
+     State("dropdown-anno-genere", "value"),
+     State("dropdown-posizione-genere", "value"),
+     State("dropdown-sorgente-genere", "value"),
+     State("table-genere", "filter_query")],
+    prevent_initial_call=True
+)
+def update_download_genere(n_clicks, formato, aziende, anno, posizione, sorgente, filter_query):
+    return invia_esportazione("genere", formato, {
+        "azienda": aziende, "anno": anno, "posizione": posizione, "sorgente": sorgente, "filter_query": filter_query,
+    })
+
+
+@app.callback(
+    Output("download-indici", "data"),
+    [Input("bottone-esporta-indici", "n_clicks")],
+    [State("formato-esporta-indici", "value"),
+     State("dropdown-index-mode", "value"),
+     State("dropdown-index-year", "value"),
+     State("dropdown-index-azienda", "value"),
+     State("dropdown-index-sorgente", "value")],
+    prevent_initial_call=True
+)
+def update_download_indici(n_clicks, formato, mode, year, azienda, sorgente):
+    return invia_esportazione("indici", formato, {"mode": mode, "year": year, "azienda": azienda, "sorgente": sorgente})
+
+
+# --- Callback per aggiornare opzioni dei dropdown e cubo quando cambiano i dati ---
+# Chiede periodicamente la versione dei dati; se il server ne ha una più recente di quella
+# della pagina, spedisce il nuovo cubo e cambia store-versione, che fa ricalcolare grafici
+# e tabelle lato server e le opzioni dei dropdown delle schede già caricate (una callback
+# per scheda: quelle non ancora aperte non sono nella pagina e verranno create con i dati
+# nuovi). Con più worker la versione può arrivare da un processo che non ha ancora
+# ricaricato: si accettano solo versioni più nuove.
+OPZIONI_DROPDOWN = {
+    "tab-overview": {
+        "dropdown-azienda-overview": "azienda",
+        "dropdown-area-overview": "area",
+        "dropdown-categoria-overview": "categoria",
+        "dropdown-anno-overview": "anno",
+        "dropdown-sorgente-overview": "sorgente",
+    },
+    "tab-initiatives": {
+        "dropdown-azienda-table": "azienda",
+        "dropdown-area-table": "area",
+        "dropdown-categoria-table": "categoria",
+        "dropdown-anno-table": "anno",
+        "dropdown-sorgente-table": "sorgente",
+    },
+    "tab-genere": {
+        "dropdown-azienda-genere": "azienda_genere",
+        "dropdown-anno-genere": "anno_genere",
+        "dropdown-posizione-genere": "posizione_genere",
+        "dropdown-sorgente-genere": "sorgente_genere",
+    },
+    "tab-index": {
+        "dropdown-index-year": "anno",
+        "dropdown-index-azienda": "azienda",
+        "dropdown-index-sorgente": "sorgente",
+    },
+}
+
+@app.callback(
+    [Output("store-versione", "data"),
+     Output("store-cubo", "data")],
+    [Input("intervallo-versione", "n_intervals")],
+    [State("store-versione", "data")],
+    prevent_initial_call=True
+)
+def update_versione_dati(n_intervals, versione):
+    dati = gestore_dati.corrente
+    if versione and (versione["impronta"] == dati.impronta or versione["caricata"] > dati.caricata):
+        raise PreventUpdate
+    return dati.stato(), dati_store_cubo(dati)
+
+
+def callback_opzioni(chiavi):
+    def update_opzioni(versione):
+        dati = gestore_dati.corrente
+        return [dati.opzioni[chiave] for chiave in chiavi]
+    return update_opzioni
+
+
+for dropdown in OPZIONI_DROPDOWN.values():
+    app.callback(
+        [Output(id_dropdown, "options") for id_dropdown in dropdown],
+        [Input("store-versione", "data")],
+        prevent_initial_call=True
+    )(callback_opzioni(list(dropdown.values())))
+
+
+# --- Callback per mostrare/nascondere il dropdown per l'anno nella sezione Indicatori sintetici ---
+# Solo uno stile da cambiare: eseguita nel browser, senza passare dal server
+app.clientside_callback(
+    ClientsideFunction(namespace="dashboard", function_name="mostra_anno"),
     Output("div-dropdown-index-year", "style"),
-    [Input("dropdown-index-mode", "value")]
+    [Input("dropdown-index-mode", "value")],
+    prevent_initial_call=True
 )
-def show_hide_year_dropdown(mode):
 
-    if mode == "anno":
-        return {"display": "block", "marginTop": "10px"}
-    else:
-        return {"display": "none"}
+# --- Contenuto delle schede caricato su richiesta ---
+# Uscite delle callback per i filtri predefiniti ("Tutti", D&I Index aggregato), messe
+# direttamente nel contenuto delle schede: aprire una scheda costa una sola richiesta e le
+# callback della scheda (prevent_initial_call) partono solo quando cambia un filtro.
+# Calcolate una volta per versione dei dati e processo: all'avvio per la versione
+# iniziale, su richiesta dopo una ricarica del workbook.
+def uscite_predefinite(dati):
+    if "predefinite" not in dati.cache_locale:
+        dati.cache_locale["predefinite"] = {
+            "panoramica": update_overview("all", "all", "all", "all", "all"),
+            "iniziative": update_initiatives("all", "all", "all", "all", "all"),
+            "tabella_iniziative": update_table_iniziative("all", "all", "all", "all", "all", 0, 10, [], ""),
+            "genere": update_genere("all", "all", "all", "all"),
+            "tabella_genere": update_table_genere("all", "all", "all", "all", 0, 10, [], ""),
+            "indice": update_index("aggregato", "all", "all", "all"),
+            "andamento": update_andamento("Indice diversità finale", "all", "all"),
+        }
+    return dati.cache_locale["predefinite"]
+
+
+@app.callback(
+    [Output(f"contenuto-{scheda}", "children") for scheda in SCHEDE]
+    + [Output("store-schede", "data")],
+    [Input("tabs", "value")],
+    [State("store-schede", "data")],
+    prevent_initial_call=True
+)
+def update_scheda(tab, caricate):
+    if tab not in SCHEDE or tab in caricate:
+        raise PreventUpdate
+    dati = gestore_dati.corrente
+    contenuto = SCHEDE[tab](dati, uscite_predefinite(dati))
+    return ([contenuto if scheda == tab else no_update for scheda in SCHEDE]
+            + [caricate + [tab]])
+
+
+# Layout completo, per la validazione delle callback (i contenuti delle schede non sono
+# nella pagina iniziale); calcola anche le uscite predefinite della versione all'avvio
+app.validation_layout = html.Div([
+    crea_layout(),
+    *(scheda(gestore_dati.corrente, uscite_predefinite(gestore_dati.corrente)) for scheda in SCHEDE.values()),
+])
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,226 @@
+// Callback clientside della dashboard D&I.
+// I grafici vengono ricostruiti nel browser a partire dal cubo pre-aggregato
+// (CuboIniziative.esporta in cubo.py, spedito una volta sola in store-cubo), con la stessa
+// forma delle figure prodotte da grafici.py sul server.
+
+(function () {
+    var COLONNE = ["Nome azienda", "Area Prassi", "Categoria di diversità", "Anno", "Sorgente"];
+    var ROSSO = "#c10a13";
+
+    // --- Valori scelti in un dropdown a selezione multipla (come filtri.valori_filtro) ---
+    // null = nessun filtro; "all" vale solo se è l'unica scelta
+    function valoriFiltro(valore) {
+        if (valore === null || valore === undefined) {
+            return null;
+        }
+        var valori = (Array.isArray(valore) ? valore : [valore]).filter(function (v) {
+            return v !== "all";
+        });
+        return valori.length > 0 ? valori : null;
+    }
+
+    // Codici dei valori presenti tra le categorie (i valori assenti sono ignorati)
+    function codiciValori(categorie, valori) {
+        return valori.map(function (v) {
+            return categorie.indexOf(v);
+        }).filter(function (codice) {
+            return codice >= 0;
+        });
+    }
+
+    // --- Selezione delle celle del cubo ---
+    // Restituisce gli indici delle celle che rispettano i filtri; per ogni colonna filtrata
+    // una tabella booleana per codice, così una cella costa un accesso per filtro
+    function seleziona(cubo, valori) {
+        var codiciFiltro = [];
+        for (var i = 0; i < COLONNE.length; i++) {
+            var scelti = valoriFiltro(valori[i]);
+            if (scelti === null) {
+                continue;
+            }
+            var codici = codiciValori(cubo.categorie[COLONNE[i]], scelti);
+            if (codici.length === 0) {
+                return [];
+            }
+            var ammessi = new Array(cubo.categorie[COLONNE[i]].length).fill(false);
+            codici.forEach(function (codice) {
+                ammessi[codice] = true;
+            });
+            codiciFiltro.push([cubo.codici[COLONNE[i]], ammessi]);
+        }
+        var celle = [];
+        for (var c = 0; c < cubo.righe.length; c++) {
+            var ok = true;
+            for (var f = 0; f < codiciFiltro.length && ok; f++) {
+                ok = codiciFiltro[f][1][codiciFiltro[f][0][c]] === true;
+            }
+            if (ok) {
+                celle.push(c);
+            }
+        }
+        return celle;
+    }
+
+    // Somma `misura` per codice della colonna indicata, in ordine di categoria
+    // (come groupby sul server); esclude i codici senza celle selezionate
+    function raggruppa(cubo, celle, colonna, misura) {
+        var categorie = cubo.categorie[colonna];
+        var somme = new Array(categorie.length).fill(0);
+        var presenti = new Array(categorie.length).fill(false);
+        celle.forEach(function (c) {
+            var codice = cubo.codici[colonna][c];
+            if (codice >= 0) {
+                somme[codice] += cubo[misura][c];
+                presenti[codice] = true;
+            }
+        });
+        var x = [], y = [];
+        for (var k = 0; k < categorie.length; k++) {
+            if (presenti[k]) {
+                x.push(categorie[k]);
+                y.push(somme[k]);
+            }
+        }
+        return {x: x, y: y};
+    }
+
+    // --- Costruttori delle figure (stessa struttura di grafici.py) ---
+    // Come template_ridotto in grafici.py: solo i default dei tipi di traccia presenti
+    function riduciTemplate(template, tracce) {
+        var dati = {};
+        tracce.forEach(function (traccia) {
+            if (template.data[traccia.type]) {
+                dati[traccia.type] = template.data[traccia.type];
+            }
+        });
+        return {data: dati, layout: template.layout};
+    }
+
+    function figura(template, tracce, titolo, layout) {
+        return {
+            data: tracce,
+            layout: Object.assign({
+                template: riduciTemplate(template, tracce),
+                title: {text: titolo},
+                legend: {tracegroupgap: 0}
+            }, layout || {})
+        };
+    }
+
+    function assi(x, y) {
+        return {xaxis: {title: {text: x}}, yaxis: {title: {text: y}}};
+    }
+
+    function barre(template, dati, x, y, titolo) {
+        return figura(template, [{
+            type: "bar",
+            x: dati.x,
+            y: dati.y,
+            marker: {color: dati.y, coloraxis: "coloraxis"},
+            hovertemplate: x + "=%{x}<br>" + y + "=%{marker.color}<extra></extra>",
+            showlegend: false
+        }], titolo, Object.assign(assi(x, y), {
+            coloraxis: {colorbar: {title: {text: y}}},
+            barmode: "relative"
+        }));
+    }
+
+    function torta(template, dati, nomi, valori, titolo) {
+        return figura(template, [{
+            type: "pie",
+            labels: dati.x,
+            values: dati.y,
+            hovertemplate: nomi + "=%{label}<br>" + valori + "=%{value}<extra></extra>"
+        }], titolo);
+    }
+
+    function linea(template, dati, x, y, titolo) {
+        return figura(template, [{
+            type: "scatter",
+            x: dati.x,
+            y: dati.y,
+            mode: "lines+markers",
+            line: {color: ROSSO},
+            marker: {color: ROSSO},
+            hovertemplate: x + "=%{x}<br>" + y + "=%{y}<extra></extra>",
+            showlegend: false
+        }], titolo, assi(x, y));
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        dashboard: {
+            // Mostra il dropdown dell'anno solo in modalità "Per anno"
+            mostra_anno: function (mode) {
+                if (mode === "anno") {
+                    return {display: "block", marginTop: "10px"};
+                }
+                return {display: "none"};
+            },
+
+            // Equivalente clientside di update_overview
+            panoramica: function (azienda, area, categoria, anno, sorgente, cubo) {
+                if (!cubo) {
+                    return window.dash_clientside.no_update;
+                }
+                var celle = seleziona(cubo, [azienda, area, categoria, anno, sorgente]);
+
+                var aziende = {};
+                var numIniziative = 0;
+                celle.forEach(function (c) {
+                    var codice = cubo.codici["Nome azienda"][c];
+                    if (codice >= 0) {
+                        aziende[codice] = true;
+                    }
+                    numIniziative += cubo.iniziative[c];
+                });
+                var codiciAziende = Object.keys(aziende);
+
+                // linguaggio inclusivo in almeno uno degli anni scelti (ultima colonna = tutti),
+                // in almeno una delle sorgenti scelte
+                var anni = valoriFiltro(anno);
+                var colonne = anni === null ? [cubo.categorie["Anno"].length] : codiciValori(cubo.categorie["Anno"], anni);
+                var scelte = valoriFiltro(sorgente);
+                var sorgenti = scelte === null ? cubo.categorie["Sorgente"].map(function (_, codice) { return codice; })
+                    : codiciValori(cubo.categorie["Sorgente"], scelte);
+                var inclusive = 0;
+                codiciAziende.forEach(function (codice) {
+                    if (sorgenti.some(function (s) {
+                        return colonne.some(function (colonna) { return cubo.inclusivo[s][codice][colonna]; });
+                    })) {
+                        inclusive += 1;
+                    }
+                });
+                var percInclusive = codiciAziende.length > 0 ? inclusive / codiciAziende.length * 100 : 0;
+
+                var fig;
+                if (celle.length === 0) {
+                    fig = figura(cubo.template, [], "Nessun dato disponibile per i filtri selezionati");
+                } else {
+                    fig = barre(cubo.template, raggruppa(cubo, celle, "Anno", "iniziative"),
+                                "Anno", "Numero iniziative", "Distribuzione delle iniziative per Anno");
+                }
+                return [String(codiciAziende.length), String(numIniziative), percInclusive.toFixed(2) + "%", fig];
+            },
+
+            // Equivalente clientside di update_initiatives (solo grafici: la tabella resta sul server)
+            iniziative: function (azienda, area, categoria, anno, sorgente, cubo) {
+                if (!cubo) {
+                    return window.dash_clientside.no_update;
+                }
+                var celle = seleziona(cubo, [azienda, area, categoria, anno, sorgente]);
+                if (celle.length === 0) {
+                    var vuota = figura(cubo.template, [], "Nessun dato disponibile");
+                    return [vuota, vuota, vuota];
+                }
+                return [
+                    barre(cubo.template, raggruppa(cubo, celle, "Area Prassi", "righe"),
+                          "Area Prassi", "Count", "Frequenza iniziative per Area Prassi"),
+                    torta(cubo.template, raggruppa(cubo, celle, "Categoria di diversità", "righe"),
+                          "Categoria di diversità", "Count", "Frequenza per Categoria di diversità"),
+                    linea(cubo.template, raggruppa(cubo, celle, "Anno", "righe"),
+                          "Anno", "Count", "Evoluzione delle iniziative nel tempo")
+                ];
+            }
+        }
+    });
+})();
@@ -0,0 +1,44 @@
+# Pannello anno × azienda degli indici: un solo passaggio (calcola_indici_per_anno)
+# contro una chiamata di calcola_tre_indici per ogni anno, con verifica che i valori coincidano.
+# Uso: python -m benchmarks.bench_andamento
+import timeit
+
+import pandas as pd
+
+from benchmarks.dati_sintetici import genera_composizione, genera_iniziative
+from dati import compatta, normalizza_composizione, normalizza_iniziative
+from indici import calcola_indici_per_anno, calcola_tre_indici
+
+
+def per_anno_con_ciclo(df_iniziative, df_genere):
+    anni = sorted(set(df_iniziative["Anno"]) | set(df_genere["Anno"]))
+    return {
+        anno: calcola_tre_indici(df_iniziative[df_iniziative["Anno"] == anno],
+                                 df_genere[df_genere["Anno"] == anno])
+        for anno in anni
+    }
+
+
+def main(aziende=(20, 200, 2_000), iniziative_per_azienda=50, ripetizioni=3):
+    print(f"{'aziende':>8}{'un anno alla volta (ms)':>26}{'pannello (ms)':>16}{'speedup':>10}")
+    for n_aziende in aziende:
+        df_iniziative, df_genere = compatta(
+            normalizza_iniziative(genera_iniziative(n_aziende * iniziative_per_azienda, n_aziende=n_aziende)),
+            normalizza_composizione(genera_composizione(n_aziende)),
+            "sintetico",
+        )
+
+        pannello = calcola_indici_per_anno(df_iniziative, df_genere)
+        for anno, atteso in per_anno_con_ciclo(df_iniziative, df_genere).items():
+            fetta = pannello[pannello["Anno"] == anno].drop(columns="Anno").reset_index(drop=True)
+            pd.testing.assert_frame_equal(fetta, atteso)
+
+        t_ciclo = timeit.timeit(lambda: per_anno_con_ciclo(df_iniziative, df_genere),
+                                number=ripetizioni) / ripetizioni
+        t_pannello = timeit.timeit(lambda: calcola_indici_per_anno(df_iniziative, df_genere),
+                                   number=ripetizioni) / ripetizioni
+        print(f"{n_aziende:>8}{t_ciclo * 1000:>26.1f}{t_pannello * 1000:>16.1f}{t_ciclo / t_pannello:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# Anagrafica delle aziende (dati.anagrafica_aziende): allineamento dei tre sotto-indici
+# sul nome azienda (come faceva indici._calcola_indici in origine) contro l'allineamento
+# sull'ID, con verifica che i risultati coincidano; poi gli stessi dati con i nomi scritti
+# in grafie diverse (maiuscole, spazi, punteggiatura, accenti), che devono dare le stesse
+# aziende (a meno della grafia scelta per il nome) e gli stessi indici dei dati puliti.
+# Uso: python -m benchmarks.bench_aziende [--aziende 1000 10000] [--ripetizioni 5]
+import argparse
+import logging
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.dati_sintetici import genera_composizione, genera_iniziative
+from cubo import CuboIniziative
+from dati import anagrafica_aziende, chiave_azienda, compatta, normalizza_composizione, normalizza_iniziative
+from filtri import COLONNE_FILTRO_COMPOSIZIONE, COLONNE_FILTRO_INIZIATIVE, MotoreFiltri
+from indici import CATEGORIE_RILEVANTI, indici_per_anno, interrogazioni_indici, normalizza_0_100, tre_indici
+from interrogazioni import BackendPandas
+
+
+# Versione di riferimento: le tre tabelle indicizzate e allineate per nome (o per anno e
+# nome, con la normalizzazione sul livello "Anno")
+def normalizza_per_anno(valori):
+    gruppi = valori.astype(float).groupby(level="Anno")
+    minimo = gruppi.transform("min")
+    massimo = gruppi.transform("max")
+    normalizzati = (valori.astype(float) - minimo) / (massimo - minimo) * 100
+    return normalizzati.where(massimo != minimo, 0.0)
+
+
+def calcola_indici_per_nome(backend, chiavi, normalizza):
+    q_iniziative, q_categorie, q_parita = interrogazioni_indici(chiavi)
+    n_iniziative = backend.aggrega(q_iniziative).set_index(chiavi)["n"]
+    n_categorie = backend.aggrega(q_categorie).set_index(chiavi)["n"].reindex(n_iniziative.index, fill_value=0)
+    media_donne = backend.aggrega(q_parita).set_index(chiavi)["media"]
+    risultati = (
+        pd.DataFrame({
+            "Indice iniziative": normalizza(n_iniziative),
+            "Indice categorie": n_categorie / len(CATEGORIE_RILEVANTI) * 100,
+            "Indice parità genere": 100 - (50 - media_donne).abs() * 2,
+        })
+        .fillna(0)
+        .rename_axis(chiavi)
+        .reset_index()
+    )
+    risultati["Indice diversità finale"] = risultati[
+        ["Indice iniziative", "Indice categorie", "Indice parità genere"]
+    ].mean(axis=1)
+    return risultati
+
+
+# Backend come in ricarica.VersioneDati
+def _backend(df_iniziative, df_composizione):
+    return BackendPandas({"iniziative": df_iniziative, "composizione": df_composizione}, motori={
+        "iniziative": MotoreFiltri(df_iniziative, COLONNE_FILTRO_INIZIATIVE),
+        "composizione": MotoreFiltri(df_composizione, COLONNE_FILTRO_COMPOSIZIONE),
+    }, cubo=CuboIniziative(df_iniziative, df_composizione))
+
+
+def _uguali(atteso, ottenuto):
+    return (list(atteso.columns) == list(ottenuto.columns)
+            and list(atteso.dtypes.astype(str)) == list(ottenuto.dtypes.astype(str))
+            and atteso["Nome azienda"].astype(str).tolist() == ottenuto["Nome azienda"].astype(str).tolist()
+            and np.allclose(atteso.iloc[:, -4:].to_numpy(float), ottenuto.iloc[:, -4:].to_numpy(float)))
+
+
+# Risultati con la chiave al posto del nome, nell'ordine delle chiavi: il nome scelto per
+# un'azienda con più grafie può cambiarne la posizione
+def _per_chiave(risultati):
+    risultati = risultati.assign(**{"Nome azienda": risultati["Nome azienda"].astype(str).map(chiave_azienda)})
+    return risultati.sort_values(list(risultati.columns[:-4])).reset_index(drop=True)
+
+
+# Stessi nomi scritti in modi diversi, riga per riga
+def sporca_nomi(nomi, seme=0):
+    rng = np.random.default_rng(seme)
+    varianti = [
+        lambda nome: nome,
+        str.upper,
+        str.lower,
+        lambda nome: nome.replace(" ", "  "),
+        lambda nome: nome.replace(".", ""),
+        lambda nome: nome.replace("S.p.a.", "S.P.A").replace("Azienda", "Aziendà"),
+    ]
+    scelte = rng.integers(len(varianti), size=len(nomi))
+    return pd.Series([varianti[i](nome) for i, nome in zip(scelte, nomi)], index=nomi.index, dtype="str")
+
+
+def main(aziende, ripetizioni):
+    print(f"{'aziende':>8}  {'calcolo':<16}{'per nome (ms)':>15}{'per ID (ms)':>13}{'uguali':>8}")
+    for n_aziende in aziende:
+        df_iniziative = normalizza_iniziative(genera_iniziative(n_aziende * 5, n_aziende=n_aziende))
+        df_composizione = normalizza_composizione(genera_composizione(n_aziende))
+        backend = _backend(*compatta(df_iniziative.copy(), df_composizione.copy(), "sintetico"))
+        calcoli = {
+            "tre_indici": (tre_indici, ["Nome azienda"], normalizza_0_100),
+            "indici_per_anno": (indici_per_anno, ["Anno", "Nome azienda"], normalizza_per_anno),
+        }
+        for nome, (funzione, chiavi, normalizza) in calcoli.items():
+            uguali = _uguali(calcola_indici_per_nome(backend, chiavi, normalizza), funzione(backend))
+            t_nome = timeit.timeit(lambda: calcola_indici_per_nome(backend, chiavi, normalizza),
+                                   number=ripetizioni) / ripetizioni
+            t_id = timeit.timeit(lambda: funzione(backend), number=ripetizioni) / ripetizioni
+            print(f"{n_aziende:>8}  {nome:<16}{t_nome * 1000:>15.1f}{t_id * 1000:>13.1f}{'sì' if uguali else 'NO':>8}")
+
+        # grafie diverse nei due fogli: stessa anagrafica, stessi indici
+        df_iniziative["Nome azienda"] = sporca_nomi(df_iniziative["Nome azienda"], seme=1)
+        df_composizione["Nome azienda"] = sporca_nomi(df_composizione["Nome azienda"], seme=2)
+        anagrafica, codici_grafie = anagrafica_aziende(df_iniziative["Nome azienda"], df_composizione["Nome azienda"])
+        sporco = _backend(*compatta(df_iniziative, df_composizione, "sintetico"))
+        assert len(anagrafica) == n_aziende, f"{len(anagrafica)} aziende invece di {n_aziende}"
+        for funzione in (tre_indici, indici_per_anno):
+            assert _uguali(_per_chiave(funzione(backend)), _per_chiave(funzione(sporco))), \
+                f"{funzione.__name__}: indici diversi dai dati puliti"
+        print(f"{n_aziende:>8}  {len(codici_grafie)} grafie ricondotte a {len(anagrafica)} aziende: indici uguali")
+
+
+if __name__ == "__main__":
+    # il rapporto sulle aziende elencherebbe tutte le grafie unificate
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--aziende", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--ripetizioni", type=int, default=5)
+    argomenti = parser.parse_args()
+    main(argomenti.aziende, argomenti.ripetizioni)
@@ -0,0 +1,118 @@
+# Benchmark di tutte le callback della dashboard e di calcola_tre_indici su workbook
+# sintetici di dimensione crescente: tempo medio e picco di memoria (tracemalloc) per chiamata.
+# Ogni dimensione gira in un processo separato che importa app.py sul workbook generato,
+# con snapshot e cache in una cartella temporanea. Il tempo "a freddo" è misurato dopo
+# aver svuotato tutte le cache (figure, cache degli indici su disco e risultati della
+# versione dei dati in memoria, comprese le tabelle degli indici e le uscite predefinite
+# calcolate all'avvio); quello "a caldo" è la stessa chiamata ripetuta subito dopo.
+# Uso: python -m benchmarks.bench_callback [--dimensioni 1000 10000 100000] [--aziende 200]
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.dati_sintetici import genera_workbook
+from indici import calcola_tre_indici
+
+
+def _scenari(app):
+    dati = app.gestore_dati.corrente
+    azienda = dati.df_iniziative["Nome azienda"].iloc[0]
+    anno = int(dati.df_iniziative["Anno"].max())
+    return {
+        "update_overview (tutti)": (app.update_overview, ("all", "all", "all", "all", "all")),
+        "update_overview (4 filtri)": (app.update_overview, (azienda, "Welfare", "Genere", anno, "all")),
+        "update_initiatives (tutti)": (app.update_initiatives, ("all", "all", "all", "all", "all")),
+        "update_initiatives (anno)": (app.update_initiatives, ("all", "all", "all", anno, "all")),
+        "update_table_iniziative": (app.update_table_iniziative,
+                                    ("all", "all", "all", "all", "all", 0, 10, [], "")),
+        "update_genere (tutti)": (app.update_genere, ("all", "all", "all", "all")),
+        "update_table_genere": (app.update_table_genere, ("all", "all", "all", "all", 0, 10, [], "")),
+        "update_index (aggregato)": (app.update_index, ("aggregato", "all", "all", "all")),
+        "update_index (anno)": (app.update_index, ("anno", anno, "all", "all")),
+        "update_andamento": (app.update_andamento, ("Indice diversità finale", "all", "all")),
+        "update_andamento (azienda)": (app.update_andamento, ("Indice diversità finale", azienda, "all")),
+        "calcola_tre_indici": (calcola_tre_indici, (dati.df_iniziative, dati.df_composizione)),
+    }
+
+
+def _svuota_cache(app):
+    import grafici
+    grafici._cache_figure.clear()
+    app.cache_indici.clear()
+    app.gestore_dati.corrente.cache_locale.clear()
+
+
+# Eseguita nel processo figlio: l'app è già configurata tramite variabili d'ambiente
+def misura(ripetizioni):
+    inizio = time.perf_counter()
+    import app
+    risultati = {"avvio_s": time.perf_counter() - inizio, "callback": {}}
+
+    for nome, (funzione, argomenti) in _scenari(app).items():
+        freddo = []
+        caldo = []
+        for _ in range(ripetizioni):
+            _svuota_cache(app)
+            for tempi in (freddo, caldo):
+                t0 = time.perf_counter()
+                funzione(*argomenti)
+                tempi.append(time.perf_counter() - t0)
+
+        _svuota_cache(app)
+        tracemalloc.start()
+        funzione(*argomenti)
+        picco = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        risultati["callback"][nome] = {
+            "ms": sorted(freddo)[len(freddo) // 2] * 1000,
+            "ms_caldo": sorted(caldo)[len(caldo) // 2] * 1000,
+            "picco_kb": picco / 1024,
+        }
+    print(json.dumps(risultati))
+
+
+def main(dimensioni, n_aziende, ripetizioni):
+    tabella = {}
+    with tempfile.TemporaryDirectory() as cartella:
+        for n_iniziative in dimensioni:
+            workbook = os.path.join(cartella, f"sintetico-{n_iniziative}.xlsx")
+            genera_workbook(workbook, n_iniziative, n_aziende)
+            ambiente = dict(
+                os.environ,
+                DASHBOARD_WORKBOOK=workbook,
+                DASHBOARD_SNAPSHOT_DIR=os.path.join(cartella, "snapshot"),
+                DASHBOARD_CACHE_DIR=os.path.join(cartella, f"cache-{n_iniziative}"),
+            )
+            uscita = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_callback", "--misura", str(ripetizioni)],
+                env=ambiente, capture_output=True, text=True, check=True,
+            )
+            tabella[n_iniziative] = json.loads(uscita.stdout.strip().splitlines()[-1])
+
+    print(f"{'callback':<30}" + "".join(f"{n:>32}" for n in dimensioni))
+    print(f"{'':<30}" + "".join(f"{'freddo / caldo ms / picco KB':>32}" for _ in dimensioni))
+    print(f"{'avvio (Excel, s)':<30}" + "".join(f"{tabella[n]['avvio_s']:>32.2f}" for n in dimensioni))
+    for nome in tabella[dimensioni[0]]["callback"]:
+        riga = "".join(
+            f"{m['ms']:>12.1f} / {m['ms_caldo']:>7.1f} / {m['picco_kb']:>7.0f}"
+            for m in (tabella[n]["callback"][nome] for n in dimensioni)
+        )
+        print(f"{nome:<30}{riga}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dimensioni", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--aziende", type=int, default=200)
+    parser.add_argument("--ripetizioni", type=int, default=5)
+    parser.add_argument("--misura", type=int, help=argparse.SUPPRESS)
+    argomenti = parser.parse_args()
+    if argomenti.misura:
+        misura(argomenti.misura)
+    else:
+        main(argomenti.dimensioni, argomenti.aziende, argomenti.ripetizioni)
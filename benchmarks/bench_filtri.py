@@ -0,0 +1,89 @@
+# Confronto tra la vecchia catena di maschere booleane e MotoreFiltri, e costo della
+# selezione multipla al crescere del numero di valori scelti.
+# Uso: python -m benchmarks.bench_filtri [numero_righe]
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.dati_sintetici import genera_iniziative
+from filtri import MotoreFiltri
+
+# Colonne filtrate negli scenari (le iniziative sintetiche non hanno la sorgente)
+COLONNE = ["Nome azienda", "Area Prassi", "Categoria di diversità", "Anno"]
+
+
+def filtra_con_maschere(df, azienda, area, categoria, anno):
+    df_filtered = df.copy()
+    if azienda != "all":
+        df_filtered = df_filtered[df_filtered["Nome azienda"] == azienda]
+    if area != "all":
+        df_filtered = df_filtered[df_filtered["Area Prassi"] == area]
+    if categoria != "all":
+        df_filtered = df_filtered[df_filtered["Categoria di diversità"] == categoria]
+    if anno != "all":
+        df_filtered = df_filtered[df_filtered["Anno"] == anno]
+    return df_filtered
+
+
+def main(n_righe=200_000, ripetizioni=20):
+    df = genera_iniziative(n_righe)
+    azienda = df["Nome azienda"].iloc[0]
+    scenari = {
+        "nessun filtro": ("all", "all", "all", "all"),
+        "solo anno": ("all", "all", "all", 2023),
+        "categoria + anno": ("all", "all", "Genere", 2023),
+        "tutti e quattro": (azienda, "Welfare", "Genere", 2023),
+    }
+
+    costruzione = timeit.timeit(lambda: MotoreFiltri(df, COLONNE), number=1)
+    motore = MotoreFiltri(df, COLONNE)
+    print(f"{n_righe} iniziative, costruzione indici: {costruzione * 1000:.1f} ms")
+    print(f"{'scenario':<20}{'maschere (ms)':>15}{'indici (ms)':>15}{'righe':>10}")
+
+    for nome, (az, area, cat, anno) in scenari.items():
+        filtri = dict(zip(COLONNE, (az, area, cat, anno)))
+        atteso = filtra_con_maschere(df, az, area, cat, anno)
+        ottenuto = motore.filtra(filtri)
+        pd.testing.assert_frame_equal(ottenuto, atteso)
+
+        t_maschere = timeit.timeit(lambda: filtra_con_maschere(df, az, area, cat, anno), number=ripetizioni)
+        t_indici = timeit.timeit(lambda: motore.filtra(filtri), number=ripetizioni)
+        print(f"{nome:<20}{t_maschere / ripetizioni * 1000:>15.2f}"
+              f"{t_indici / ripetizioni * 1000:>15.2f}{len(atteso):>10}")
+
+    multi_selezione(df, motore, ripetizioni)
+
+
+# Tempo per calcolare le posizioni con k aziende scelte, da sole e insieme a un anno,
+# contro la scansione di tutta la colonna (isin sui nomi o sui codici): l'unione degli
+# array di posizioni costa in proporzione alle righe scelte (colonna per mille righe
+# piatta al crescere di k) e, con l'anno, resta piatta anche in valore assoluto
+def multi_selezione(df, motore, ripetizioni):
+    aziende = df["Nome azienda"].unique().tolist()
+    codici_colonna = motore.categorie["Nome azienda"].codes
+    print(f"\n{'aziende scelte':<16}{'isin nomi (ms)':>16}{'scansione (ms)':>16}{'posizioni (ms)':>16}"
+          f"{'ms / 1000 righe':>17}{'+ anno (ms)':>14}{'righe':>10}")
+    for k in (1, 2, 10, 50, len(aziende) - 1):
+        scelte = aziende[:k]
+        atteso = np.flatnonzero(df["Nome azienda"].isin(scelte).to_numpy())
+        np.testing.assert_array_equal(motore.posizioni({"Nome azienda": scelte}), atteso)
+        filtri_anno = {"Nome azienda": scelte, "Anno": 2023}
+        atteso_anno = np.flatnonzero((df["Nome azienda"].isin(scelte) & (df["Anno"] == 2023)).to_numpy())
+        np.testing.assert_array_equal(motore.posizioni(filtri_anno), atteso_anno)
+
+        codici = motore.categorie["Nome azienda"].categories.get_indexer(scelte)
+        t_isin = timeit.timeit(lambda: df["Nome azienda"].isin(scelte), number=ripetizioni)
+        t_scansione = timeit.timeit(lambda: np.flatnonzero(np.isin(codici_colonna, codici, kind="table")),
+                                    number=ripetizioni)
+        t_posizioni = timeit.timeit(lambda: motore.posizioni({"Nome azienda": scelte}), number=ripetizioni)
+        t_anno = timeit.timeit(lambda: motore.posizioni(filtri_anno), number=ripetizioni)
+        per_mille = t_posizioni / ripetizioni * 1000 / max(len(atteso), 1) * 1000
+        print(f"{k:<16}{t_isin / ripetizioni * 1000:>16.3f}{t_scansione / ripetizioni * 1000:>16.3f}"
+              f"{t_posizioni / ripetizioni * 1000:>16.3f}{per_mille:>17.4f}"
+              f"{t_anno / ripetizioni * 1000:>14.3f}{len(atteso):>10}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,68 @@
+# Regressione del KPI "% aziende con linguaggio inclusivo" della Panoramica:
+# il vecchio ciclo `azienda in aziende_inclusive` (O(n·m)) contro il calcolo della
+# callback (aziende selezionate e aziende_inclusive del backend): con pandas la tabella
+# booleana del cubo letta per codice, con SQLite un solo COUNT con EXISTS. Il tempo del
+# cubo deve restare piatto al crescere delle aziende.
+# Uso: python -m benchmarks.bench_inclusivo
+import tempfile
+import timeit
+
+from benchmarks.dati_sintetici import genera_composizione, genera_iniziative
+from cubo import CuboIniziative
+from dati import compatta, normalizza_composizione
+from filtri import COLONNE_FILTRO_COMPOSIZIONE, COLONNE_FILTRO_INIZIATIVE, MotoreFiltri
+from interrogazioni import BackendPandas, apri_database, numero_aziende
+
+
+def percentuale_inclusive_ciclo(df_filtered, df_composizione, anno):
+    aziende_filtered = df_filtered["Nome azienda"].unique()
+    df_comp_filtered = df_composizione[df_composizione["Nome azienda"].isin(aziende_filtered)]
+    if anno != "all":
+        df_comp_filtered = df_comp_filtered[df_comp_filtered["Anno"] == anno]
+    df_inclusive_filtered = df_comp_filtered[df_comp_filtered["Linguaggio inclusivo"] == "Sì"]
+    aziende_inclusive = df_inclusive_filtered["Nome azienda"].unique()
+    num_inclusive = sum(azienda in aziende_inclusive for azienda in aziende_filtered)
+    return (num_inclusive / len(aziende_filtered)) * 100 if len(aziende_filtered) > 0 else 0
+
+
+# Come update_overview
+def percentuale_inclusive_backend(backend, anno):
+    filtri = {"Anno": anno}
+    num_aziende = int(backend.aggrega(numero_aziende(filtri))["aziende"].iloc[0])
+    if not num_aziende:
+        return 0
+    return backend.aziende_inclusive(filtri, anno) / num_aziende * 100
+
+
+def main(cartella, aziende=(100, 1_000, 5_000, 10_000), ripetizioni=5):
+    print(f"{'aziende':>8}{'anno':>6}{'ciclo (ms)':>13}{'cubo (ms)':>12}{'sqlite (ms)':>14}")
+    for n_aziende in aziende:
+        df_iniziative = genera_iniziative(n_aziende * 5, n_aziende=n_aziende)
+        df_composizione = genera_composizione(n_aziende)
+        # fogli e backend come in ricarica.VersioneDati
+        fogli = dict(zip(("iniziative", "composizione"),
+                         compatta(df_iniziative, normalizza_composizione(df_composizione.copy()), "sintetico")))
+        backend = BackendPandas(fogli, motori={
+            "iniziative": MotoreFiltri(fogli["iniziative"], COLONNE_FILTRO_INIZIATIVE),
+            "composizione": MotoreFiltri(fogli["composizione"], COLONNE_FILTRO_COMPOSIZIONE),
+        }, cubo=CuboIniziative(fogli["iniziative"], fogli["composizione"]))
+        sqlite = apri_database("sqlite", fogli, {"iniziative": COLONNE_FILTRO_INIZIATIVE,
+                                                 "composizione": COLONNE_FILTRO_COMPOSIZIONE},
+                               "inclusivo", cartella, str(n_aziende))
+        for anno in ("all", 2023):
+            df_filtered = df_iniziative if anno == "all" else df_iniziative[df_iniziative["Anno"] == anno]
+            atteso = percentuale_inclusive_ciclo(df_filtered, df_composizione, anno)
+            tempi = []
+            for calcolo in (
+                lambda: percentuale_inclusive_ciclo(df_filtered, df_composizione, anno),
+                lambda: percentuale_inclusive_backend(backend, anno),
+                lambda: percentuale_inclusive_backend(sqlite, anno),
+            ):
+                assert abs(calcolo() - atteso) < 1e-9
+                tempi.append(timeit.timeit(calcolo, number=ripetizioni) / ripetizioni * 1000)
+            print(f"{n_aziende:>8}{anno:>6}{tempi[0]:>13.2f}{tempi[1]:>12.3f}{tempi[2]:>14.3f}")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as cartella_database:
+        main(cartella_database)
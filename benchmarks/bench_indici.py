@@ -0,0 +1,86 @@
+# Verifica di equivalenza e scalabilità di calcola_tre_indici (versione vettorizzata)
+# rispetto alla versione originale con groupby().apply.
+# Uso: python -m benchmarks.bench_indici
+import timeit
+
+import pandas as pd
+
+from benchmarks.dati_sintetici import genera_composizione, genera_iniziative
+from dati import normalizza_composizione
+from indici import calcola_tre_indici
+
+
+# Implementazione originale, mantenuta come riferimento
+def calcola_tre_indici_originale(df_iniziative, df_genere):
+    n_iniziative = df_iniziative.groupby("Nome azienda")["Titolo dell'attività"].count()
+    min_iniz, max_iniz = n_iniziative.min(), n_iniziative.max()
+    indice_iniziative = (
+        ((n_iniziative - min_iniz) / (max_iniz - min_iniz)) * 100
+        if max_iniz != min_iniz else 0
+    )
+
+    categorie_rilevanti = ["Genere", "Età", "Disabilità", "Cultura", "LGBTQI+"]
+    def _idx_cat(gruppo):
+        presenti = (
+            gruppo.loc[gruppo["Categoria di diversità"].isin(categorie_rilevanti),
+                       "Categoria di diversità"]
+            .unique()
+        )
+        return (len(presenti) / len(categorie_rilevanti)) * 100
+    indice_categorie = df_iniziative.groupby("Nome azienda").apply(_idx_cat)
+
+    df_board = df_genere[df_genere["Posizione"] == "Board"].copy()
+    df_board["Percentuale donne"] = (
+        pd.to_numeric(
+            df_board["Percentuale donne"].astype(str).str.replace('%', ''),
+            errors="coerce"
+        )
+    )
+    if df_board["Percentuale donne"].max() <= 1:
+        df_board["Percentuale donne"] *= 100
+
+    def _idx_parita(gruppo):
+        perc = gruppo["Percentuale donne"].mean()
+        return 100 - abs(50 - perc) * 2
+
+    indice_parita_genere = df_board.groupby("Nome azienda").apply(_idx_parita)
+
+    risultati = (
+        pd.DataFrame({
+            "Indice iniziative": indice_iniziative,
+            "Indice categorie": indice_categorie,
+            "Indice parità genere": indice_parita_genere,
+        })
+        .fillna(0)
+        .reset_index(names="Nome azienda")
+    )
+    risultati["Indice diversità finale"] = risultati[
+        ["Indice iniziative", "Indice categorie", "Indice parità genere"]
+    ].mean(axis=1)
+    return risultati
+
+
+def main(aziende=(20, 100, 1_000, 10_000), iniziative_per_azienda=10, ripetizioni=3):
+    print(f"{'aziende':>8}{'originale (ms)':>17}{'vettorizzata (ms)':>20}{'speedup':>10}")
+    for n_aziende in aziende:
+        df_iniziative = genera_iniziative(n_aziende * iniziative_per_azienda, n_aziende=n_aziende)
+        # alcune aziende senza dati di genere e alcune senza iniziative
+        df_genere = genera_composizione(n_aziende + n_aziende // 10)
+        df_genere = df_genere[df_genere["Nome azienda"] >= f"Azienda {n_aziende // 10:05d}"]
+
+        # la versione attuale lavora sui dati già normalizzati (percentuali float32 0–100)
+        df_genere_norm = normalizza_composizione(df_genere.copy())
+
+        pd.testing.assert_frame_equal(
+            calcola_tre_indici(df_iniziative, df_genere_norm),
+            calcola_tre_indici_originale(df_iniziative, df_genere),
+        )
+        t_orig = timeit.timeit(lambda: calcola_tre_indici_originale(df_iniziative, df_genere),
+                               number=ripetizioni) / ripetizioni
+        t_vett = timeit.timeit(lambda: calcola_tre_indici(df_iniziative, df_genere_norm),
+                               number=ripetizioni) / ripetizioni
+        print(f"{n_aziende:>8}{t_orig * 1000:>17.1f}{t_vett * 1000:>20.1f}{t_orig / t_vett:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
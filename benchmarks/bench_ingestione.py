@@ -0,0 +1,78 @@
+# Ingestione di una cartella di workbook sintetici (ingestione.py): pool di processi
+# contro un processo solo, seconda ingestione senza modifiche (nessun workbook riletto) e
+# dopo la modifica di un workbook (solo quello riletto). Verifica che i due dataset
+# coincidano, che il dataset caricato abbia le righe del manifest e che con una sola
+# sorgente scelta (DASHBOARD_SORGENTI) vengano caricate solo le sue righe.
+# Uso: python -m benchmarks.bench_ingestione [--workbook 4] [--iniziative 50000] [--processi 4]
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.dati_sintetici import genera_workbook
+from dati import FOGLI, carica_dataset
+from ingestione import ingerisci
+
+
+def _righe_manifest(partizioni, sorgenti=None):
+    return {
+        foglio: sum(voce["righe"][foglio] for sorgente, voce in partizioni.items()
+                    if sorgenti is None or sorgente in sorgenti)
+        for foglio in FOGLI.values()
+    }
+
+
+def _ingerisci(nome, cartella, dataset, processi):
+    inizio = time.perf_counter()
+    partizioni, letti, errori = ingerisci(cartella, dataset, processi)
+    print(f"{nome:<28}{letti:>8}{errori:>8}{time.perf_counter() - inizio:>11.1f}")
+    return partizioni, letti, errori
+
+
+def main(n_workbook, n_iniziative, n_aziende, processi):
+    with tempfile.TemporaryDirectory() as cartella_tmp:
+        cartella = os.path.join(cartella_tmp, "workbook")
+        os.makedirs(cartella)
+        for seme in range(n_workbook):
+            genera_workbook(os.path.join(cartella, f"comune-{seme}.xlsx"), n_iniziative, n_aziende, seme=seme)
+        print(f"{n_workbook} workbook da {n_iniziative} iniziative, {os.cpu_count()} CPU")
+        print(f"{'ingestione':<28}{'letti':>8}{'errori':>8}{'tempo (s)':>11}")
+
+        sequenziale = os.path.join(cartella_tmp, "sequenziale")
+        parallelo = os.path.join(cartella_tmp, "parallelo")
+        _ingerisci("un processo", cartella, sequenziale, 1)
+        partizioni, _, _ = _ingerisci(f"pool ({processi or os.cpu_count()} processi)", cartella, parallelo, processi)
+        _, letti, _ = _ingerisci("di nuovo, senza modifiche", cartella, parallelo, processi)
+        assert letti == 0, "workbook invariati riletti"
+        genera_workbook(os.path.join(cartella, "comune-0.xlsx"), n_iniziative + 1, n_aziende, seme=n_workbook)
+        partizioni, letti, _ = _ingerisci("un workbook modificato", cartella, parallelo, processi)
+        assert letti == 1, "riletti workbook non modificati"
+
+        df_iniziative, df_composizione, _ = carica_dataset(parallelo)
+        attese = _righe_manifest(partizioni)
+        assert [len(df_iniziative), len(df_composizione)] == list(attese.values()), "righe diverse dal manifest"
+        genera_workbook(os.path.join(cartella, "comune-0.xlsx"), n_iniziative, n_aziende, seme=0)
+        partizioni, _, _ = _ingerisci("ripristino del workbook", cartella, parallelo, processi)
+        for a, b in zip(carica_dataset(sequenziale)[:2], carica_dataset(parallelo)[:2]):
+            assert a.equals(b), "dataset diversi tra pool e processo singolo"
+
+        scelta = sorted(partizioni)[:1]
+        inizio = time.perf_counter()
+        tutte = carica_dataset(parallelo)
+        t_tutte = time.perf_counter() - inizio
+        inizio = time.perf_counter()
+        potate = carica_dataset(parallelo, sorgenti=scelta)
+        t_potate = time.perf_counter() - inizio
+        assert [len(df) for df in potate[:2]] == list(_righe_manifest(partizioni, scelta).values())
+        print(f"\ncaricamento: {len(tutte[0])} iniziative in {t_tutte * 1000:.0f} ms; "
+              f"sola sorgente {scelta[0]}: {len(potate[0])} in {t_potate * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workbook", type=int, default=4)
+    parser.add_argument("--iniziative", type=int, default=50_000)
+    parser.add_argument("--aziende", type=int, default=200)
+    parser.add_argument("--processi", type=int)
+    argomenti = parser.parse_args()
+    main(argomenti.workbook, argomenti.iniziative, argomenti.aziende, argomenti.processi)
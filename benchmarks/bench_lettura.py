@@ -0,0 +1,82 @@
+# Lettura del workbook: pd.read_excel sull'intero foglio (come faceva dati.leggi_fogli in
+# origine) contro la lettura in streaming a blocchi di dati.leggi_fogli (openpyxl
+# read-only). Per ogni dimensione e metodo un processo legge e normalizza i due fogli e
+# riporta tempo, picco di memoria oltre a quella di partenza (ru_maxrss) e un'impronta
+# dei fogli compattati, che deve coincidere tra i due metodi.
+# Uso: python -m benchmarks.bench_lettura [--dimensioni 50000 200000] [--blocco 10000]
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from dati import (
+    FOGLI, FOGLIO_COMPOSIZIONE, FOGLIO_INIZIATIVE, NORMALIZZAZIONI, RIGHE_PER_BLOCCO, compatta, leggi_fogli,
+    nome_sorgente
+)
+from metriche import memoria_processo
+
+METODI = ["read_excel", "streaming"]
+
+
+def _leggi(metodo, workbook, blocco):
+    if metodo == "streaming":
+        return leggi_fogli(workbook, righe_per_blocco=blocco)
+    letti = pd.read_excel(workbook, sheet_name=list(FOGLI))
+    return {foglio: NORMALIZZAZIONI[foglio](df) for foglio, df in letti.items()}
+
+
+def misura(metodo, workbook, blocco):
+    partenza = memoria_processo()["rss"]
+    inizio = time.perf_counter()
+    fogli = _leggi(metodo, workbook, blocco)
+    durata = time.perf_counter() - inizio
+    picco = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    compattati = compatta(fogli[FOGLIO_INIZIATIVE], fogli[FOGLIO_COMPOSIZIONE], nome_sorgente(workbook))
+    impronta = [int(pd.util.hash_pandas_object(df, index=False).sum()) for df in compattati]
+    print(json.dumps({"secondi": durata, "picco": picco - partenza, "righe": [len(df) for df in compattati],
+                      "impronta": impronta}))
+
+
+def main(dimensioni, n_aziende, blocco):
+    print(f"{'iniziative':>10}{'xlsx (MB)':>11}  {'metodo':<12}{'tempo (s)':>10}{'picco (MB)':>12}{'uguali':>8}")
+    with tempfile.TemporaryDirectory() as cartella:
+        for n_iniziative in dimensioni:
+            workbook = os.path.join(cartella, f"sintetico-{n_iniziative}.xlsx")
+            # generato in un altro processo: ru_maxrss passa ai figli, e il picco di questo
+            # processo finirebbe nella misura
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.dati_sintetici", workbook,
+                 "--iniziative", str(n_iniziative), "--aziende", str(n_aziende)],
+                check=True,
+            )
+            dimensione = os.path.getsize(workbook) / 2**20
+            impronte = []
+            for metodo in METODI:
+                uscita = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_lettura",
+                     "--misura", metodo, workbook, "--blocco", str(blocco)],
+                    capture_output=True, text=True, check=True,
+                )
+                r = json.loads(uscita.stdout.strip().splitlines()[-1])
+                impronte.append(r["impronta"])
+                print(f"{n_iniziative:>10}{dimensione:>11.1f}  {metodo:<12}{r['secondi']:>10.1f}"
+                      f"{r['picco'] / 2**20:>12.1f}{'sì' if impronte[-1] == impronte[0] else 'NO':>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dimensioni", type=int, nargs="+", default=[50_000, 200_000])
+    parser.add_argument("--aziende", type=int, default=200)
+    parser.add_argument("--blocco", type=int, default=RIGHE_PER_BLOCCO)
+    parser.add_argument("--misura", nargs=2, metavar=("METODO", "WORKBOOK"), help=argparse.SUPPRESS)
+    argomenti = parser.parse_args()
+    if argomenti.misura:
+        misura(*argomenti.misura, argomenti.blocco)
+    else:
+        main(argomenti.dimensioni, argomenti.aziende, argomenti.blocco)
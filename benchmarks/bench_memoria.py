@@ -0,0 +1,94 @@
+# Memoria dei dati per worker: layout letto così com'è da Excel (come faceva app.py in
+# origine) contro il layout compatto di dati.compatta. Per ogni dimensione e layout un
+# processo carica i dati, li congela come fa gunicorn.conf.py e genera alcuni worker con
+# fork; ogni worker esegue filtri e aggregazioni tipiche delle callback e riporta la
+# propria memoria (uss = pagine private, pss = quota delle condivise).
+# Uso: python -m benchmarks.bench_memoria [--dimensioni 10000 100000] [--worker 4]
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+from benchmarks.dati_sintetici import genera_workbook
+from dati import FOGLIO_COMPOSIZIONE, FOGLIO_INIZIATIVE, leggi_excel, memoria_dataframe
+from metriche import memoria_processo
+
+LAYOUT = ["excel", "compatta"]
+
+
+def _carica(layout, workbook):
+    if layout == "compatta":
+        return leggi_excel(workbook)
+    fogli = pd.read_excel(workbook, sheet_name=[FOGLIO_INIZIATIVE, FOGLIO_COMPOSIZIONE])
+    return fogli[FOGLIO_INIZIATIVE], fogli[FOGLIO_COMPOSIZIONE]
+
+
+# Lavoro di un worker: le stesse operazioni che fanno le callback sui due fogli
+def _lavoro(df_iniziative, df_composizione):
+    for anno in df_iniziative["Anno"].unique():
+        selezione = df_iniziative[df_iniziative["Anno"] == anno]
+        selezione.groupby("Nome azienda", observed=True)["Titolo dell'attività"].count()
+        selezione.groupby("Area Prassi", observed=True).size()
+        selezione.iloc[:10].to_dict("records")
+    board = df_composizione[df_composizione["Posizione"] == "Board"]
+    board.groupby("Nome azienda", observed=True)["Numero donne"].sum()
+
+
+def misura(layout, workbook, n_worker):
+    df_iniziative, df_composizione = _carica(layout, workbook)
+    dati_mb = sum(memoria_dataframe(df).sum() for df in (df_iniziative, df_composizione)) / 2**20
+    gc.freeze()
+    master = memoria_processo()
+
+    worker = []
+    for _ in range(n_worker):
+        lettura, scrittura = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(lettura)
+            _lavoro(df_iniziative, df_composizione)
+            os.write(scrittura, json.dumps(memoria_processo()).encode())
+            os._exit(0)
+        os.close(scrittura)
+        with os.fdopen(lettura) as f:
+            worker.append(json.loads(f.read()))
+        os.waitpid(pid, 0)
+    print(json.dumps({"dati_mb": dati_mb, "master": master, "worker": worker}))
+
+
+def main(dimensioni, n_aziende, n_worker):
+    print(f"{'iniziative':>10}  {'layout':<10}{'dati (MB)':>10}{'master rss':>12}"
+          f"{'worker uss':>12}{'worker pss':>12}   (MB, media sui {n_worker} worker)")
+    with tempfile.TemporaryDirectory() as cartella:
+        for n_iniziative in dimensioni:
+            workbook = os.path.join(cartella, f"sintetico-{n_iniziative}.xlsx")
+            genera_workbook(workbook, n_iniziative, n_aziende)
+            for layout in LAYOUT:
+                uscita = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_memoria",
+                     "--misura", layout, workbook, "--worker", str(n_worker)],
+                    capture_output=True, text=True, check=True,
+                )
+                r = json.loads(uscita.stdout.strip().splitlines()[-1])
+                uss = sum(w["uss"] for w in r["worker"]) / len(r["worker"]) / 2**20
+                pss = sum(w["pss"] for w in r["worker"]) / len(r["worker"]) / 2**20
+                print(f"{n_iniziative:>10}  {layout:<10}{r['dati_mb']:>10.1f}"
+                      f"{r['master']['rss'] / 2**20:>12.1f}{uss:>12.1f}{pss:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dimensioni", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--aziende", type=int, default=200)
+    parser.add_argument("--worker", type=int, default=4)
+    parser.add_argument("--misura", nargs=2, metavar=("LAYOUT", "WORKBOOK"), help=argparse.SUPPRESS)
+    argomenti = parser.parse_args()
+    if argomenti.misura:
+        misura(*argomenti.misura, argomenti.worker)
+    else:
+        main(argomenti.dimensioni, argomenti.aziende, argomenti.worker)
@@ -0,0 +1,56 @@
+# Dimensione delle risposte di ogni callback: JSON con il template completo (prima),
+# con il template ridotto (grafici.template_ridotto) e dopo la compressione gzip/brotli
+# ai livelli predefiniti di flask-compress. Gira sul workbook configurato (DASHBOARD_WORKBOOK).
+# Uso: python -m benchmarks.bench_payload
+import gzip
+
+import brotli
+from plotly.io.json import to_json_plotly
+
+import app
+from grafici import TEMPLATE_JSON
+
+
+def _scenari():
+    dati = app.gestore_dati.corrente
+    azienda = dati.df_iniziative["Nome azienda"].iloc[0]
+    anno = int(dati.df_iniziative["Anno"].max())
+    return {
+        "update_overview": (app.update_overview, ("all", "all", "all", "all", "all")),
+        "update_initiatives": (app.update_initiatives, ("all", "all", "all", "all", "all")),
+        "update_table_iniziative": (app.update_table_iniziative, ("all", "all", "all", "all", "all", 0, 10, [], "")),
+        "update_genere": (app.update_genere, ("all", "all", "all", "all")),
+        "update_table_genere": (app.update_table_genere, ("all", "all", "all", "all", 0, 10, [], "")),
+        "update_index (aggregato)": (app.update_index, ("aggregato", "all", "all", "all")),
+        "update_index (anno, azienda)": (app.update_index, ("anno", anno, azienda, "all")),
+        "update_andamento": (app.update_andamento, ("Indice diversità finale", "all", "all")),
+        "store-cubo": (app.dati_store_cubo, (dati,)),
+    }
+
+
+# Stessa risposta con il template completo in ogni figura, com'era prima della riduzione
+def _con_template_completo(valore):
+    if isinstance(valore, dict):
+        if "template" in valore:
+            return {**valore, "template": TEMPLATE_JSON}
+        return {chiave: _con_template_completo(v) for chiave, v in valore.items()}
+    if isinstance(valore, (list, tuple)):
+        return [_con_template_completo(v) for v in valore]
+    return valore
+
+
+def main():
+    print(f"{'callback':<30}{'prima (B)':>12}{'dopo (B)':>12}{'gzip (B)':>12}{'brotli (B)':>12}{'riduzione':>11}")
+    for nome, (funzione, argomenti) in _scenari().items():
+        risposta = funzione(*argomenti)
+        prima = to_json_plotly(_con_template_completo(risposta)).encode()
+        dopo = to_json_plotly(risposta).encode()
+        compressa_gzip = gzip.compress(dopo, compresslevel=6)
+        compressa_brotli = brotli.compress(dopo, quality=4)
+        riduzione = 1 - len(compressa_brotli) / len(prima)
+        print(f"{nome:<30}{len(prima):>12}{len(dopo):>12}{len(compressa_gzip):>12}"
+              f"{len(compressa_brotli):>12}{riduzione:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
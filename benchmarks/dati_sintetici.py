@@ -0,0 +1,98 @@
+# Generatore di dati sintetici con lo stesso schema del workbook reale
+# ("Attività generali" e "Genere nelle aziende "), per benchmark a dimensioni arbitrarie.
+# Uso: python -m benchmarks.dati_sintetici destinazione.xlsx --iniziative 100000 --aziende 500
+import argparse
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+
+from dati import COLONNE_PERCENTUALI, FOGLIO_COMPOSIZIONE, FOGLIO_INIZIATIVE
+
+AREE = ["Cultura e strategia", "Welfare", "Formazione", "Selezione", "Comunicazione", "Governance"]
+CATEGORIE = ["Genere", "Età", "Disabilità", "Cultura", "LGBTQI+", "Religione e credo", "Etnia"]
+POSIZIONI = ["Board", "Executive", "Presidente", "Vice Presidente", "Amministratore delegato", "Consigliere"]
+ANNI = range(2019, 2026)
+
+
+def nomi_aziende(n_aziende):
+    return np.array([f"Azienda {i:05d} S.p.a." for i in range(n_aziende)])
+
+
+# --- Foglio "Attività generali" sintetico ---
+def genera_iniziative(n_righe, n_aziende=200, anni=ANNI, seme=0):
+    rng = np.random.default_rng(seme)
+    aziende = nomi_aziende(n_aziende)
+    anni = np.array(list(anni))
+    return pd.DataFrame({
+        "Nome azienda": aziende[rng.integers(0, n_aziende, n_righe)],
+        "Area Prassi": np.array(AREE)[rng.integers(0, len(AREE), n_righe)],
+        "Categoria di diversità": np.array(CATEGORIE)[rng.integers(0, len(CATEGORIE), n_righe)],
+        "Titolo dell'attività": [f"Iniziativa {i}" for i in range(n_righe)],
+        "Descrizione dell'attività": "Descrizione",
+        "Fonte": "Bilancio di sostenibilità",
+        "Anno": anni[rng.integers(0, len(anni), n_righe)],
+    })
+
+
+# --- Foglio "Genere nelle aziende " sintetico: una riga per azienda, posizione e anno ---
+def genera_composizione(n_aziende=200, anni=ANNI, seme=0):
+    rng = np.random.default_rng(seme)
+    griglia = pd.MultiIndex.from_product(
+        [nomi_aziende(n_aziende), POSIZIONI, list(anni)],
+        names=["Nome azienda", "Posizione", "Anno"],
+    ).to_frame(index=False)
+    n_righe = len(griglia)
+    donne = rng.integers(0, 8, n_righe)
+    uomini = rng.integers(1, 10, n_righe)
+    return pd.DataFrame({
+        "Nome azienda": griglia["Nome azienda"],
+        "Numero donne": donne,
+        "Numero uomini": uomini,
+        "Percentuale donne": donne / (donne + uomini),
+        "Percentuale uomini": uomini / (donne + uomini),
+        "Posizione": griglia["Posizione"],
+        "Anno": griglia["Anno"],
+        "Linguaggio inclusivo": np.where(rng.random(n_righe) < 0.5, "Sì", "No"),
+    })
+
+
+# --- Workbook completo ---
+# Come nel file reale, una parte dei nomi azienda ha spazi in coda che la lettura deve
+# ripulire e le percentuali sono frazioni in celle con formato percentuale
+def _cella_percentuale(worksheet, valore):
+    cella = WriteOnlyCell(worksheet, valore)
+    cella.number_format = "0%"
+    return cella
+
+
+def genera_workbook(percorso, n_iniziative, n_aziende=200, seme=0):
+    df_iniziative = genera_iniziative(n_iniziative, n_aziende=n_aziende, seme=seme)
+    df_composizione = genera_composizione(n_aziende, seme=seme)
+    for df in (df_iniziative, df_composizione):
+        sporchi = np.arange(len(df)) % 7 == 0
+        df.loc[sporchi, "Nome azienda"] = df.loc[sporchi, "Nome azienda"] + " "
+    # openpyxl in modalità write-only: le righe vanno subito su disco, anche per workbook grandi
+    workbook = Workbook(write_only=True)
+    for foglio, df in ((FOGLIO_INIZIATIVE, df_iniziative), (FOGLIO_COMPOSIZIONE, df_composizione)):
+        worksheet = workbook.create_sheet(foglio)
+        worksheet.append(list(df.columns))
+        percentuali = [i for i, colonna in enumerate(df.columns) if colonna in COLONNE_PERCENTUALI]
+        for riga in df.astype(object).itertuples(index=False, name=None):
+            riga = list(riga)
+            for i in percentuali:
+                riga[i] = _cella_percentuale(worksheet, riga[i])
+            worksheet.append(riga)
+    workbook.save(percorso)
+    return percorso
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un workbook sintetico della dashboard D&I")
+    parser.add_argument("destinazione")
+    parser.add_argument("--iniziative", type=int, default=10_000)
+    parser.add_argument("--aziende", type=int, default=200)
+    parser.add_argument("--seme", type=int, default=0)
+    argomenti = parser.parse_args()
+    genera_workbook(argomenti.destinazione, argomenti.iniziative, argomenti.aziende, argomenti.seme)
@@ -0,0 +1,162 @@
+# Parità tra i backend delle interrogazioni (interrogazioni.py): tutte le interrogazioni
+# delle callback su una griglia di filtri (singoli, multipli, valori assenti), il KPI
+# delle aziende inclusive (aziende_inclusive) sulla stessa griglia e i due calcoli degli
+# indici, eseguiti con pandas (cubo + indici di filtro), pandas sulle sole righe, DuckDB
+# e SQLite; i risultati devono coincidere con quelli di riferimento.
+# Stampa anche il tempo totale di ogni backend. Esce con errore se un risultato è diverso
+# o se manca il pacchetto di un backend (duckdb: requirements-duckdb.txt), così può girare
+# come controllo in CI (vedi README.md).
+# Uso: python -m benchmarks.parita_backend [--iniziative 100000 --aziende 500 --sorgenti 3]
+#      (senza argomenti usa il workbook configurato; con --sorgenti i dati sintetici
+#      sono divisi in più sorgenti, come un dataset di più workbook)
+import argparse
+import itertools
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.dati_sintetici import genera_composizione, genera_iniziative
+from cubo import CuboIniziative
+from dati import COLONNA_SORGENTE, carica_dati, compatta, normalizza_composizione, normalizza_iniziative
+from filtri import COLONNE_FILTRO_COMPOSIZIONE, COLONNE_FILTRO_INIZIATIVE, MotoreFiltri
+from indici import indici_per_anno, tre_indici
+from interrogazioni import (
+    BACKEND_SQL, BackendPandas, apri_database, iniziative_per_anno, medie_genere, numero_aziende,
+    numero_iniziative, righe_per, totali_genere
+)
+
+
+def _backend(df_iniziative, df_composizione, cartella):
+    fogli = {"iniziative": df_iniziative, "composizione": df_composizione}
+    indici = {"iniziative": COLONNE_FILTRO_INIZIATIVE, "composizione": COLONNE_FILTRO_COMPOSIZIONE}
+    backend = {
+        "pandas": BackendPandas(fogli, motori={
+            "iniziative": MotoreFiltri(df_iniziative, COLONNE_FILTRO_INIZIATIVE),
+            "composizione": MotoreFiltri(df_composizione, COLONNE_FILTRO_COMPOSIZIONE),
+        }, cubo=CuboIniziative(df_iniziative, df_composizione)),
+        "pandas (righe)": BackendPandas(fogli),
+    }
+    for nome in BACKEND_SQL:
+        backend[nome] = apri_database(nome, fogli, indici, "parita", cartella, "prova")
+    return backend
+
+
+# Valori di prova per un filtro: tutti, uno, alcuni, uno assente, un assente tra i presenti
+# (l'assente è dello stesso tipo della colonna, come i valori dei dropdown)
+def _scelte(valori):
+    valori = sorted(pd.unique(valori.dropna()).tolist())
+    assente = valori[-1] + 1 if isinstance(valori[-1], (int, float)) else "assente"
+    return ["all", valori[0], valori[1:4], [assente], [valori[-1], assente]]
+
+
+# Tutte le combinazioni di scelte sulle colonne filtrabili; le scelte della sorgente sono
+# combinate solo con le prime due scelte delle altre colonne, per non moltiplicare la griglia
+def _griglia(df, colonne):
+    altre = [col for col in colonne if col != COLONNA_SORGENTE]
+    for valori in itertools.product(*(_scelte(df[col]) for col in altre)):
+        yield {**dict(zip(altre, valori)), COLONNA_SORGENTE: "all"}
+    for sorgente in _scelte(df[COLONNA_SORGENTE])[1:]:
+        for valori in itertools.product(*(_scelte(df[col])[:2] for col in altre)):
+            yield {**dict(zip(altre, valori)), COLONNA_SORGENTE: sorgente}
+
+
+def interrogazioni_di_prova(df_iniziative, df_composizione):
+    for filtri in _griglia(df_iniziative, COLONNE_FILTRO_INIZIATIVE):
+        yield numero_aziende(filtri)
+        yield numero_iniziative(filtri)
+        yield iniziative_per_anno(filtri)
+        for colonna in ("Area Prassi", "Categoria di diversità", "Anno"):
+            yield righe_per(colonna, filtri)
+    for filtri in _griglia(df_composizione, COLONNE_FILTRO_COMPOSIZIONE):
+        yield totali_genere(filtri)
+        yield medie_genere(filtri)
+
+
+# Confronto per valore: chiavi come testo (category, str e interi dei diversi motori),
+# misure numeriche con tolleranza (le medie float32 sono sommate in ordine diverso)
+def uguali(atteso, ottenuto):
+    if list(atteso.columns) != list(ottenuto.columns) or len(atteso) != len(ottenuto):
+        return False
+    for colonna in atteso.columns:
+        a, o = atteso[colonna], ottenuto[colonna]
+        if pd.api.types.is_numeric_dtype(a) and pd.api.types.is_numeric_dtype(o):
+            if not np.allclose(a.to_numpy(dtype=float), o.to_numpy(dtype=float), rtol=1e-9, atol=1e-9,
+                               equal_nan=True):
+                return False
+        elif a.astype(str).tolist() != o.astype(str).tolist():
+            return False
+    return True
+
+
+def main(df_iniziative, df_composizione):
+    with tempfile.TemporaryDirectory() as cartella:
+        inizio = time.perf_counter()
+        backend = _backend(df_iniziative, df_composizione, cartella)
+        print(f"costruzione dei backend (database inclusi): {time.perf_counter() - inizio:.2f} s")
+
+        prove = list(interrogazioni_di_prova(df_iniziative, df_composizione))
+        # come update_overview: anno e sorgente delle iniziative valgono anche per composizione
+        prove_inclusive = [(filtri, filtri["Anno"], filtri[COLONNA_SORGENTE])
+                           for filtri in _griglia(df_iniziative, COLONNE_FILTRO_INIZIATIVE)]
+        riferimento = backend.pop("pandas (righe)")
+        attesi = [riferimento.aggrega(q) for q in prove]
+        inclusive_attese = [riferimento.aziende_inclusive(*prova) for prova in prove_inclusive]
+        sorgente = [df_iniziative[COLONNA_SORGENTE].iloc[0]]
+        indici_attesi = (tre_indici(riferimento), indici_per_anno(riferimento),
+                         tre_indici(riferimento, {COLONNA_SORGENTE: sorgente}))
+
+        print(f"{'backend':<12}{'interrogazioni':>16}{'diverse':>9}{'tempo (ms)':>12}{'indici':>8}{'indici (ms)':>13}")
+        errori = 0
+        totale = len(prove) + len(prove_inclusive)
+        for nome, motore in backend.items():
+            t0 = time.perf_counter()
+            risultati = [motore.aggrega(q) for q in prove]
+            inclusive = [motore.aziende_inclusive(*prova) for prova in prove_inclusive]
+            t_interrogazioni = time.perf_counter() - t0
+            diverse = [q for q, a, r in zip(prove, attesi, risultati) if not uguali(a, r)]
+            diverse += [("aziende_inclusive", *prova) for prova, a, r in
+                        zip(prove_inclusive, inclusive_attese, inclusive) if a != r]
+
+            t0 = time.perf_counter()
+            indici = (tre_indici(motore), indici_per_anno(motore), tre_indici(motore, {COLONNA_SORGENTE: sorgente}))
+            t_indici = time.perf_counter() - t0
+            indici_uguali = all(uguali(a, r) for a, r in zip(indici_attesi, indici))
+
+            print(f"{nome:<12}{totale:>16}{len(diverse):>9}{t_interrogazioni * 1000:>12.1f}"
+                  f"{'ok' if indici_uguali else 'DIVERSI':>8}{t_indici * 1000:>13.1f}")
+            for q in diverse[:3]:
+                print("   ", q)
+            errori += len(diverse) + (not indici_uguali)
+        if errori:
+            raise SystemExit(f"{errori} risultati diversi dal riferimento")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iniziative", type=int)
+    parser.add_argument("--aziende", type=int, default=200)
+    parser.add_argument("--sorgenti", type=int, default=1)
+    argomenti = parser.parse_args()
+    if argomenti.iniziative:
+        # una sorgente per seme, con le stesse aziende (come più comuni o periodi)
+        sorgenti = [f"sintetico-{seme}" for seme in range(argomenti.sorgenti)]
+        df_iniziative, df_composizione = compatta(
+            pd.concat([
+                normalizza_iniziative(genera_iniziative(
+                    argomenti.iniziative // argomenti.sorgenti, n_aziende=argomenti.aziende, seme=seme
+                )).assign(**{COLONNA_SORGENTE: nome})
+                for seme, nome in enumerate(sorgenti)
+            ], ignore_index=True),
+            pd.concat([
+                normalizza_composizione(genera_composizione(argomenti.aziende, seme=seme))
+                .assign(**{COLONNA_SORGENTE: nome})
+                for seme, nome in enumerate(sorgenti)
+            ], ignore_index=True),
+            "sintetico",
+        )
+    else:
+        with tempfile.TemporaryDirectory() as snapshot:
+            df_iniziative, df_composizione, _ = carica_dati(cartella=snapshot)
+    main(df_iniziative, df_composizione)
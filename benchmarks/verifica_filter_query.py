@@ -0,0 +1,45 @@
+# Verifica del filtro lato server delle DataTable (tabelle.applica_filter_query, usato
+# anche da /esporta): ogni filter_query di prova deve scegliere le stesse righe della
+# maschera pandas scritta a mano. Tra le prove, nomi di colonna che contengono un
+# operatore ("le " in "Percentuale donne"), valori che ne contengono uno, testo in una
+# colonna numerica e numeri con contains. Esce con errore alla prima differenza.
+# Uso: python -m benchmarks.verifica_filter_query
+from benchmarks.dati_sintetici import genera_composizione
+from dati import normalizza_composizione
+from tabelle import applica_filter_query
+
+
+def prove(df):
+    donne = df["Percentuale donne"]
+    uomini = df["Percentuale uomini"]
+    posizione = df["Posizione"].astype(str)
+    return {
+        "{Percentuale donne} > 30": donne > 30,
+        "{Percentuale donne} gt 30": donne > 30,
+        "{Percentuale uomini} <= 50": uomini <= 50,
+        "{Percentuale uomini} le 50": uomini <= 50,
+        "{Percentuale donne} >= 20 && {Percentuale uomini} < 70": (donne >= 20) & (uomini < 70),
+        '{Posizione} = "Vice Presidente"': posizione == "Vice Presidente",
+        '{Posizione} contains "ce Pres"': posizione.str.contains("ce Pres", case=False, regex=False),
+        '{Posizione} ne "Board"': posizione != "Board",
+        "{Anno} > abc": df["Anno"] != df["Anno"],
+        "{Anno} contains 20": df["Anno"].astype(str).str.contains("20", regex=False),
+        "{Anno} = 2023": df["Anno"] == 2023,
+    }
+
+
+def main():
+    df = normalizza_composizione(genera_composizione(50))
+    errori = 0
+    print(f"{'filter_query':<58}{'attese':>8}{'ottenute':>10}")
+    for filter_query, maschera in prove(df).items():
+        attese = df.index[maschera.fillna(False)].tolist()
+        ottenute = applica_filter_query(df, filter_query).index.tolist()
+        errori += attese != ottenute
+        print(f"{filter_query:<58}{len(attese):>8}{len(ottenute):>10}{'' if attese == ottenute else '  DIVERSE'}")
+    if errori:
+        raise SystemExit(f"{errori} filter_query con righe diverse da quelle attese")
+
+
+if __name__ == "__main__":
+    main()
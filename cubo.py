@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+
+from filtri import COLONNE_FILTRO_INIZIATIVE, valori_filtro
+
+# Misure delle interrogazioni (funzione, colonna) che corrispondono a un conteggio per cella
+MISURE_CUBO = {("righe", None): "righe", ("conta", "Titolo dell'attività"): "iniziative"}
+
+
+# --- Cubo pre-aggregato per i KPI e il grafico della Panoramica ---
+# Una cella per ogni combinazione (azienda, area, categoria, anno, sorgente) presente nei
+# dati, con il numero di righe e di iniziative (titoli non vuoti). Accanto al cubo c'è una
+# tabella booleana sorgente × azienda × anno del linguaggio inclusivo, allineata sugli
+# stessi codici, per il KPI calcolato nel browser. Le interrogazioni lavorano solo su
+# array di celle: il costo dipende dal numero di combinazioni di valori e non dal numero
+# di iniziative.
+class CuboIniziative:
+    def __init__(self, df_iniziative, df_composizione):
+        celle = (
+            df_iniziative
+            .groupby(COLONNE_FILTRO_INIZIATIVE, dropna=False, observed=True, sort=False)
+            .agg(righe=("Nome azienda", "size"), iniziative=("Titolo dell'attività", "count"))
+            .reset_index()
+        )
+        self.righe = celle["righe"].to_numpy()
+        self.iniziative = celle["iniziative"].to_numpy()
+        self.categorie = {}
+        self.codici = {}
+        self.tipi = {}
+        for colonna in COLONNE_FILTRO_INIZIATIVE:
+            valori = pd.Categorical(celle[colonna])
+            self.categorie[colonna] = valori.categories
+            self.codici[colonna] = valori.codes
+            self.tipi[colonna] = celle[colonna].dtype
+
+        # tabella linguaggio inclusivo: una colonna per anno + l'ultima per "tutti gli anni"
+        sorgenti = self.categorie["Sorgente"]
+        aziende = self.categorie["Nome azienda"]
+        anni = self.categorie["Anno"]
+        self.inclusivo = np.zeros((len(sorgenti), len(aziende), len(anni) + 1), dtype=bool)
+        df_incl = df_composizione[df_composizione["Linguaggio inclusivo"]]
+        cod_sorgente = sorgenti.get_indexer(df_incl["Sorgente"])
+        cod_azienda = aziende.get_indexer(df_incl["Nome azienda"])
+        cod_anno = anni.get_indexer(df_incl["Anno"])
+        presenti = (cod_sorgente >= 0) & (cod_azienda >= 0)
+        self.inclusivo[cod_sorgente[presenti], cod_azienda[presenti], len(anni)] = True
+        presenti &= cod_anno >= 0
+        self.inclusivo[cod_sorgente[presenti], cod_azienda[presenti], cod_anno[presenti]] = True
+
+    # Codici dei valori presenti nel cubo (i valori assenti dai dati sono ignorati)
+    def _codici(self, colonna, valori):
+        codici = self.categorie[colonna].get_indexer(valori)
+        return codici[codici >= 0]
+
+    # Maschera sulle celle del cubo; ogni filtro è un valore o una lista di valori
+    # (vedi filtri.valori_filtro), "all" disattiva il filtro sulla colonna
+    def seleziona(self, filtri):
+        maschera = np.ones(len(self.righe), dtype=bool)
+        for colonna, valore in filtri.items():
+            valori = valori_filtro(valore)
+            if valori is None:
+                continue
+            codici = self._codici(colonna, valori)
+            if len(codici) == 0:
+                # nessun valore presente nei dati: selezione vuota
+                return np.zeros(len(self.righe), dtype=bool)
+            maschera &= np.isin(self.codici[colonna], codici, kind="table")
+        return maschera
+
+    # Quante aziende della selezione (maschera sulle celle) hanno il linguaggio inclusivo
+    # in almeno uno degli anni e delle sorgenti indicati ("all": tutti). Le aziende sono
+    # segnate per codice, senza passare dai nomi: il costo dipende dalle celle e dal numero
+    # di aziende, non dalle righe di composizione.
+    def aziende_inclusive(self, maschera, anno="all", sorgente="all"):
+        anni = valori_filtro(anno)
+        sorgenti = valori_filtro(sorgente)
+        colonne = [len(self.categorie["Anno"])] if anni is None else self._codici("Anno", anni)
+        tabella = self.inclusivo if sorgenti is None else self.inclusivo[self._codici("Sorgente", sorgenti)]
+        if len(colonne) == 0 or len(tabella) == 0:
+            return 0
+        selezionate = np.zeros(len(self.categorie["Nome azienda"]), dtype=bool)
+        codici = self.codici["Nome azienda"][maschera]
+        selezionate[codici[codici >= 0]] = True
+        inclusive = tabella[:, :, colonne].any(axis=(0, 2))
+        return int((selezionate & inclusive).sum())
+
+    # Esegue un'interrogazione sulle iniziative (vedi interrogazioni.py) sommando le celle
+    # selezionate invece delle righe: ogni cella riceve il codice del suo gruppo (la
+    # combinazione dei codici delle chiavi) e le misure sono np.bincount su quel codice.
+    # Restituisce None se l'interrogazione usa colonne o misure che il cubo non ha: allora
+    # la esegue il backend sulle righe.
+    def aggrega(self, filtri, per, misure):
+        if not (set(filtri) | set(per)) <= set(COLONNE_FILTRO_INIZIATIVE):
+            return None
+        for _, (funzione, colonna) in misure:
+            if (funzione, colonna) not in MISURE_CUBO and not (
+                    funzione == "distinti" and colonna in COLONNE_FILTRO_INIZIATIVE):
+                return None
+
+        maschera = self.seleziona(filtri)
+        # come il groupby sulle righe: le celle con una chiave mancante non formano un gruppo
+        for colonna in per:
+            maschera &= self.codici[colonna] >= 0
+        dimensioni = [len(self.categorie[colonna]) for colonna in per]
+        if per and maschera.any():
+            combinati = np.ravel_multi_index([self.codici[colonna][maschera] for colonna in per], dimensioni)
+            gruppi, gruppo = np.unique(combinati, return_inverse=True)
+        else:
+            gruppi = np.zeros(0 if per else 1, dtype=np.int64)
+            gruppo = np.zeros(int(maschera.sum()), dtype=np.int64)
+
+        # chiavi in ordine di codice (quindi di valore) e con il tipo della colonna, come
+        # nel groupby sulle righe: le colonne category restano category con le stesse
+        # categorie (per "Nome azienda" i codici dell'anagrafica delle aziende)
+        risultato = {
+            colonna: (
+                pd.Categorical.from_codes(codici, dtype=self.tipi[colonna])
+                if isinstance(self.tipi[colonna], pd.CategoricalDtype) else self.categorie[colonna][codici]
+            )
+            for colonna, codici in zip(per, np.unravel_index(gruppi, dimensioni) if per else ())
+        }
+        for nome, (funzione, colonna) in misure:
+            if funzione == "distinti":
+                # coppie (gruppo, valore) presenti segnate in una tabella booleana
+                codici = self.codici[colonna][maschera]
+                validi = codici >= 0
+                presenti = np.zeros((len(gruppi), len(self.categorie[colonna])), dtype=bool)
+                presenti[gruppo[validi], codici[validi]] = True
+                risultato[nome] = presenti.sum(axis=1)
+            else:
+                pesi = getattr(self, MISURE_CUBO[funzione, colonna])[maschera]
+                risultato[nome] = np.bincount(gruppo, weights=pesi, minlength=len(gruppi)).astype(np.int64)
+        return pd.DataFrame(risultato)
+
+    # Versione compatta per il browser (dcc.Store): categorie, codici e conteggi come liste.
+    # Con le callback clientside la Panoramica e i grafici delle iniziative si ricalcolano
+    # in JavaScript a partire da qui (assets/dashboard.js).
+    def esporta(self):
+        return {
+            "categorie": {col: cat.tolist() for col, cat in self.categorie.items()},
+            "codici": {col: codici.tolist() for col, codici in self.codici.items()},
+            "righe": self.righe.tolist(),
+            "iniziative": self.iniziative.tolist(),
+            "inclusivo": self.inclusivo.astype(np.uint8).tolist(),
+        }
@@ -0,0 +1,680 @@
+import glob
+import hashlib
+import itertools
+import json
+import logging
+import os
+import tempfile
+import time
+import unicodedata
+import zipfile
+from urllib.parse import quote
+from xml.etree import ElementTree
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from openpyxl import load_workbook
+
+logger = logging.getLogger(__name__)
+
+# --- Sorgente dati ---
+FILE_EXCEL = os.environ.get("DASHBOARD_WORKBOOK", "Partecipate Brescia copia.xlsx")
+FOGLIO_INIZIATIVE = "Attività generali"
+FOGLIO_COMPOSIZIONE = "Genere nelle aziende "
+# nome breve di ogni foglio, usato nei file di snapshot
+FOGLI = {FOGLIO_INIZIATIVE: "iniziative", FOGLIO_COMPOSIZIONE: "composizione"}
+# Colonna aggiunta ai due fogli con la sorgente di ogni riga, cioè il nome del workbook
+# senza estensione: un solo valore con FILE_EXCEL, uno per partizione con un dataset di
+# più workbook (vedi "Dataset partizionato" più sotto)
+COLONNA_SORGENTE = "Sorgente"
+
+
+def nome_sorgente(percorso):
+    return os.path.splitext(os.path.basename(percorso))[0]
+
+
+# Cartella degli snapshot colonnari (file Arrow IPC / Feather v2, non compressi
+# così da poterli mappare in memoria). Va incrementata VERSIONE_SNAPSHOT ogni
+# volta che cambia la pulizia applicata ai fogli, per invalidare i vecchi file.
+CARTELLA_SNAPSHOT = os.environ.get("DASHBOARD_SNAPSHOT_DIR", ".snapshot")
+VERSIONE_SNAPSHOT = 7
+
+
+# --- Impronta di ogni foglio ---
+# Un .xlsx è un archivio zip con un file XML per foglio: il CRC di quel file (più quello
+# delle stringhe condivise, comuni a tutti i fogli) cambia solo se cambia il foglio, e si
+# legge dall'indice dello zip senza decomprimere nulla. Così una modifica a un solo foglio
+# fa rileggere solo quello. Per formati diversi da .xlsx vale l'hash dell'intero file.
+def _parti_fogli(archivio):
+    relazioni = ElementTree.fromstring(archivio.read("xl/_rels/workbook.xml.rels"))
+    destinazioni = {}
+    for relazione in relazioni.iterfind(".//{*}Relationship"):
+        destinazione = relazione.get("Target")
+        destinazioni[relazione.get("Id")] = (
+            destinazione.lstrip("/") if destinazione.startswith("/") else f"xl/{destinazione}"
+        )
+    parti = {}
+    for foglio in ElementTree.fromstring(archivio.read("xl/workbook.xml")).iterfind(".//{*}sheet"):
+        id_relazione = next(valore for nome, valore in foglio.attrib.items() if nome.endswith("}id"))
+        parti[foglio.get("name")] = destinazioni.get(id_relazione)
+    return parti
+
+
+def impronte_fogli(percorso):
+    try:
+        with zipfile.ZipFile(percorso) as archivio:
+            crc = {info.filename: (info.CRC, info.file_size) for info in archivio.infolist()}
+            parti = _parti_fogli(archivio)
+    except (zipfile.BadZipFile, KeyError, StopIteration, ElementTree.ParseError):
+        sha = hashlib.sha256()
+        with open(percorso, "rb") as f:
+            for blocco in iter(lambda: f.read(1 << 20), b""):
+                sha.update(blocco)
+        return {foglio: f"v{VERSIONE_SNAPSHOT}-{sha.hexdigest()[:16]}" for foglio in FOGLI}
+    condivise = crc.get("xl/sharedStrings.xml")
+    impronte = {}
+    for foglio in FOGLI:
+        sha = hashlib.sha256(repr((crc.get(parti.get(foglio)), condivise)).encode())
+        impronte[foglio] = f"v{VERSIONE_SNAPSHOT}-{sha.hexdigest()[:16]}"
+    return impronte
+
+
+# Impronta dell'insieme dei dati (entra nelle chiavi delle cache a valle)
+def impronta_dati(impronte):
+    sha = hashlib.sha256("|".join(impronte[foglio] for foglio in FOGLI).encode())
+    return f"v{VERSIONE_SNAPSHOT}-{sha.hexdigest()[:16]}"
+
+
+def _percorso_snapshot(cartella, percorso, foglio, impronta):
+    nome = os.path.splitext(os.path.basename(percorso))[0].replace(" ", "_")
+    return os.path.join(cartella, f"{nome}.{FOGLI[foglio]}.{impronta}.arrow")
+
+
+# --- Normalizzazione dei tipi al caricamento ---
+# Tutto il parsing di stringhe avviene qui, una volta sola: a valle le callback trovano
+# percentuali float32 su scala 0–100, anni int16 e il linguaggio inclusivo come bool.
+# Le righe che non si possono convertire vengono scartate e segnalate nel log.
+VALORI_SI = {"sì", "si", "yes", "true", "1", "x"}
+VALORI_NO = {"no", "false", "0", ""}
+COLONNE_PERCENTUALI = ["Percentuale donne", "Percentuale uomini"]
+MAX_SCARTI_NEL_LOG = 20
+
+
+def _converti_anno(serie):
+    anni = pd.to_numeric(serie, errors="coerce")
+    validi = anni.notna() & (anni == anni.round())
+    return anni.where(validi), validi
+
+
+# Accetta 42, "42", "42%" e 0.42. Con il simbolo "%" la scala è 0–100: la lettura in
+# streaming lo aggiunge a ogni numero secondo il formato della cella (vedi _righe_foglio).
+# Senza simbolo la scala si decide sull'intera colonna: frazioni 0–1 se nessun valore
+# supera 1 (così arrivano da pd.read_excel le celle in formato percentuale), altrimenti
+# 0–100. In una colonna 0–100 anche un valore tra 0 (escluso) e 1 segue la scala della
+# colonna (0.5 è 0,5%), ma potrebbe essere una frazione scritta a mano: queste righe sono
+# restituite a parte per segnalarle nel log (vedi _segnala_piccoli).
+def _converti_percentuale(serie):
+    testo = serie.astype("string").str.strip()
+    con_simbolo = testo.str.endswith("%").fillna(False)
+    numeri = pd.to_numeric(testo.str.rstrip("%").str.replace(",", ".", regex=False), errors="coerce")
+    senza_simbolo = ~con_simbolo & numeri.notna()
+    scala_100 = (numeri[senza_simbolo] > 1).any()
+    piccoli = senza_simbolo & scala_100 & (numeri > 0) & (numeri <= 1)
+    if not scala_100:
+        numeri = numeri.where(~senza_simbolo, numeri * 100)
+    validi = serie.isna() | (numeri.notna() & numeri.between(0, 100))
+    return numeri.astype(np.float32), validi.fillna(False).astype(bool), piccoli.fillna(False).astype(bool)
+
+
+def _segnala_piccoli(piccoli, colonna, foglio):
+    righe = piccoli.index[piccoli]
+    if len(righe):
+        logger.warning("Foglio %r: %d valori di %r tra 0 e 1 letti su scala 0–100 (righe %s)",
+                       foglio, len(righe), colonna,
+                       ", ".join(str(indice + 2) for indice in righe[:MAX_SCARTI_NEL_LOG]))
+
+
+def _converti_booleano(serie):
+    testo = serie.astype("string").str.strip().str.lower().fillna("")
+    valori = testo.isin(VALORI_SI)
+    validi = valori | testo.isin(VALORI_NO)
+    return valori.astype(bool), validi.astype(bool)
+
+
+def _scarta(df, validi_per_motivo, foglio):
+    validi = pd.Series(True, index=df.index)
+    motivi = pd.Series("", index=df.index)
+    for motivo, validi_motivo in validi_per_motivo.items():
+        motivi = motivi.where(validi_motivo, motivi + motivo + "; ")
+        validi &= validi_motivo
+    scartati = df.index[~validi]
+    if len(scartati):
+        logger.warning("Foglio %r: %d righe scartate in fase di normalizzazione", foglio, len(scartati))
+        for indice in scartati[:MAX_SCARTI_NEL_LOG]:
+            # +2: intestazione e numerazione da 1 di Excel
+            logger.warning("  riga %d: %s", indice + 2, motivi[indice].rstrip("; "))
+    return df[validi].reset_index(drop=True)
+
+
+def normalizza_iniziative(df):
+    df["Nome azienda"] = df["Nome azienda"].str.strip()
+    anni, anni_validi = _converti_anno(df["Anno"])
+    df["Anno"] = anni
+    df = _scarta(df, {"anno mancante o non intero": anni_validi}, FOGLIO_INIZIATIVE)
+    df["Anno"] = df["Anno"].astype(np.int16)
+    return df
+
+
+def normalizza_composizione(df):
+    df["Nome azienda"] = df["Nome azienda"].str.strip()
+    anni, anni_validi = _converti_anno(df["Anno"])
+    df["Anno"] = anni
+    validi = {"anno mancante o non intero": anni_validi}
+    for colonna in COLONNE_PERCENTUALI:
+        df[colonna], validi[f"{colonna.lower()} non valida"], piccoli = _converti_percentuale(df[colonna])
+        _segnala_piccoli(piccoli, colonna, FOGLIO_COMPOSIZIONE)
+    df["Linguaggio inclusivo"], validi["linguaggio inclusivo non riconosciuto"] = (
+        _converti_booleano(df["Linguaggio inclusivo"])
+    )
+    df = _scarta(df, validi, FOGLIO_COMPOSIZIONE)
+    df["Anno"] = df["Anno"].astype(np.int16)
+    return df
+
+
+# --- Rappresentazione compatta in memoria ---
+# Colonne a pochi valori distinti come category (codici interi + un solo dizionario),
+# testo libero come stringhe Arrow, conteggi int32.
+# Nessuna colonna resta object: i buffer non contengono oggetti Python, quindi dopo il
+# fork (gunicorn con preload_app) i worker li leggono senza sporcarne le pagine.
+# Il nome azienda usa le stesse categorie nei due fogli, così i codici coincidono: sono
+# i codici dell'anagrafica delle aziende (vedi sotto).
+COLONNE_CATEGORIA_INIZIATIVE = ["Area Prassi", "Categoria di diversità", "Fonte"]
+COLONNE_CATEGORIA_COMPOSIZIONE = ["Posizione"]
+COLONNE_TESTO_INIZIATIVE = ["Titolo dell'attività", "Descrizione dell'attività"]
+COLONNE_CONTEGGIO_COMPOSIZIONE = ["Numero donne", "Numero uomini"]
+TESTO_ARROW = pd.StringDtype("pyarrow")
+
+
+# Converte solo le colonne che non hanno già il tipo giusto: un foglio già compatto
+# viene restituito così com'è (stesso oggetto), senza copie
+def _converti(df, tipi):
+    diversi = {colonna: tipo for colonna, tipo in tipi.items() if df[colonna].dtype != tipo}
+    return df.astype(diversi) if diversi else df
+
+
+# --- Anagrafica delle aziende ---
+# I due fogli sono collegati solo dal nome azienda. Le grafie che differiscono per
+# maiuscole, spazi, punteggiatura o accenti ("Brescia Mobilità S.p.A." e "brescia
+# mobilita spa") hanno la stessa chiave e diventano una sola azienda, con il nome scritto
+# più spesso nei due fogli (a parità, il primo in ordine alfabetico).
+# Ogni azienda ha due interi:
+# - l'ID, derivato dalla sola chiave (63 bit di BLAKE2b): non cambia quando si aggiungono
+#   o tolgono altre aziende, e vale tra versioni dei dati, workbook e processi diversi;
+# - il codice, la sua posizione tra i nomi in ordine alfabetico, cioè il codice della
+#   category "Nome azienda" in entrambi i fogli: i confronti tra fogli lavorano su questi
+#   interi piccoli, ma valgono solo dentro i dati caricati (un'azienda nuova li sposta).
+MAX_NOMI_NEL_RAPPORTO = 20
+
+
+def chiave_azienda(nome):
+    testo = unicodedata.normalize("NFKD", nome).casefold()
+    return "".join(carattere for carattere in testo if carattere.isalnum())
+
+
+def id_azienda(chiave):
+    impronta = hashlib.blake2b(chiave.encode(), digest_size=8).digest()
+    return int.from_bytes(impronta, "big") >> 1
+
+
+# Righe per grafia del nome (conteggio sulle category già pronte, senza convertire le righe)
+def _righe_per_nome(nomi):
+    conteggi = nomi.value_counts()
+    return conteggi.set_axis(conteggi.index.astype(TESTO_ARROW))
+
+
+# Restituisce l'anagrafica, indicizzata per "ID azienda" in ordine di codice (codice, nome,
+# altre grafie unificate, righe in ciascun foglio), e il codice di ogni grafia presente nei dati
+def anagrafica_aziende(nomi_iniziative, nomi_composizione):
+    righe = pd.DataFrame({
+        FOGLI[FOGLIO_INIZIATIVE]: _righe_per_nome(nomi_iniziative),
+        FOGLI[FOGLIO_COMPOSIZIONE]: _righe_per_nome(nomi_composizione),
+    }).fillna(0).astype(np.int64)
+    # le category di un foglio già compatto comprendono anche le aziende dell'altro
+    righe = righe[righe.sum(axis=1) > 0]
+    grafie = pd.DataFrame({
+        "Grafia": righe.index.astype(object),
+        "Chiave": [chiave_azienda(nome) for nome in righe.index],
+        "Righe": righe.sum(axis=1).to_numpy(),
+    })
+    nomi = (
+        grafie.sort_values(["Chiave", "Righe", "Grafia"], ascending=[True, False, True])
+        .drop_duplicates("Chiave").set_index("Chiave")["Grafia"]
+    )
+    categorie = pd.Index(sorted(nomi), dtype=TESTO_ARROW)
+    codici_grafie = pd.Series(categorie.get_indexer(nomi.loc[grafie["Chiave"]]), index=righe.index)
+
+    anagrafica = righe.groupby(codici_grafie.to_numpy()).sum()
+    anagrafica.insert(0, "Codice", anagrafica.index)
+    anagrafica.insert(1, "Nome azienda", categorie[anagrafica.index])
+    anagrafica.insert(2, "Varianti", [
+        sorted(grafia for grafia in righe.index[codici_grafie.to_numpy() == codice] if grafia != nome)
+        for codice, nome in zip(anagrafica.index, anagrafica["Nome azienda"])
+    ])
+    chiavi = pd.Series(nomi.index, index=nomi.to_numpy()).loc[anagrafica["Nome azienda"]]
+    anagrafica.index = pd.Index([id_azienda(chiave) for chiave in chiavi], dtype=np.int64, name="ID azienda")
+    if not anagrafica.index.is_unique:
+        raise ValueError("Due aziende con chiavi diverse hanno lo stesso ID azienda")
+    return anagrafica, codici_grafie
+
+
+def _elenco(nomi):
+    nomi = list(nomi)
+    altri = len(nomi) - MAX_NOMI_NEL_RAPPORTO
+    return ", ".join(map(repr, nomi[:MAX_NOMI_NEL_RAPPORTO])) + (f" e altri {altri}" if altri > 0 else "")
+
+
+# Rapporto nel log: grafie unificate e aziende presenti in un solo foglio (nomi senza
+# corrispondenza nell'altro, da correggere nel workbook se sono la stessa azienda)
+def rapporto_aziende(anagrafica, sorgente):
+    unificate = anagrafica[anagrafica["Varianti"].str.len() > 0]
+    for nome, varianti in zip(unificate["Nome azienda"], unificate["Varianti"]):
+        logger.info("%s: nome azienda %r usato anche per %s", sorgente, nome, _elenco(varianti))
+    for foglio, altro in itertools.permutations(FOGLI.values()):
+        sole = anagrafica.loc[(anagrafica[foglio] > 0) & (anagrafica[altro] == 0), "Nome azienda"]
+        if len(sole):
+            logger.warning("%s: %d aziende presenti in %s e non in %s: %s",
+                           sorgente, len(sole), foglio, altro, _elenco(sole))
+
+
+# Nomi azienda come category dell'anagrafica: ogni grafia diventa il codice della sua azienda
+def _nomi_azienda(nomi, codici_grafie, tipo):
+    grafie = pd.Categorical(nomi)
+    codici_categorie = codici_grafie.reindex(grafie.categories.astype(TESTO_ARROW), fill_value=-1).to_numpy()
+    codici = np.where(grafie.codes >= 0, codici_categorie[grafie.codes], -1)
+    return pd.Categorical.from_codes(codici, dtype=tipo)
+
+
+# I fogli letti da un solo workbook ricevono qui la colonna della sorgente (`sorgente`,
+# che dà anche il nome al rapporto sulle aziende, va sempre indicata); come il nome
+# azienda, usa le stesse categorie nei due fogli
+def compatta(df_iniziative, df_composizione, sorgente):
+    df_iniziative, df_composizione = (
+        df if COLONNA_SORGENTE in df.columns else df.assign(**{COLONNA_SORGENTE: sorgente})
+        for df in (df_iniziative, df_composizione)
+    )
+    anagrafica, codici_grafie = anagrafica_aziende(df_iniziative["Nome azienda"], df_composizione["Nome azienda"])
+    rapporto_aziende(anagrafica, sorgente)
+    tipo_azienda = pd.CategoricalDtype(anagrafica["Nome azienda"].tolist())
+    if anagrafica["Varianti"].str.len().any():
+        # grafie diverse della stessa azienda: i nomi vanno riscritti (altrimenti basta _converti)
+        df_iniziative, df_composizione = (
+            df.assign(**{"Nome azienda": _nomi_azienda(df["Nome azienda"], codici_grafie, tipo_azienda)})
+            for df in (df_iniziative, df_composizione)
+        )
+    valori = pd.concat([df_iniziative[COLONNA_SORGENTE], df_composizione[COLONNA_SORGENTE]]).astype(TESTO_ARROW)
+    tipi_comuni = {
+        "Nome azienda": tipo_azienda,
+        COLONNA_SORGENTE: pd.CategoricalDtype(sorted(valori.dropna().unique())),
+    }
+    df_iniziative = _converti(
+        df_iniziative,
+        tipi_comuni
+        | {colonna: "category" for colonna in COLONNE_CATEGORIA_INIZIATIVE}
+        | {colonna: TESTO_ARROW for colonna in COLONNE_TESTO_INIZIATIVE},
+    )
+    # int32 e non il minimo possibile: le somme tra colonne non devono andare in overflow
+    conteggi = {
+        colonna: np.int32 for colonna in COLONNE_CONTEGGIO_COMPOSIZIONE
+        if df_composizione[colonna].dtype.kind in "iu"
+    }
+    df_composizione = _converti(
+        df_composizione,
+        tipi_comuni
+        | {colonna: "category" for colonna in COLONNE_CATEGORIA_COMPOSIZIONE}
+        | conteggi,
+    )
+    return df_iniziative, df_composizione
+
+
+# Occupazione in memoria dei DataFrame, colonna per colonna (in byte, stringhe comprese)
+def memoria_dataframe(df):
+    return df.memory_usage(index=True, deep=True)
+
+
+# --- Lettura dal file Excel (percorso lento) ---
+# I fogli .xlsx vengono letti in streaming: openpyxl in modalità read-only restituisce una
+# riga alla volta (iter_rows con values_only) senza costruire gli oggetti cella dell'intero
+# foglio. Le righe vengono raccolte in blocchi di RIGHE_PER_BLOCCO, ripulite e normalizzate
+# blocco per blocco e accodate come record batch Arrow in un file temporaneo, riletto alla
+# fine mappato in memoria: oltre ai dati letti, la memoria usata dalla lettura dipende
+# dalla dimensione del blocco e non da quella del workbook. Gli altri formati (.xls, .ods)
+# passano da pd.read_excel.
+NORMALIZZAZIONI = {FOGLIO_INIZIATIVE: normalizza_iniziative, FOGLIO_COMPOSIZIONE: normalizza_composizione}
+RIGHE_PER_BLOCCO = 10_000
+# Testi che pd.read_excel legge come valori mancanti (i suoi na_values predefiniti)
+VALORI_MANCANTI = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+
+
+# Righe del foglio come tuple. Come pd.read_excel: le righe vuote in coda (spesso solo
+# formattazione) sono ignorate, quelle in mezzo ai dati restano (e le scarta poi la
+# normalizzazione, con il numero di riga nel log). Nelle colonne percentuali (solo nel
+# foglio che le ha) la scala dei numeri viene dal formato della cella: con il formato
+# percentuale il valore è una frazione (0.42 → "42%"), senza è già su scala 0–100
+# (42 → "42%"); il simbolo evita che la normalizzazione debba indovinare.
+def _righe_foglio(foglio_excel, percentuali=()):
+    vuote = 0
+    posizioni = None
+    for riga in foglio_excel.iter_rows(values_only=not percentuali):
+        if percentuali:
+            if posizioni is None:
+                # la prima riga è l'intestazione
+                posizioni = {i for i, cella in enumerate(riga) if cella.value in percentuali}
+            riga = tuple(
+                _percentuale_da_cella(cella) if i in posizioni else cella.value for i, cella in enumerate(riga)
+            )
+        if all(valore is None or valore == "" for valore in riga):
+            vuote += 1
+            continue
+        yield from itertools.repeat((), vuote)
+        vuote = 0
+        yield riga
+
+
+def _percentuale_da_cella(cella):
+    valore = cella.value
+    if isinstance(valore, bool) or not isinstance(valore, (int, float)):
+        return valore
+    if "%" in (cella.number_format or ""):
+        valore = valore * 100
+    return f"{valore!r}%"
+
+
+# Blocco di righe come DataFrame con i tipi che darebbe pd.read_excel: testi "mancanti"
+# come NaN, colonne di soli numeri interi come int64; l'indice è la posizione della riga
+# nel foglio. Le colonne con tipi misti (ad esempio numeri in una colonna di testo)
+# diventano testo, così ogni blocco ha uno schema Arrow; una colonna tutta vuota tiene il
+# tipo che aveva nel blocco precedente (`tipi`) e la normalizzazione la tratta come le altre.
+def _blocco(righe, colonne, inizio, tipi):
+    n = len(colonne)
+    df = pd.DataFrame(
+        [riga[:n] + (None,) * (n - len(riga)) for riga in righe],
+        columns=colonne,
+        index=pd.RangeIndex(inizio, inizio + len(righe)),
+    )
+    for colonna in df.columns:
+        valori = df[colonna]
+        if valori.dtype == object or pd.api.types.is_string_dtype(valori.dtype):
+            valori = valori.mask(valori.isin(VALORI_MANCANTI))
+        if not valori.notna().any():
+            tipo = tipi.get(colonna, np.dtype(float))
+            valori = valori.astype(float if tipo.kind in "iub" else tipo)
+        elif valori.dtype == object:
+            valori = valori.astype("str")
+        elif valori.dtype.kind == "f" and valori.notna().all() and (valori == valori.round()).all():
+            valori = valori.astype(np.int64)
+        df[colonna] = valori
+    return df
+
+
+# Blocchi normalizzati di un foglio (almeno uno, anche se il foglio non ha righe di dati)
+def _blocchi_normalizzati(foglio_excel, foglio, righe_per_blocco):
+    righe = _righe_foglio(foglio_excel, COLONNE_PERCENTUALI if foglio == FOGLIO_COMPOSIZIONE else ())
+    intestazione = list(next(righe, ()))
+    while intestazione and intestazione[-1] is None:
+        intestazione.pop()
+    colonne = [f"Unnamed: {i}" if nome is None else nome for i, nome in enumerate(intestazione)]
+    blocco = list(itertools.islice(righe, righe_per_blocco))
+    inizio = 0
+    tipi = {}
+    while True:
+        df = _blocco(blocco, colonne, inizio, tipi)
+        tipi = df.dtypes.to_dict()
+        yield NORMALIZZAZIONI[foglio](df)
+        inizio += len(blocco)
+        blocco = list(itertools.islice(righe, righe_per_blocco))
+        if not blocco:
+            break
+
+
+# Accoda i blocchi in file Arrow IPC nella cartella temporanea (un file nuovo solo se lo
+# schema cambia, ad esempio una colonna intera che in un blocco successivo ha valori
+# mancanti) e li rilegge mappati in memoria; pd.concat unifica i tipi come pd.read_excel
+def _accoda_blocchi(blocchi, cartella):
+    parti = []
+    writer = schema = None
+    try:
+        for df in blocchi:
+            tabella = pa.Table.from_pandas(df, preserve_index=False)
+            if schema is None or not tabella.schema.equals(schema):
+                if writer is not None:
+                    writer.close()
+                schema = tabella.schema
+                parti.append(os.path.join(cartella, f"parte-{len(parti)}.arrow"))
+                writer = pa.ipc.new_file(parti[-1], schema)
+            writer.write_table(tabella.replace_schema_metadata(schema.metadata))
+    finally:
+        if writer is not None:
+            writer.close()
+    frame = [feather.read_table(parte, memory_map=True).to_pandas() for parte in parti]
+    return frame[0] if len(frame) == 1 else pd.concat(frame, ignore_index=True)
+
+
+# Legge e normalizza i fogli richiesti con un solo parse del workbook
+def leggi_fogli(percorso, fogli=tuple(FOGLI), righe_per_blocco=RIGHE_PER_BLOCCO):
+    if os.path.splitext(percorso)[1].lower() not in (".xlsx", ".xlsm"):
+        letti = pd.read_excel(percorso, sheet_name=list(fogli))
+        return {foglio: NORMALIZZAZIONI[foglio](df) for foglio, df in letti.items()}
+    workbook = load_workbook(percorso, read_only=True, data_only=True)
+    try:
+        letti = {}
+        for foglio in fogli:
+            with tempfile.TemporaryDirectory() as cartella:
+                letti[foglio] = _accoda_blocchi(
+                    _blocchi_normalizzati(workbook[foglio], foglio, righe_per_blocco), cartella
+                )
+        return letti
+    finally:
+        workbook.close()
+
+
+def leggi_excel(percorso):
+    fogli = leggi_fogli(percorso)
+    return compatta(fogli[FOGLIO_INIZIATIVE], fogli[FOGLIO_COMPOSIZIONE], nome_sorgente(percorso))
+
+
+# Righe aggiunte e rimosse tra due versioni di un foglio (confronto per contenuto della riga)
+def differenze_righe(vecchio, nuovo):
+    conteggi_vecchi = pd.util.hash_pandas_object(vecchio, index=False).value_counts()
+    conteggi_nuovi = pd.util.hash_pandas_object(nuovo, index=False).value_counts()
+    delta = conteggi_nuovi.sub(conteggi_vecchi, fill_value=0)
+    return int(delta[delta > 0].sum()), int(-delta[delta < 0].sum())
+
+
+def _kb(*frame):
+    return sum(memoria_dataframe(df).sum() for df in frame) / 1024
+
+
+def _scrivi_snapshot(df, destinazione):
+    # scrittura atomica: più worker possono avviarsi insieme sullo stesso file
+    temporaneo = f"{destinazione}.{os.getpid()}.tmp"
+    feather.write_feather(df.reset_index(drop=True), temporaneo, compression="uncompressed")
+    os.replace(temporaneo, destinazione)
+
+
+def _rimuovi_snapshot_obsoleti(cartella, percorso, impronte):
+    nome = os.path.splitext(os.path.basename(percorso))[0].replace(" ", "_")
+    attuali = {os.path.basename(_percorso_snapshot(cartella, percorso, foglio, impronta))
+               for foglio, impronta in impronte.items()}
+    for vecchio in glob.glob(os.path.join(glob.escape(cartella), f"{nome}.*.arrow")):
+        if os.path.basename(vecchio) not in attuali:
+            try:
+                os.remove(vecchio)
+            except OSError:
+                pass
+
+
+# --- Caricamento con cache degli snapshot ---
+# Ogni foglio arriva, nell'ordine: dai dati già in memoria (`precedenti`, dizionario
+# foglio -> (impronta, DataFrame) della versione in uso) se la sua impronta non è cambiata,
+# dal suo snapshot, oppure dal file Excel. Restituisce i due fogli e le impronte per foglio.
+# Se `percorso` è una cartella si tratta di un dataset partizionato (vedi carica_dataset).
+def carica_dati(percorso=FILE_EXCEL, cartella=CARTELLA_SNAPSHOT, precedenti=None):
+    if os.path.isdir(percorso):
+        return carica_dataset(percorso, precedenti)
+    inizio = time.perf_counter()
+    impronte = impronte_fogli(percorso)
+    fogli = {}
+    provenienza = {}
+    for foglio, impronta in impronte.items():
+        snapshot = _percorso_snapshot(cartella, percorso, foglio, impronta)
+        if precedenti and precedenti[foglio][0] == impronta:
+            fogli[foglio] = precedenti[foglio][1]
+            provenienza[foglio] = "memoria"
+        elif os.path.exists(snapshot):
+            # percorso veloce: lo snapshot viene mappato in memoria, niente openpyxl
+            fogli[foglio] = feather.read_table(snapshot, memory_map=True).to_pandas()
+            provenienza[foglio] = "snapshot"
+    da_excel = [foglio for foglio in impronte if foglio not in fogli]
+    if da_excel:
+        fogli.update(leggi_fogli(percorso, da_excel))
+        provenienza.update(dict.fromkeys(da_excel, "Excel"))
+    durata_lettura = time.perf_counter() - inizio
+
+    # la compattazione va rifatta sempre: le categorie dei nomi azienda sono comuni ai due fogli
+    df_iniziative, df_composizione = compatta(
+        fogli[FOGLIO_INIZIATIVE], fogli[FOGLIO_COMPOSIZIONE], nome_sorgente(percorso)
+    )
+    compatti = {FOGLIO_INIZIATIVE: df_iniziative, FOGLIO_COMPOSIZIONE: df_composizione}
+    if da_excel:
+        try:
+            os.makedirs(cartella, exist_ok=True)
+            for foglio in da_excel:
+                _scrivi_snapshot(compatti[foglio], _percorso_snapshot(cartella, percorso, foglio, impronte[foglio]))
+            _rimuovi_snapshot_obsoleti(cartella, percorso, impronte)
+        except OSError as errore:
+            # la cartella potrebbe non essere scrivibile: si lavora comunque dall'Excel
+            logger.warning("Snapshot non scritto in %s: %s", cartella, errore)
+
+    logger.info("Dati caricati in %.3f s (%s; %.0f KB in memoria)",
+                durata_lettura,
+                ", ".join(f"{FOGLI[foglio]} da {origine}" for foglio, origine in provenienza.items()),
+                _kb(df_iniziative, df_composizione))
+    return df_iniziative, df_composizione, impronte
+
+
+# --- Dataset partizionato (più workbook) ---
+# Prodotto da ingestione.py a partire da una cartella di workbook con gli stessi due fogli,
+# uno per comune o per periodo. Ogni workbook è una partizione, con la sorgente come
+# chiave e un file Arrow per foglio in cartelle in stile Hive (leggibili anche con
+# pyarrow.dataset o DuckDB); i file non contengono la colonna della sorgente:
+#   <dataset>/iniziative/Sorgente=<nome>/<impronta del foglio>.arrow
+#   <dataset>/composizione/Sorgente=<nome>/<impronta del foglio>.arrow
+#   <dataset>/manifest.json     partizioni con workbook, impronte dei fogli e righe
+# Il manifest viene sostituito per ultimo e nomina i file da leggere, quindi chi legge
+# vede sempre un insieme coerente di partizioni. Con DASHBOARD_DATASET la dashboard
+# legge da qui invece che da FILE_EXCEL; DASHBOARD_SORGENTI (nomi separati da virgole)
+# limita le partizioni caricate, senza aprire i file delle altre.
+CARTELLA_DATASET = os.environ.get("DASHBOARD_DATASET")
+SORGENTI = [nome for nome in os.environ.get("DASHBOARD_SORGENTI", "").split(",") if nome]
+MANIFEST = "manifest.json"
+
+
+def percorso_partizione(dataset, foglio, sorgente, impronta):
+    cartella = f"{COLONNA_SORGENTE}={quote(sorgente, safe='')}"
+    return os.path.join(dataset, FOGLI[foglio], cartella, f"{impronta}.arrow")
+
+
+def scrivi_partizione(df, dataset, foglio, sorgente, impronta):
+    destinazione = percorso_partizione(dataset, foglio, sorgente, impronta)
+    os.makedirs(os.path.dirname(destinazione), exist_ok=True)
+    _scrivi_snapshot(df.drop(columns=COLONNA_SORGENTE, errors="ignore"), destinazione)
+
+
+# Partizioni del manifest: sorgente -> {"workbook", "impronte" (nome breve del foglio ->
+# impronta), "righe"}; un dataset ancora senza manifest non ha partizioni
+def leggi_manifest(dataset):
+    try:
+        with open(os.path.join(dataset, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if manifest["versione"] != VERSIONE_SNAPSHOT:
+        logger.warning("Dataset %s scritto con la pulizia v%s (attuale v%s): va rigenerato con ingestione.py",
+                       dataset, manifest["versione"], VERSIONE_SNAPSHOT)
+    return manifest["partizioni"]
+
+
+def scrivi_manifest(dataset, partizioni):
+    destinazione = os.path.join(dataset, MANIFEST)
+    temporaneo = f"{destinazione}.{os.getpid()}.tmp"
+    with open(temporaneo, "w", encoding="utf-8") as f:
+        json.dump({"versione": VERSIONE_SNAPSHOT, "partizioni": dict(sorted(partizioni.items()))},
+                  f, ensure_ascii=False, indent=2)
+    os.replace(temporaneo, destinazione)
+
+
+# File (e cartelle rimaste vuote) delle partizioni che il manifest non nomina più
+def rimuovi_partizioni_obsolete(dataset, partizioni):
+    attuali = {
+        percorso_partizione(dataset, foglio, sorgente, voce["impronte"][FOGLI[foglio]])
+        for sorgente, voce in partizioni.items() for foglio in FOGLI
+    }
+    for foglio in FOGLI.values():
+        for vecchio in glob.glob(os.path.join(glob.escape(dataset), foglio, f"{COLONNA_SORGENTE}=*", "*.arrow")):
+            if vecchio in attuali:
+                continue
+            try:
+                os.remove(vecchio)
+                os.rmdir(os.path.dirname(vecchio))
+            except OSError:
+                pass
+
+
+# Impronta di un foglio del dataset: quelle dello stesso foglio nelle partizioni caricate
+def _impronta_partizioni(partizioni, foglio):
+    voci = sorted((sorgente, voce["impronte"][FOGLI[foglio]]) for sorgente, voce in partizioni.items())
+    return f"v{VERSIONE_SNAPSHOT}-{hashlib.sha256(repr(voci).encode()).hexdigest()[:16]}"
+
+
+# Come carica_dati, per un dataset: ogni foglio è la concatenazione delle sue partizioni
+# in ordine di sorgente (le righe di una sorgente restano contigue), mappate in memoria.
+# Con `sorgenti` si leggono solo le partizioni indicate.
+def carica_dataset(dataset=CARTELLA_DATASET, precedenti=None, sorgenti=SORGENTI):
+    inizio = time.perf_counter()
+    partizioni = leggi_manifest(dataset)
+    if sorgenti:
+        partizioni = {sorgente: voce for sorgente, voce in partizioni.items() if sorgente in sorgenti}
+    if not partizioni:
+        raise FileNotFoundError(f"Nessuna partizione da caricare in {dataset}")
+    impronte = {foglio: _impronta_partizioni(partizioni, foglio) for foglio in FOGLI}
+    fogli = {}
+    provenienza = {}
+    for foglio, impronta in impronte.items():
+        if precedenti and precedenti[foglio][0] == impronta:
+            fogli[foglio] = precedenti[foglio][1]
+            provenienza[foglio] = "memoria"
+            continue
+        fogli[foglio] = pd.concat([
+            feather.read_table(
+                percorso_partizione(dataset, foglio, sorgente, voce["impronte"][FOGLI[foglio]]), memory_map=True
+            ).to_pandas().assign(**{COLONNA_SORGENTE: sorgente})
+            for sorgente, voce in sorted(partizioni.items())
+        ], ignore_index=True)
+        provenienza[foglio] = f"{len(partizioni)} partizioni"
+    durata_lettura = time.perf_counter() - inizio
+
+    # categorie comuni a tutte le partizioni (ognuna ha le sue nei file) e anagrafica
+    # delle aziende dell'intero dataset
+    df_iniziative, df_composizione = compatta(
+        fogli[FOGLIO_INIZIATIVE], fogli[FOGLIO_COMPOSIZIONE], nome_sorgente(os.path.normpath(dataset))
+    )
+    logger.info("Dataset caricato in %.3f s (%s; %.0f KB in memoria)",
+                durata_lettura,
+                ", ".join(f"{FOGLI[foglio]} da {origine}" for foglio, origine in provenienza.items()),
+                _kb(df_iniziative, df_composizione))
+    return df_iniziative, df_composizione, impronte
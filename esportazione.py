@@ -0,0 +1,91 @@
+import io
+import tempfile
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+# --- Esportazione dei dati filtrati ---
+# Ogni formato è un generatore di blocchi di byte: la risposta HTTP (o il file di
+# dcc.Download) viene scritta un blocco di righe alla volta, senza mai costruire la
+# lista completa dei record come fa to_dict("records").
+RIGHE_PER_BLOCCO = 10_000
+BYTE_PER_BLOCCO = 64 * 1024
+
+
+def _blocchi(df):
+    for inizio in range(0, len(df), RIGHE_PER_BLOCCO):
+        yield df.iloc[inizio:inizio + RIGHE_PER_BLOCCO]
+
+
+# CSV in UTF-8 con BOM, così Excel legge correttamente le lettere accentate
+def esporta_csv(df, foglio=None):
+    yield df.iloc[:0].to_csv(index=False).encode("utf-8-sig")
+    for blocco in _blocchi(df):
+        yield blocco.to_csv(index=False, header=False).encode("utf-8")
+
+
+# Destinazione del ParquetWriter che tiene solo i byte non ancora spediti
+# (la posizione serve al writer per gli offset scritti nel footer)
+class _Flusso(io.RawIOBase):
+    def __init__(self):
+        self._parti = []
+        self._posizione = 0
+
+    def writable(self):
+        return True
+
+    def write(self, dati):
+        self._parti.append(bytes(dati))
+        self._posizione += len(dati)
+        return len(dati)
+
+    def tell(self):
+        return self._posizione
+
+    def svuota(self):
+        dati = b"".join(self._parti)
+        self._parti.clear()
+        return dati
+
+
+# Parquet con un row group per blocco di righe; le colonne category diventano dictionary
+def esporta_parquet(df, foglio=None):
+    schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+    flusso = _Flusso()
+    with pq.ParquetWriter(flusso, schema) as writer:
+        for blocco in _blocchi(df):
+            writer.write_table(pa.Table.from_pandas(blocco, schema=schema, preserve_index=False))
+            yield flusso.svuota()
+    yield flusso.svuota()
+
+
+# XLSX con openpyxl in modalità write-only: le righe finiscono subito su disco. Il file è
+# uno zip completo solo dopo save(), quindi viene spedito a blocchi al termine.
+def esporta_xlsx(df, foglio="Dati"):
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(foglio)
+    worksheet.append([str(col) for col in df.columns])
+    for blocco in _blocchi(df):
+        # category e tipi nullable di pandas diventano valori Python, i mancanti celle vuote
+        blocco = blocco.astype(object).where(blocco.notna(), None)
+        for riga in blocco.itertuples(index=False, name=None):
+            worksheet.append(riga)
+
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as file:
+        workbook.save(file)
+        file.seek(0)
+        while dati := file.read(BYTE_PER_BLOCCO):
+            yield dati
+
+
+# formato: (tipo MIME, funzione di esportazione)
+FORMATI = {
+    "csv": ("text/csv", esporta_csv),
+    "parquet": ("application/vnd.apache.parquet", esporta_parquet),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", esporta_xlsx),
+}
+
+
+def esporta(df, formato, foglio):
+    return FORMATI[formato][1](df, foglio)
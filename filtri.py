@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+
+# Colonne su cui filtrano le sezioni Panoramica e Iniziative D&I; "Sorgente" è il
+# workbook di provenienza (dati.COLONNA_SORGENTE): il suo indice tiene le righe di ogni
+# partizione, così una vista su una sola sorgente non tocca le righe delle altre
+COLONNE_FILTRO_INIZIATIVE = ["Nome azienda", "Area Prassi", "Categoria di diversità", "Anno", "Sorgente"]
+# Colonne su cui filtra la sezione Composizione di Genere
+COLONNE_FILTRO_COMPOSIZIONE = ["Nome azienda", "Anno", "Posizione", "Sorgente"]
+
+_VUOTO = np.empty(0, dtype=np.int64)
+
+
+# --- Valori scelti in un dropdown a selezione multipla ---
+# Un valore singolo o una lista; "all" ("Tutti") vale solo se è l'unica scelta, così
+# aggiungere un'azienda a "Tutti" filtra su quell'azienda. None = nessun filtro.
+def valori_filtro(valore):
+    if valore is None:
+        return None
+    if not isinstance(valore, (list, tuple)):
+        valore = [valore]
+    valori = [v for v in valore if v != "all"]
+    return valori or None
+
+
+# Maschera delle righe di `serie` con valore tra `valori`: sui codici delle category
+# (interi piccoli) con np.isin, senza confronti tra stringhe
+def maschera_valori(serie, valori):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codici = serie.cat.categories.get_indexer(valori)
+        return np.isin(serie.cat.codes.to_numpy(), codici[codici >= 0], kind="table")
+    return serie.isin(valori).to_numpy()
+
+
+def _interseca(piccolo, grande):
+    # entrambi gli array sono posizioni ordinate e senza duplicati:
+    # per ogni elemento del più piccolo basta una ricerca binaria nel più grande
+    if len(piccolo) == 0 or len(grande) == 0:
+        return _VUOTO
+    pos = np.searchsorted(grande, piccolo)
+    pos[pos == len(grande)] = 0
+    return piccolo[grande[pos] == piccolo]
+
+
+# Unione di array di posizioni disgiunti e ordinati: finché coprono poche righe basta
+# riordinarne la concatenazione; oltre un ottavo delle righe conviene segnarle in una
+# maschera booleana, che costa in proporzione alle righe totali e non al loro ordine
+def _unione(righe, n_righe):
+    if len(righe) == 1:
+        return righe[0]
+    tutte = np.concatenate(righe)
+    if len(tutte) * 8 < n_righe:
+        return np.sort(tutte)
+    maschera = np.zeros(n_righe, dtype=bool)
+    maschera[tutte] = True
+    return np.flatnonzero(maschera)
+
+
+# --- Motore di filtro basato su indici per valore ---
+# Costruito una volta al caricamento: per ogni colonna filtrabile tiene la versione
+# Categorical e, per ogni valore, l'array ordinato delle posizioni di riga in cui compare.
+# Una combinazione di filtri diventa un'intersezione di array di interi, senza
+# scansioni di stringhe né copie intermedie del DataFrame.
+class MotoreFiltri:
+    def __init__(self, df, colonne):
+        self.df = df
+        self.categorie = {}
+        self.indici = {}
+        for colonna in colonne:
+            categorie = pd.Categorical(df[colonna])
+            codici = categorie.codes
+            # posizioni raggruppate per codice (stabile: ordinate all'interno del gruppo)
+            ordine = np.argsort(codici, kind="stable").astype(np.int64)
+            mancanti = int((codici < 0).sum())
+            conteggi = np.bincount(codici[codici >= 0], minlength=len(categorie.categories))
+            confini = mancanti + np.concatenate([[0], np.cumsum(conteggi)])
+            self.categorie[colonna] = categorie
+            self.indici[colonna] = {
+                valore: ordine[confini[i]:confini[i + 1]]
+                for i, valore in enumerate(categorie.categories.tolist())
+            }
+
+    # Posizioni di riga che soddisfano tutti i filtri; None significa "tutte le righe".
+    # Ogni filtro è un valore o una lista di valori (vedi valori_filtro) e seleziona
+    # l'unione degli array di posizioni dei suoi valori, di cui si conosce la lunghezza
+    # senza calcolarla. Si parte dal filtro con meno righe (per più valori, l'unione degli
+    # array, vedi _unione); gli altri filtri a un valore si intersecano, quelli a più
+    # valori si controllano sui codici delle sole righe rimaste. Nessun isin sull'intera
+    # colonna: il costo segue le righe scelte, non il numero di valori.
+    def posizioni(self, filtri):
+        scelte = []
+        for colonna, valore in filtri.items():
+            valori = valori_filtro(valore)
+            if valori is None:
+                continue
+            indice = self.indici[colonna]
+            righe = [indice[v] for v in dict.fromkeys(valori) if v in indice]
+            if not righe:
+                return _VUOTO
+            scelte.append((sum(len(r) for r in righe), colonna, valori, righe))
+        if not scelte:
+            return None
+
+        scelte.sort(key=lambda scelta: scelta[0])
+        _, _, _, righe = scelte[0]
+        risultato = _unione(righe, len(self.df))
+        for _, colonna, valori, righe in scelte[1:]:
+            if len(righe) == 1:
+                risultato = _interseca(risultato, righe[0])
+                continue
+            categorie = self.categorie[colonna]
+            codici = categorie.categories.get_indexer(valori)
+            risultato = risultato[np.isin(categorie.codes[risultato], codici[codici >= 0], kind="table")]
+        return risultato
+
+    # Righe filtrate; senza filtri attivi restituisce il DataFrame originale (non va modificato)
+    def filtra(self, filtri):
+        posizioni = self.posizioni(filtri)
+        if posizioni is None:
+            return self.df
+        return self.df.take(posizioni)
@@ -0,0 +1,174 @@
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+# Palette personalizzata
+PALETTE = ["#c0c0c0", "#c10a13"]
+ROSSO = "#c10a13"
+COLORE_DONNE = "#c30c13"
+COLORE_UOMINI = "#c3c3c3"
+
+# --- Template condiviso della dashboard ---
+# Parte dal template "plotly" e aggiunge sfondo, colore del testo e palette, così i
+# singoli grafici non devono più chiamare update_layout per impostarli.
+TEMPLATE = "dashboard_di"
+_template = go.layout.Template(pio.templates["plotly"])
+_template.layout.update(
+    plot_bgcolor="#f7f7f7",
+    paper_bgcolor="#f7f7f7",
+    font_color="#080808",
+    colorscale_sequential=[[0.0, PALETTE[0]], [1.0, PALETTE[1]]],
+    piecolorway=PALETTE,
+)
+pio.templates[TEMPLATE] = _template
+
+
+# Versione già serializzata del template: la validazione del template completo è la parte
+# più cara della costruzione di una figura, così viene fatta una sola volta all'avvio
+TEMPLATE_JSON = _template.to_plotly_json()
+
+# Sezioni del layout del template che riguardano solo grafici non cartesiani (mappe, 3D,
+# polari, ternari): le figure della dashboard non le usano mai
+_LAYOUT_NON_CARTESIANO = {"geo", "map", "mapbox", "polar", "scene", "ternary"}
+
+
+# --- Template ridotto ---
+# Il template completo porta i default di tutti i tipi di traccia (~7 KB per figura):
+# ogni figura riceve solo quelli dei tipi che contiene. plotly.js applica i default del
+# template solo ai tipi presenti, quindi il grafico disegnato non cambia.
+@functools.lru_cache(maxsize=None)
+def template_ridotto(tipi):
+    return {
+        "data": {tipo: TEMPLATE_JSON["data"][tipo] for tipo in tipi if tipo in TEMPLATE_JSON["data"]},
+        "layout": {chiave: valore for chiave, valore in TEMPLATE_JSON["layout"].items()
+                   if chiave not in _LAYOUT_NON_CARTESIANO},
+    }
+
+
+# --- Costruttori leggeri basati su graph_objects ---
+# Le tracce sono oggetti graph_objects (validazione leggera), il layout è un dizionario
+# che riusa il template serializzato. Restituiscono il dizionario della figura, cioè
+# quello che dcc.Graph riceve comunque, senza passare da Plotly Express.
+def _figura(tracce, titolo, **layout):
+    dati = [traccia.to_plotly_json() for traccia in tracce]
+    template = template_ridotto(tuple(sorted({traccia["type"] for traccia in dati})))
+    layout = {"template": template, "title": {"text": titolo}, "legend": {"tracegroupgap": 0}, **layout}
+    return {"data": dati, "layout": layout}
+
+
+def _assi(x, y):
+    return {"xaxis": {"title": {"text": x}}, "yaxis": {"title": {"text": y}}}
+
+
+def figura_vuota(titolo):
+    return _figura([], titolo)
+
+
+# Barre colorate in scala continua sul valore (come px.bar con color=y)
+def barre(df, x, y, titolo):
+    traccia = go.Bar(
+        x=df[x].to_numpy(),
+        y=df[y].to_numpy(),
+        marker=dict(color=df[y].to_numpy(), coloraxis="coloraxis"),
+        hovertemplate=f"{x}=%{{x}}<br>{y}=%{{marker.color}}<extra></extra>",
+        showlegend=False,
+    )
+    return _figura(
+        [traccia], titolo, **_assi(x, y),
+        coloraxis={"colorbar": {"title": {"text": y}}},
+        barmode="relative",
+    )
+
+
+# Barre raggruppate, una serie per colonna di `colonne` con il colore indicato
+def barre_raggruppate(df, x, colonne, titolo, colori, titolo_y, titolo_legenda):
+    tracce = [
+        go.Bar(
+            x=df[x].to_numpy(),
+            y=df[colonna].to_numpy(),
+            name=colonna,
+            marker_color=colori[colonna],
+            hovertemplate=f"{titolo_legenda}={colonna}<br>{x}=%{{x}}<br>{titolo_y}=%{{y}}<extra></extra>",
+        )
+        for colonna in colonne
+    ]
+    figura = _figura(tracce, titolo, **_assi(x, titolo_y), barmode="group")
+    figura["layout"]["legend"]["title"] = {"text": titolo_legenda}
+    return figura
+
+
+def torta(df, nomi, valori, titolo, colori=None, hole=None):
+    etichette = df[nomi].to_numpy()
+    traccia = go.Pie(
+        labels=etichette,
+        values=df[valori].to_numpy(),
+        hole=hole,
+        marker_colors=[colori[e] for e in etichette] if colori else None,
+        hovertemplate=f"{nomi}=%{{label}}<br>{valori}=%{{value}}<extra></extra>",
+    )
+    return _figura([traccia], titolo)
+
+
+def linea(df, x, y, titolo, colore=ROSSO):
+    traccia = go.Scatter(
+        x=df[x].to_numpy(),
+        y=df[y].to_numpy(),
+        mode="lines+markers",
+        line_color=colore,
+        marker_color=colore,
+        hovertemplate=f"{x}=%{{x}}<br>{y}=%{{y}}<extra></extra>",
+        showlegend=False,
+    )
+    return _figura([traccia], titolo, **_assi(x, y))
+
+
+# Una linea per ogni valore di `gruppo` (come px.line con color=gruppo)
+def linee(df, x, y, gruppo, titolo):
+    tracce = [
+        go.Scatter(
+            x=parte[x].to_numpy(),
+            y=parte[y].to_numpy(),
+            name=str(nome),
+            mode="lines+markers",
+            hovertemplate=f"{gruppo}={nome}<br>{x}=%{{x}}<br>{y}=%{{y}}<extra></extra>",
+        )
+        for nome, parte in df.groupby(gruppo, observed=True, sort=False)
+    ]
+    figura = _figura(tracce, titolo, **_assi(x, y))
+    figura["layout"]["legend"]["title"] = {"text": gruppo}
+    return figura
+
+
+# --- Cache delle figure ---
+# Chiave: costruttore + parametri + hash dei dati aggregati. Aggregati identici
+# (stessi filtri, o filtri diversi che danno lo stesso risultato) non ricostruiscono
+# la figura. Le figure restituite sono condivise: non vanno modificate.
+MAX_FIGURE_IN_CACHE = 256
+_cache_figure = OrderedDict()
+_lock_cache_figure = threading.Lock()
+
+
+def _hash_dati(df):
+    valori = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    colonne = "\x1f".join(map(str, df.columns)).encode()
+    return hashlib.blake2b(valori.tobytes() + colonne, digest_size=16).hexdigest()
+
+
+def figura_in_cache(costruttore, df, *parametri, **opzioni):
+    chiave = (costruttore.__name__, _hash_dati(df), repr(parametri), repr(sorted(opzioni.items())))
+    with _lock_cache_figure:
+        figura = _cache_figure.get(chiave)
+        if figura is not None:
+            _cache_figure.move_to_end(chiave)
+            return figura
+    figura = costruttore(df, *parametri, **opzioni)
+    with _lock_cache_figure:
+        _cache_figure[chiave] = figura
+        if len(_cache_figure) > MAX_FIGURE_IN_CACHE:
+            _cache_figure.popitem(last=False)
+    return figura
@@ -0,0 +1,32 @@
+# Configurazione gunicorn: gunicorn app:server (il file viene letto in automatico)
+import gc
+import logging
+
+from metriche import memoria_processo
+
+logger = logging.getLogger("gunicorn.error")
+
+# I dati vengono caricati una volta nel master prima del fork: i worker condividono
+# le pagine dei DataFrame copy-on-write invece di tenerne ognuno una copia.
+preload_app = True
+
+
+def _registra_memoria(ruolo, pid):
+    memoria = memoria_processo()
+    logger.info("Memoria %s %d: %s", ruolo, pid,
+                ", ".join(f"{nome} {byte / 2**20:.1f} MB" for nome, byte in memoria.items()))
+
+
+def when_ready(server):
+    # gli oggetti già creati escono dal garbage collector: le sue visite non
+    # sporcano più le pagine condivise nei worker
+    gc.freeze()
+    _registra_memoria("master", server.pid)
+
+
+def post_worker_init(worker):
+    _registra_memoria("worker all'avvio", worker.pid)
+
+
+def worker_exit(server, worker):
+    _registra_memoria("worker in uscita", worker.pid)
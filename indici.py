@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+from interrogazioni import BackendPandas, interrogazione
+
+# Categorie che contano per l'indice categorie
+CATEGORIE_RILEVANTI = ["Genere", "Età", "Disabilità", "Cultura", "LGBTQI+"]
+
+
+# --- Normalizzazione min-max su scala 0–100 ---
+# Se tutti i valori coincidono l'indice vale 0 per tutte le aziende
+def normalizza_0_100(valori):
+    array = valori.to_numpy(dtype=float)
+    if len(array) == 0:
+        return valori.astype(float)
+    minimo, massimo = array.min(), array.max()
+    if massimo == minimo:
+        return pd.Series(0.0, index=valori.index)
+    return pd.Series((array - minimo) / (massimo - minimo) * 100, index=valori.index)
+
+
+# Normalizzazione min-max separata per ogni anno (`anni`, allineato a `valori`)
+def _normalizza_per_anno(valori, anni):
+    gruppi = valori.astype(float).groupby(anni)
+    minimo = gruppi.transform("min")
+    massimo = gruppi.transform("max")
+    normalizzati = (valori.astype(float) - minimo) / (massimo - minimo) * 100
+    return normalizzati.where(massimo != minimo, 0.0)
+
+
+# --- Interrogazioni dei tre sotto-indici ---
+# Conteggi per azienda (o anno e azienda) eseguiti dal backend: iniziative, categorie
+# rilevanti distinte e media della percentuale di donne nel Board. `filtri` si aggiunge a
+# quelli di ogni interrogazione (es. le sorgenti scelte, colonna presente in entrambi i fogli)
+def interrogazioni_indici(chiavi, filtri=None):
+    filtri = filtri or {}
+    return (
+        interrogazione("iniziative", {"n": ("conta", "Titolo dell'attività")}, per=chiavi, filtri=filtri),
+        interrogazione("iniziative", {"n": ("distinti", "Categoria di diversità")}, per=chiavi,
+                       filtri={**filtri, "Categoria di diversità": CATEGORIE_RILEVANTI}),
+        interrogazione("composizione", {"media": ("media", "Percentuale donne")}, per=chiavi,
+                       filtri={**filtri, "Posizione": "Board"}),
+    )
+
+
+# --- Allineamento per codice azienda ---
+# I risultati delle interrogazioni dei due fogli vengono allineati sul codice dell'azienda
+# (vedi dati.anagrafica_aziende) e non sul nome: con il backend pandas è il codice della
+# category "Nome azienda", con i backend SQL si cerca una volta ogni nome restituito.
+# I codici valgono solo per i dati caricati e non escono da questo modulo.
+def _codici_aziende(nomi, aziende):
+    if isinstance(nomi.dtype, pd.CategoricalDtype) and nomi.cat.categories.equals(aziende):
+        return nomi.cat.codes.to_numpy()
+    return aziende.get_indexer(nomi)
+
+
+# Inverso di _codici_aziende: i nomi dei codici, con il tipo dei nomi restituiti dal backend
+def _nomi_da_codici(codici, nomi, aziende):
+    if isinstance(nomi.dtype, pd.CategoricalDtype) and nomi.cat.categories.equals(aziende):
+        return pd.Categorical.from_codes(codici, dtype=nomi.dtype)
+    return aziende.take(codici)
+
+
+# Colonna `misura` di un risultato, indicizzata per un solo intero: il codice dell'azienda,
+# o anno × numero di aziende + codice se si raggruppa anche per anno (stesso ordine di anno e
+# nome, e l'allineamento tra i risultati resta su un indice di interi)
+def _per_codice(risultato, chiavi, misura, aziende):
+    chiave = _codici_aziende(risultato["Nome azienda"], aziende).astype(np.int64)
+    if "Anno" in chiavi:
+        chiave += risultato["Anno"].to_numpy(np.int64) * len(aziende)
+    return pd.Series(risultato[misura].to_numpy(), index=chiave)
+
+
+# --- Calcolo dei 3 indici e di quello finale ---
+# Le aggregazioni sono interrogazioni del backend, la normalizzazione e la media finale
+# lavorano sulle tabelle per azienda che ne risultano. `chiavi` sono le colonne di
+# raggruppamento: ["Nome azienda"] per un solo periodo, ["Anno", "Nome azienda"] per
+# tutti gli anni in un passaggio (la normalizzazione è allora fatta anno per anno).
+def _calcola_indici(backend, chiavi, filtri=None):
+    q_iniziative, q_categorie, q_parita = interrogazioni_indici(chiavi, filtri)
+    aziende = backend.aziende
+
+    # -------- indice iniziative ----------
+    iniziative = backend.aggrega(q_iniziative)
+    n_iniziative = _per_codice(iniziative, chiavi, "n", aziende)
+    if "Anno" in chiavi:
+        indice_iniziative = _normalizza_per_anno(n_iniziative, n_iniziative.index // len(aziende))
+    else:
+        indice_iniziative = normalizza_0_100(n_iniziative)
+
+    # -------- indice categorie ----------
+    # quante delle categorie rilevanti compaiono almeno una volta per azienda?
+    # (le aziende senza categorie rilevanti restano con 0)
+    n_categorie = _per_codice(backend.aggrega(q_categorie), chiavi, "n", aziende).reindex(n_iniziative.index, fill_value=0)
+    indice_categorie = n_categorie / len(CATEGORIE_RILEVANTI) * 100
+
+    # -------- indice parità di genere ----------
+    # le percentuali arrivano già numeriche su scala 0–100 (vedi dati.normalizza_composizione)
+    media_donne = _per_codice(backend.aggrega(q_parita), chiavi, "media", aziende)
+    indice_parita_genere = 100 - (50 - media_donne).abs() * 2        # 50 → 100, 0/100 → 0
+
+    # -------- unisco tutto ----------
+    risultati = (
+        pd.DataFrame({
+            "Indice iniziative": indice_iniziative,
+            "Indice categorie": indice_categorie,
+            "Indice parità genere": indice_parita_genere,
+        })
+        .fillna(0)
+    )
+    # dalla chiave intera tornano le colonne esplicite, nell'ordine di `chiavi`
+    anni, codici = np.divmod(risultati.index.to_numpy(), len(aziende))
+    colonne = {"Nome azienda": _nomi_da_codici(codici, iniziative["Nome azienda"], aziende)}
+    if "Anno" in chiavi:
+        colonne["Anno"] = anni.astype(iniziative["Anno"].dtype)
+    for posizione, colonna in enumerate(chiavi):
+        risultati.insert(posizione, colonna, colonne[colonna])
+    risultati = risultati.reset_index(drop=True)
+
+    risultati["Indice diversità finale"] = risultati[
+        ["Indice iniziative", "Indice categorie", "Indice parità genere"]
+    ].mean(axis=1)
+
+    return risultati
+
+
+def tre_indici(backend, filtri=None):
+    return _calcola_indici(backend, ["Nome azienda"], filtri)
+
+
+# --- Pannello anno × azienda ---
+# Gli stessi indici di tre_indici applicata ai dati di ciascun anno, per tutti gli anni
+# in un solo passaggio raggruppato. Righe ordinate per anno e azienda.
+def indici_per_anno(backend, filtri=None):
+    return _calcola_indici(backend, ["Anno", "Nome azienda"], filtri)
+
+
+# Stessi calcoli direttamente su due DataFrame (backend pandas senza indici di filtro)
+def calcola_tre_indici(df_iniziative, df_genere):
+    return tre_indici(BackendPandas.da_fogli(df_iniziative, df_genere))
+
+
+def calcola_indici_per_anno(df_iniziative, df_genere):
+    return indici_per_anno(BackendPandas.da_fogli(df_iniziative, df_genere))
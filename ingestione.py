@@ -0,0 +1,111 @@
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dati import (
+    FOGLI, FOGLIO_COMPOSIZIONE, FOGLIO_INIZIATIVE, compatta, impronte_fogli, leggi_fogli, leggi_manifest,
+    nome_sorgente, percorso_partizione, rimuovi_partizioni_obsolete, scrivi_manifest, scrivi_partizione
+)
+
+logger = logging.getLogger(__name__)
+
+# --- Ingestione di più workbook in un dataset partizionato ---
+# Legge tutti i workbook di una cartella (stessi due fogli, uno per comune o per periodo)
+# in un pool di processi: ogni processo legge, normalizza e compatta un workbook e ne
+# scrive i fogli come partizione del dataset (vedi dati.py, "Dataset partizionato"), così
+# al processo principale torna solo il numero di righe. I workbook con le stesse impronte
+# dell'ultima ingestione non vengono riletti. Alla fine il manifest viene sostituito e i
+# file delle partizioni non più in uso rimossi.
+# Uso: python -m ingestione cartella_workbook cartella_dataset [--processi 4]
+ESTENSIONI = (".xlsx", ".xlsm", ".xls", ".ods")
+
+
+def elenca_workbook(cartella):
+    return sorted(
+        os.path.join(cartella, nome) for nome in os.listdir(cartella)
+        # "~$..." sono i file di blocco di Excel per i workbook aperti
+        if nome.lower().endswith(ESTENSIONI) and not nome.startswith("~$")
+    )
+
+
+# Eseguita in un processo del pool: una partizione per workbook
+def ingerisci_workbook(percorso, dataset, sorgente, impronte):
+    fogli = leggi_fogli(percorso)
+    compatti = dict(zip(FOGLI, compatta(fogli[FOGLIO_INIZIATIVE], fogli[FOGLIO_COMPOSIZIONE], sorgente)))
+    for foglio, df in compatti.items():
+        scrivi_partizione(df, dataset, foglio, sorgente, impronte[foglio])
+    return {FOGLI[foglio]: len(df) for foglio, df in compatti.items()}
+
+
+def _partizione_completa(dataset, sorgente, voce):
+    return all(
+        os.path.exists(percorso_partizione(dataset, foglio, sorgente, voce["impronte"][FOGLI[foglio]]))
+        for foglio in FOGLI
+    )
+
+
+# Restituisce le partizioni del nuovo manifest e il numero di workbook letti e non riusciti
+def ingerisci(cartella, dataset, processi=None):
+    inizio = time.perf_counter()
+    os.makedirs(dataset, exist_ok=True)
+    precedenti = leggi_manifest(dataset)
+    partizioni = {}
+    da_leggere = {}
+    for percorso in elenca_workbook(cartella):
+        sorgente = nome_sorgente(percorso)
+        if sorgente in partizioni or sorgente in da_leggere:
+            logger.warning("Workbook %s ignorato: la sorgente %r esiste già", percorso, sorgente)
+            continue
+        impronte = impronte_fogli(percorso)
+        voce = {"workbook": os.path.basename(percorso), "impronte": {FOGLI[f]: i for f, i in impronte.items()}}
+        precedente = precedenti.get(sorgente)
+        if (precedente and precedente["impronte"] == voce["impronte"]
+                and _partizione_completa(dataset, sorgente, precedente)):
+            partizioni[sorgente] = precedente
+        else:
+            da_leggere[sorgente] = (percorso, impronte, voce)
+    invariate = len(partizioni)
+
+    errori = 0
+    if da_leggere:
+        with ProcessPoolExecutor(max_workers=processi) as pool:
+            attesi = {
+                pool.submit(ingerisci_workbook, percorso, dataset, sorgente, impronte): sorgente
+                for sorgente, (percorso, impronte, _) in da_leggere.items()
+            }
+            for futuro in as_completed(attesi):
+                sorgente = attesi[futuro]
+                percorso, _, voce = da_leggere[sorgente]
+                try:
+                    righe = futuro.result()
+                except Exception:
+                    # workbook non valido: resta la partizione precedente, se c'era
+                    logger.exception("Workbook %s non letto", percorso)
+                    errori += 1
+                    if sorgente in precedenti:
+                        partizioni[sorgente] = precedenti[sorgente]
+                    continue
+                partizioni[sorgente] = {**voce, "righe": righe}
+                logger.info("Partizione %r: %s", sorgente,
+                            ", ".join(f"{n} righe di {foglio}" for foglio, n in righe.items()))
+
+    scrivi_manifest(dataset, partizioni)
+    rimuovi_partizioni_obsolete(dataset, partizioni)
+    logger.info("Dataset %s: %d partizioni (%d lette, %d non riuscite, %d invariate) in %.1f s",
+                dataset, len(partizioni), len(da_leggere) - errori, errori,
+                invariate, time.perf_counter() - inizio)
+    return partizioni, len(da_leggere), errori
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description="Ingestione di una cartella di workbook in un dataset partizionato")
+    parser.add_argument("cartella_workbook")
+    parser.add_argument("cartella_dataset")
+    parser.add_argument("--processi", type=int, help="processi del pool (predefinito: uno per CPU)")
+    argomenti = parser.parse_args()
+    _, _, errori = ingerisci(argomenti.cartella_workbook, argomenti.cartella_dataset, argomenti.processi)
+    if errori:
+        raise SystemExit(f"{errori} workbook non letti")
@@ -0,0 +1,348 @@
+import glob
+import os
+import pathlib
+import sqlite3
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from filtri import maschera_valori, valori_filtro
+
+# Motore che esegue le aggregazioni delle callback: "pandas" (DataFrame in memoria, il
+# comportamento di sempre), "duckdb" o "sqlite" (database incorporato su disco)
+BACKEND = os.environ.get("DASHBOARD_BACKEND", "pandas")
+
+
+# --- Interrogazioni ---
+# Ogni aggregazione delle callback è descritta una volta sola: foglio ("iniziative" o
+# "composizione"), filtri (colonna -> valore o lista di valori, vedi filtri.valori_filtro),
+# colonne di raggruppamento e misure (nome -> (funzione, colonna)). Ogni backend la
+# esegue a modo suo e restituisce lo stesso DataFrame: colonne di raggruppamento e misure,
+# una riga per gruppo presente (chiavi mancanti escluse), in ordine di chiave.
+# Senza raggruppamento il risultato è una sola riga.
+Interrogazione = namedtuple("Interrogazione", ["foglio", "filtri", "per", "misure"])
+
+# funzione -> aggregazione pandas; "righe" conta le righe, le altre ignorano i mancanti
+FUNZIONI_PANDAS = {"righe": "size", "conta": "count", "distinti": "nunique", "somma": "sum", "media": "mean"}
+FUNZIONI_SQL = {
+    "righe": "COUNT(*)",
+    "conta": "COUNT({})",
+    "distinti": "COUNT(DISTINCT {})",
+    "somma": "COALESCE(SUM({}), 0)",
+    "media": "AVG({})",
+}
+
+
+def interrogazione(foglio, misure, per=(), filtri=None):
+    return Interrogazione(foglio, dict(filtri or {}), tuple(per), tuple(misure.items()))
+
+
+# --- Interrogazioni delle sezioni della dashboard ---
+# Usate dalle callback in app.py (quelle degli indici sono in indici.py)
+def numero_aziende(filtri):
+    return interrogazione("iniziative", {"aziende": ("distinti", "Nome azienda")}, filtri=filtri)
+
+
+def numero_iniziative(filtri):
+    return interrogazione("iniziative", {"iniziative": ("conta", "Titolo dell'attività")}, filtri=filtri)
+
+
+# Righe di composizione che rendono inclusiva un'azienda per il KPI della Panoramica:
+# linguaggio inclusivo in uno degli anni e delle sorgenti scelti. Il conteggio delle
+# aziende selezionate che ne hanno almeno una è un metodo dei backend (aziende_inclusive),
+# così i nomi delle aziende selezionate non tornano al backend come filtro.
+def filtri_inclusivo(anno, sorgente="all"):
+    return {"Anno": anno, "Sorgente": sorgente, "Linguaggio inclusivo": True}
+
+
+def iniziative_per_anno(filtri):
+    return interrogazione(
+        "iniziative", {"Numero iniziative": ("conta", "Titolo dell'attività")}, per=["Anno"], filtri=filtri
+    )
+
+
+def righe_per(colonna, filtri):
+    return interrogazione("iniziative", {"Count": ("righe", None)}, per=[colonna], filtri=filtri)
+
+
+def totali_genere(filtri):
+    return interrogazione("composizione", {
+        "righe": ("righe", None),
+        "Donne": ("somma", "Numero donne"),
+        "Uomini": ("somma", "Numero uomini"),
+    }, filtri=filtri)
+
+
+# percentuali già numeriche su scala 0–100 (normalizzate al caricamento)
+def medie_genere(filtri):
+    return interrogazione("composizione", {
+        "Percentuale donne": ("media", "Percentuale donne"),
+        "Percentuale uomini": ("media", "Percentuale uomini"),
+    }, per=["Nome azienda", "Posizione"], filtri=filtri)
+
+
+# Nomi delle aziende in ordine di codice (vedi dati.anagrafica_aziende): le categorie di
+# "Nome azienda", le stesse nei due fogli compatti; per fogli non compatti, i nomi in
+# ordine alfabetico
+def nomi_aziende(fogli):
+    nomi = fogli["iniziative"]["Nome azienda"]
+    if isinstance(nomi.dtype, pd.CategoricalDtype):
+        return nomi.cat.categories
+    return pd.Index(sorted(pd.concat([df["Nome azienda"] for df in fogli.values()]).dropna().unique()))
+
+
+# --- Backend pandas ---
+# Filtra con i MotoreFiltri delle colonne indicizzate (maschere per le altre) e aggrega
+# con groupby. Le interrogazioni sulle iniziative che il cubo della Panoramica sa
+# risolvere (vedi cubo.CuboIniziative.aggrega) non toccano le singole righe.
+class BackendPandas:
+    nome = "pandas"
+
+    def __init__(self, fogli, motori=None, cubo=None):
+        self.fogli = fogli
+        self.motori = motori or {}
+        self.cubo = cubo
+        self.aziende = nomi_aziende(fogli)
+
+    @classmethod
+    def da_fogli(cls, df_iniziative, df_composizione):
+        return cls({"iniziative": df_iniziative, "composizione": df_composizione})
+
+    # Solo le colonne usate dall'interrogazione: le righe scelte non copiano le altre
+    def _filtra(self, q):
+        df = self.fogli[q.foglio]
+        motore = self.motori.get(q.foglio)
+        indicizzati = {}
+        if motore is not None:
+            indicizzati = {col: valore for col, valore in q.filtri.items() if col in motore.indici}
+        usate = [*q.per, *(colonna for _, (_, colonna) in q.misure if colonna),
+                 *(colonna for colonna in q.filtri if colonna not in indicizzati)]
+        df = df[list(dict.fromkeys(usate))]
+        if indicizzati:
+            posizioni = motore.posizioni(indicizzati)
+            if posizioni is not None:
+                df = df.take(posizioni)
+        for colonna, valore in q.filtri.items():
+            valori = valori_filtro(valore)
+            if colonna not in indicizzati and valori is not None:
+                df = df[maschera_valori(df[colonna], valori)]
+        return df
+
+    def aggrega(self, q):
+        if q.foglio == "iniziative" and self.cubo is not None:
+            risultato = self.cubo.aggrega(q.filtri, q.per, q.misure)
+            if risultato is not None:
+                return risultato
+
+        df = self._filtra(q)
+        # medie in doppia precisione, come AVG dei motori SQL
+        medie = {colonna: float for _, (funzione, colonna) in q.misure if funzione == "media"}
+        if medie:
+            df = df.astype(medie)
+        if not q.per:
+            return pd.DataFrame({
+                nome: [len(df) if funzione == "righe" else getattr(df[colonna], FUNZIONI_PANDAS[funzione])()]
+                for nome, (funzione, colonna) in q.misure
+            })
+        return df.groupby(list(q.per), observed=True).agg(**{
+            nome: (colonna or q.per[0], FUNZIONI_PANDAS[funzione]) for nome, (funzione, colonna) in q.misure
+        }).reset_index()
+
+    # Quante delle aziende selezionate da `filtri` (sulle iniziative) hanno il linguaggio
+    # inclusivo negli anni e nelle sorgenti scelti: con il cubo è una lettura della tabella
+    # booleana cubo.inclusivo per i codici delle aziende selezionate, senza cubo due
+    # maschere sulle righe
+    def aziende_inclusive(self, filtri, anno="all", sorgente="all"):
+        if self.cubo is not None:
+            return self.cubo.aziende_inclusive(self.cubo.seleziona(filtri), anno, sorgente)
+        selezionate = self._filtra(interrogazione("iniziative", {}, per=["Nome azienda"], filtri=filtri))
+        inclusive = self._filtra(
+            interrogazione("composizione", {}, per=["Nome azienda"], filtri=filtri_inclusivo(anno, sorgente))
+        )
+        aziende = selezionate["Nome azienda"].dropna().unique()
+        return int(pd.Series(aziende).isin(inclusive["Nome azienda"]).sum())
+
+
+# --- Backend SQL ---
+# Le interrogazioni diventano una SELECT con WHERE ... IN e GROUP BY, eseguita su un
+# database costruito una volta per versione dei dati (stessa impronta degli snapshot) e
+# aperto in sola lettura: i dati stanno su disco e non in una copia per worker.
+def _nome_sql(nome):
+    return '"' + str(nome).replace('"', '""') + '"'
+
+
+def _parametro(valore):
+    return valore.item() if isinstance(valore, np.generic) else valore
+
+
+# Condizioni WHERE ... IN dei filtri e loro parametri
+def _condizioni(filtri):
+    condizioni = []
+    parametri = []
+    for colonna, valore in filtri.items():
+        valori = valori_filtro(valore)
+        if valori is None:
+            continue
+        condizioni.append(f"{_nome_sql(colonna)} IN ({', '.join('?' * len(valori))})")
+        parametri.extend(_parametro(v) for v in valori)
+    return condizioni, parametri
+
+
+def componi_sql(q):
+    condizioni, parametri = _condizioni(q.filtri)
+    # come groupby di pandas: le righe con chiave mancante non formano un gruppo
+    condizioni += [f"{_nome_sql(colonna)} IS NOT NULL" for colonna in q.per]
+
+    selezione = [_nome_sql(colonna) for colonna in q.per] + [
+        f"{FUNZIONI_SQL[funzione].format(_nome_sql(colonna) if colonna else '')} AS {_nome_sql(nome)}"
+        for nome, (funzione, colonna) in q.misure
+    ]
+    sql = f"SELECT {', '.join(selezione)} FROM {_nome_sql(q.foglio)}"
+    if condizioni:
+        sql += " WHERE " + " AND ".join(condizioni)
+    if q.per:
+        chiavi = ", ".join(_nome_sql(colonna) for colonna in q.per)
+        sql += f" GROUP BY {chiavi} ORDER BY {chiavi}"
+    return sql, parametri
+
+
+# KPI del linguaggio inclusivo in una sola interrogazione: aziende distinte delle
+# iniziative filtrate che compaiono tra quelle con una riga di composizione inclusiva
+# (semi-join con una sottointerrogazione non correlata, eseguita una volta sola); i
+# parametri sono solo i valori dei filtri, non i nomi delle aziende selezionate
+def componi_sql_inclusive(filtri, anno, sorgente="all"):
+    azienda = _nome_sql("Nome azienda")
+    condizioni, parametri = _condizioni(filtri)
+    condizioni_inclusivo, parametri_inclusivo = _condizioni(filtri_inclusivo(anno, sorgente))
+    inclusive = f"SELECT {azienda} FROM {_nome_sql('composizione')} WHERE {' AND '.join(condizioni_inclusivo)}"
+    condizioni += [f"{azienda} IS NOT NULL", f"{azienda} IN ({inclusive})"]
+    sql = f"SELECT COUNT(DISTINCT {azienda}) AS aziende FROM {_nome_sql('iniziative')} WHERE {' AND '.join(condizioni)}"
+    return sql, parametri + parametri_inclusivo
+
+
+class _BackendSQL:
+    estensione = None
+
+    # `fogli` resta a disposizione per ricostruire il file se sparisce (vedi _connessione)
+    def __init__(self, percorso, fogli, indici):
+        self.percorso = percorso
+        self.fogli = fogli
+        self.indici = indici
+        self.aziende = nomi_aziende(fogli)
+        self._lock = threading.Lock()
+        self._locale = threading.local()
+        if not os.path.exists(percorso):
+            self.costruisci()
+
+    def costruisci(self):
+        temporaneo = f"{self.percorso}.{os.getpid()}.tmp"
+        if os.path.exists(temporaneo):
+            os.remove(temporaneo)
+        self._scrivi(temporaneo)
+        os.replace(temporaneo, self.percorso)
+
+    # Connessione del thread corrente, aperta al primo uso nel processo (mai ereditata
+    # con il fork dei worker gunicorn)
+    def _connessione(self):
+        connessione = getattr(self._locale, "connessione", None)
+        if connessione is not None and self._locale.pid == os.getpid():
+            return connessione
+        with self._lock:
+            if not os.path.exists(self.percorso):
+                # rimosso da un altro processo che è già passato a dati più nuovi
+                self.costruisci()
+            connessione = self._apri()
+        self._locale.connessione = connessione
+        self._locale.pid = os.getpid()
+        return connessione
+
+    def aggrega(self, q):
+        sql, parametri = componi_sql(q)
+        return self._esegui(sql, parametri)
+
+    def aziende_inclusive(self, filtri, anno="all", sorgente="all"):
+        sql, parametri = componi_sql_inclusive(filtri, anno, sorgente)
+        return int(self._esegui(sql, parametri)["aziende"].iloc[0])
+
+
+# DuckDB è una dipendenza facoltativa (requirements-duckdb.txt), necessaria solo con
+# DASHBOARD_BACKEND=duckdb: senza il pacchetto l'errore dice quale installare
+def _duckdb():
+    try:
+        import duckdb
+    except ImportError as errore:
+        raise ImportError(
+            "Il backend duckdb richiede il pacchetto 'duckdb', non installato: "
+            "pip install -r requirements-duckdb.txt"
+        ) from errore
+    return duckdb
+
+
+class BackendDuckDB(_BackendSQL):
+    nome = "duckdb"
+    estensione = "duckdb"
+
+    # controllo all'avvio, anche quando il file del database esiste già
+    def __init__(self, percorso, fogli, indici):
+        _duckdb()
+        super().__init__(percorso, fogli, indici)
+
+    def _scrivi(self, destinazione):
+        with _duckdb().connect(destinazione) as connessione:
+            for tabella, df in self.fogli.items():
+                connessione.register("foglio", df)
+                connessione.execute(f"CREATE TABLE {_nome_sql(tabella)} AS SELECT * FROM foglio")
+                connessione.unregister("foglio")
+
+    def _apri(self):
+        return _duckdb().connect(self.percorso, read_only=True)
+
+    def _esegui(self, sql, parametri):
+        # un cursore per chiamata: la connessione DuckDB non va usata da più thread insieme
+        with self._connessione().cursor() as cursore:
+            return cursore.execute(sql, parametri).df()
+
+
+class BackendSQLite(_BackendSQL):
+    nome = "sqlite"
+    estensione = "sqlite"
+
+    def _scrivi(self, destinazione):
+        with sqlite3.connect(destinazione) as connessione:
+            for tabella, df in self.fogli.items():
+                df.to_sql(tabella, connessione, index=False)
+                for colonna in self.indici.get(tabella, []):
+                    connessione.execute(
+                        f"CREATE INDEX {_nome_sql(f'{tabella}_{colonna}')} "
+                        f"ON {_nome_sql(tabella)} ({_nome_sql(colonna)})"
+                    )
+        connessione.close()
+
+    def _apri(self):
+        uri = pathlib.Path(self.percorso).absolute().as_uri() + "?mode=ro"
+        return sqlite3.connect(uri, uri=True)
+
+    def _esegui(self, sql, parametri):
+        return pd.read_sql_query(sql, self._connessione(), params=parametri)
+
+
+BACKEND_SQL = {"duckdb": BackendDuckDB, "sqlite": BackendSQLite}
+
+
+# Database del backend `nome` per i fogli indicati, accanto agli snapshot della stessa
+# impronta; i file di impronte precedenti dello stesso workbook vengono rimossi
+def apri_database(nome, fogli, indici, percorso, cartella, impronta):
+    classe = BACKEND_SQL[nome]
+    os.makedirs(cartella, exist_ok=True)
+    base = os.path.splitext(os.path.basename(percorso))[0].replace(" ", "_")
+    destinazione = os.path.join(cartella, f"{base}.{impronta}.{classe.estensione}")
+    backend = classe(destinazione, fogli, indici)
+    for vecchio in glob.glob(os.path.join(glob.escape(cartella), f"{base}.*.{classe.estensione}")):
+        if vecchio != destinazione:
+            try:
+                os.remove(vecchio)
+            except OSError:
+                pass
+    return backend
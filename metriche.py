@@ -0,0 +1,173 @@
+import cProfile
+import contextvars
+import functools
+import heapq
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Histogram, generate_latest, multiprocess
+)
+
+logger = logging.getLogger(__name__)
+
+# --- Metriche delle callback in formato Prometheus ---
+# Con più worker gunicorn va impostata PROMETHEUS_MULTIPROC_DIR (cartella vuota e
+# scrivibile) prima dell'avvio: /metrics aggrega allora i valori di tutti i processi.
+# Senza la variabile ogni worker espone solo i propri.
+DURATA_CALLBACK = Histogram(
+    "dashboard_callback_durata_secondi",
+    "Tempo delle callback Dash per fase (filtro, aggregazione, grafici, serializzazione, totale)",
+    ["callback", "fase"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+PAYLOAD_CALLBACK = Histogram(
+    "dashboard_callback_payload_byte",
+    "Dimensione della risposta JSON delle callback Dash",
+    ["callback"],
+    buckets=(1e3, 5e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7),
+)
+
+# Profilazione opzionale: con DASHBOARD_PROFILE_TOP_N=N ogni chiamata viene profilata
+# con cProfile e si conservano su disco le statistiche delle N più lente
+PROFILE_TOP_N = int(os.environ.get("DASHBOARD_PROFILE_TOP_N", "0"))
+CARTELLA_PROFILI = os.environ.get("DASHBOARD_PROFILE_DIR", ".profili")
+
+_misura_corrente = contextvars.ContextVar("misura_corrente", default=None)
+_profili_piu_lenti = []          # heap di (durata, percorso .prof)
+_lock_profili = threading.Lock()
+_lock_profiler = threading.Lock()  # un solo profiler attivo alla volta
+
+
+# Misura una fase della callback in corso; fuori da una callback strumentata non fa nulla
+@contextmanager
+def fase(nome):
+    misura = _misura_corrente.get()
+    if misura is None:
+        yield
+        return
+    inizio = time.perf_counter()
+    try:
+        yield
+    finally:
+        misura[nome] = misura.get(nome, 0.0) + time.perf_counter() - inizio
+
+
+def _salva_profilo(nome_callback, durata, profiler):
+    with _lock_profili:
+        if len(_profili_piu_lenti) >= PROFILE_TOP_N and durata <= _profili_piu_lenti[0][0]:
+            return
+        os.makedirs(CARTELLA_PROFILI, exist_ok=True)
+        percorso = os.path.join(
+            CARTELLA_PROFILI, f"{nome_callback}-{durata * 1000:.0f}ms-{os.getpid()}-{time.time_ns()}.prof"
+        )
+        profiler.dump_stats(percorso)
+        heapq.heappush(_profili_piu_lenti, (durata, percorso))
+        if len(_profili_piu_lenti) > PROFILE_TOP_N:
+            _, escluso = heapq.heappop(_profili_piu_lenti)
+            try:
+                os.remove(escluso)
+            except OSError:
+                pass
+
+
+def _strumenta_funzione(funzione):
+    @functools.wraps(funzione)
+    def strumentata(*args, **kwargs):
+        misura = {}
+        token = _misura_corrente.set(misura)
+        profiler = None
+        if PROFILE_TOP_N and _lock_profiler.acquire(blocking=False):
+            profiler = cProfile.Profile()
+        inizio = time.perf_counter()
+        try:
+            if profiler is None:
+                return funzione(*args, **kwargs)
+            return profiler.runcall(funzione, *args, **kwargs)
+        finally:
+            durata = time.perf_counter() - inizio
+            _misura_corrente.reset(token)
+            if profiler is not None:
+                _lock_profiler.release()
+                _salva_profilo(funzione.__name__, durata, profiler)
+            for nome_fase, secondi in misura.items():
+                DURATA_CALLBACK.labels(funzione.__name__, nome_fase).observe(secondi)
+            DURATA_CALLBACK.labels(funzione.__name__, "totale").observe(durata)
+            # la serializzazione avviene dopo, in Dash: la completa _registra_risposta
+            if has_request_context():
+                g.callback_strumentata = (funzione.__name__, durata)
+    return strumentata
+
+
+def _inizio_richiesta():
+    g.inizio_richiesta = time.perf_counter()
+
+
+def _registra_risposta(risposta):
+    dati = getattr(g, "callback_strumentata", None)
+    if dati is None:
+        return risposta
+    nome, durata_callback = dati
+    # tempo di Dash oltre la callback: validazione degli output e serializzazione JSON
+    serializzazione = time.perf_counter() - g.inizio_richiesta - durata_callback
+    DURATA_CALLBACK.labels(nome, "serializzazione").observe(max(serializzazione, 0.0))
+    if not risposta.direct_passthrough:
+        PAYLOAD_CALLBACK.labels(nome).observe(risposta.calculate_content_length() or 0)
+    return risposta
+
+
+def _metrics():
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+        return Response(generate_latest(registro), mimetype=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+
+
+# --- Memoria del processo ---
+# Da /proc/self/smaps_rollup (Linux), in byte: rss totale, pss (le pagine condivise
+# contano pro quota) e uss (pagine private). Per un worker gunicorn con preload_app
+# l'uss è la parte che non condivide con il master dopo il fork.
+def memoria_processo():
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            campi = {}
+            for riga in f:
+                nome, _, valore = riga.partition(":")
+                if valore.strip().endswith("kB"):
+                    campi[nome] = int(valore.split()[0]) * 1024
+    except OSError:
+        # altri sistemi: solo il picco di rss (in KB su Linux, in byte su macOS)
+        import resource
+        return {"rss_massimo": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    return {
+        "rss": campi.get("Rss", 0),
+        "pss": campi.get("Pss", 0),
+        "uss": campi.get("Private_Clean", 0) + campi.get("Private_Dirty", 0),
+    }
+
+
+# --- Aggancio all'app Dash ---
+# Va chiamata prima di registrare le callback: sostituisce app.callback con una versione
+# che avvolge ogni funzione nella misura dei tempi, e aggiunge la route /metrics.
+def strumenta_app(app):
+    callback_originale = app.callback
+
+    def callback(*args, **kwargs):
+        decoratore = callback_originale(*args, **kwargs)
+
+        def registra(funzione):
+            return decoratore(_strumenta_funzione(funzione))
+        return registra
+
+    app.callback = callback
+    app.server.before_request(_inizio_richiesta)
+    app.server.after_request(_registra_risposta)
+    app.server.add_url_rule("/metrics", "metrics", _metrics)
+    if PROFILE_TOP_N:
+        logger.info("Profilazione attiva: statistiche delle %d callback più lente in %s",
+                    PROFILE_TOP_N, CARTELLA_PROFILI)
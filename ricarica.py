@@ -0,0 +1,205 @@
+import logging
+import os
+import threading
+
+from cubo import CuboIniziative
+from dati import (
+    CARTELLA_DATASET, CARTELLA_SNAPSHOT, COLONNA_SORGENTE, FILE_EXCEL, FOGLI, FOGLIO_COMPOSIZIONE,
+    FOGLIO_INIZIATIVE, carica_dati, differenze_righe, impronta_dati
+)
+from filtri import COLONNE_FILTRO_COMPOSIZIONE, COLONNE_FILTRO_INIZIATIVE, MotoreFiltri
+from interrogazioni import BACKEND, BackendPandas, apri_database
+
+logger = logging.getLogger(__name__)
+
+# Ogni quanti secondi si controlla se il workbook è cambiato (0 = mai)
+INTERVALLO_RICARICA = float(os.environ.get("DASHBOARD_RELOAD_INTERVAL", "10"))
+
+
+# --- Funzione per creare le opzioni dei dropdown ---
+def crea_opzioni(colonna, df):
+    valori = sorted(df[colonna].dropna().unique())
+    return [{"label": "Tutti", "value": "all"}] + [{"label": str(val), "value": val} for val in valori]
+
+
+def opzioni_iniziative(df_iniziative):
+    return {
+        "anno": crea_opzioni("Anno", df_iniziative),
+        "azienda": crea_opzioni("Nome azienda", df_iniziative),
+        "area": crea_opzioni("Area Prassi", df_iniziative),
+        "categoria": crea_opzioni("Categoria di diversità", df_iniziative),
+        "sorgente": crea_opzioni(COLONNA_SORGENTE, df_iniziative),
+    }
+
+
+def opzioni_composizione(df_composizione):
+    return {
+        "anno_genere": crea_opzioni("Anno", df_composizione),
+        "azienda_genere": crea_opzioni("Nome azienda", df_composizione),
+        "posizione_genere": crea_opzioni("Posizione", df_composizione),
+        "sorgente_genere": crea_opzioni(COLONNA_SORGENTE, df_composizione),
+    }
+
+
+# --- Versione dei dati ---
+# Tutto quello che le callback leggono e che dipende dal workbook: i due fogli, gli indici
+# di filtro, il cubo, il backend delle interrogazioni e le opzioni dei dropdown. Non viene
+# mai modificata dopo la creazione: una ricarica ne costruisce una nuova, riusando le
+# strutture dei fogli non cambiati. Le callback leggono GestoreDati.corrente una volta
+# all'inizio e usano solo quella.
+class VersioneDati:
+    def __init__(self, df_iniziative, df_composizione, impronte, caricata, precedente=None,
+                 percorso=FILE_EXCEL, cartella=CARTELLA_SNAPSHOT):
+        self.df_iniziative = df_iniziative
+        self.df_composizione = df_composizione
+        self.impronte = impronte
+        self.impronta = impronta_dati(impronte)
+        self.caricata = caricata      # mtime del workbook letto, in ns
+        stesse_iniziative = precedente is not None and df_iniziative is precedente.df_iniziative
+        stessa_composizione = precedente is not None and df_composizione is precedente.df_composizione
+
+        if stesse_iniziative:
+            self.motore_iniziative = precedente.motore_iniziative
+            self._opzioni_iniziative = precedente._opzioni_iniziative
+        else:
+            # indici per valore sulle colonne filtrabili (vedi filtri.py)
+            self.motore_iniziative = MotoreFiltri(df_iniziative, COLONNE_FILTRO_INIZIATIVE)
+            self._opzioni_iniziative = opzioni_iniziative(df_iniziative)
+
+        if stessa_composizione:
+            self.motore_composizione = precedente.motore_composizione
+            self._opzioni_composizione = precedente._opzioni_composizione
+        else:
+            self.motore_composizione = MotoreFiltri(df_composizione, COLONNE_FILTRO_COMPOSIZIONE)
+            self._opzioni_composizione = opzioni_composizione(df_composizione)
+        self.opzioni = {**self._opzioni_iniziative, **self._opzioni_composizione}
+
+        # conteggi pre-aggregati per la Panoramica (vedi cubo.py)
+        if stesse_iniziative and stessa_composizione:
+            self.cubo_iniziative = precedente.cubo_iniziative
+        else:
+            self.cubo_iniziative = CuboIniziative(df_iniziative, df_composizione)
+
+        # aggregazioni delle callback e degli indici (vedi interrogazioni.py): in memoria
+        # sui fogli, oppure su un database DuckDB/SQLite costruito per questa impronta
+        tabelle = {FOGLI[FOGLIO_INIZIATIVE]: df_iniziative, FOGLI[FOGLIO_COMPOSIZIONE]: df_composizione}
+        if BACKEND == "pandas":
+            self.interrogazioni = BackendPandas(tabelle, motori={
+                FOGLI[FOGLIO_INIZIATIVE]: self.motore_iniziative,
+                FOGLI[FOGLIO_COMPOSIZIONE]: self.motore_composizione,
+            }, cubo=self.cubo_iniziative)
+        elif precedente is not None and precedente.impronta == self.impronta:
+            self.interrogazioni = precedente.interrogazioni
+        else:
+            self.interrogazioni = apri_database(BACKEND, tabelle, {
+                FOGLI[FOGLIO_INIZIATIVE]: COLONNE_FILTRO_INIZIATIVE,
+                FOGLI[FOGLIO_COMPOSIZIONE]: COLONNE_FILTRO_COMPOSIZIONE,
+            }, percorso, cartella, self.impronta)
+
+        # sorgenti dei dati: i filtri per sorgente compaiono solo se sono più di una
+        self.sorgenti = list(self.cubo_iniziative.categorie[COLONNA_SORGENTE])
+        self.piu_sorgenti = len(self.sorgenti) > 1
+
+        # colonne mostrate nelle tabelle (e negli export) delle due sezioni
+        nascoste = set() if self.piu_sorgenti else {COLONNA_SORGENTE}
+        self.colonne_tabella_iniziative = [col for col in df_iniziative.columns if col not in nascoste]
+        self.colonne_tabella_genere = [
+            col for col in df_composizione.columns if col not in nascoste | {"Linguaggio inclusivo"}
+        ]
+
+        # risultati derivati calcolati su richiesta nel processo corrente: spariscono
+        # insieme alla versione, quindi non vanno mai invalidati
+        self.cache_locale = {}
+
+    # Fogli in memoria con la loro impronta, nel formato atteso da carica_dati
+    def fogli(self):
+        return {
+            FOGLIO_INIZIATIVE: (self.impronte[FOGLIO_INIZIATIVE], self.df_iniziative),
+            FOGLIO_COMPOSIZIONE: (self.impronte[FOGLIO_COMPOSIZIONE], self.df_composizione),
+        }
+
+    def stato(self):
+        return {"impronta": self.impronta, "caricata": self.caricata}
+
+
+# --- Ricarica a caldo del workbook ---
+# Un thread per processo controlla ogni INTERVALLO_RICARICA secondi la data di modifica
+# del workbook; se cambia rilegge solo i fogli la cui impronta è cambiata (vedi
+# dati.carica_dati) e sostituisce `corrente` con una nuova VersioneDati. La sostituzione è
+# un semplice assegnamento: le callback in corso finiscono sulla versione che avevano letto.
+# Con un dataset partizionato (DASHBOARD_DATASET) si controlla la cartella del dataset, la
+# cui data di modifica cambia quando ingestione.py sostituisce il manifest.
+class GestoreDati:
+    def __init__(self, percorso=CARTELLA_DATASET or FILE_EXCEL, cartella=CARTELLA_SNAPSHOT):
+        self.percorso = percorso
+        self.cartella = cartella
+        self._lock = threading.Lock()
+        self._lock_osservatore = threading.Lock()
+        self._pid_osservatore = None
+        self._mtime_fallito = None
+        mtime = os.stat(percorso).st_mtime_ns
+        df_iniziative, df_composizione, impronte = carica_dati(percorso, cartella)
+        self.corrente = VersioneDati(df_iniziative, df_composizione, impronte, mtime,
+                                     percorso=percorso, cartella=cartella)
+
+    def _nuova_versione(self, precedente, mtime):
+        df_iniziative, df_composizione, impronte = carica_dati(self.percorso, self.cartella, precedente.fogli())
+        nuovi = {FOGLIO_INIZIATIVE: df_iniziative, FOGLIO_COMPOSIZIONE: df_composizione}
+        for foglio, (_, vecchio) in precedente.fogli().items():
+            nuovo = nuovi[foglio]
+            if nuovo is vecchio:
+                continue
+            if nuovo.equals(vecchio):
+                # riletto ma identico (ad esempio è cambiato solo l'altro foglio): si tiene
+                # il vecchio, così restano validi gli indici costruiti su di esso
+                nuovi[foglio] = vecchio
+                continue
+            aggiunte, rimosse = differenze_righe(vecchio, nuovo)
+            if aggiunte or rimosse:
+                logger.info("Foglio %s: %d righe aggiunte, %d rimosse", FOGLI[foglio], aggiunte, rimosse)
+        return VersioneDati(nuovi[FOGLIO_INIZIATIVE], nuovi[FOGLIO_COMPOSIZIONE], impronte, mtime, precedente,
+                            self.percorso, self.cartella)
+
+    # Ricarica i dati se il workbook è cambiato; restituisce True se la versione è nuova
+    def controlla(self):
+        try:
+            mtime = os.stat(self.percorso).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self.corrente.caricata:
+            return False
+        with self._lock:
+            precedente = self.corrente
+            if mtime == precedente.caricata:
+                return False
+            try:
+                nuova = self._nuova_versione(precedente, mtime)
+            except Exception:
+                # file in scrittura o non valido: si riprova al prossimo controllo
+                if mtime != self._mtime_fallito:
+                    logger.exception("Ricarica di %s non riuscita, restano i dati %s",
+                                     self.percorso, precedente.impronta)
+                self._mtime_fallito = mtime
+                return False
+            self.corrente = nuova
+        if nuova.impronta == precedente.impronta:
+            logger.info("Workbook salvato di nuovo ma senza modifiche ai fogli")
+            return False
+        logger.info("Dati aggiornati: versione %s (era %s)", nuova.impronta, precedente.impronta)
+        return True
+
+    def _osserva(self):
+        evento = threading.Event()
+        while not evento.wait(INTERVALLO_RICARICA):
+            self.controlla()
+
+    # Avvia il thread di controllo nel processo corrente. Va chiamata dopo il fork
+    # (i thread non passano ai worker gunicorn): si può chiamare a ogni richiesta.
+    def avvia(self):
+        if not INTERVALLO_RICARICA or self._pid_osservatore == os.getpid():
+            return
+        with self._lock_osservatore:
+            if self._pid_osservatore == os.getpid():
+                return
+            self._pid_osservatore = os.getpid()
+        threading.Thread(target=self._osserva, name="ricarica-workbook", daemon=True).start()
@@ -0,0 +1,115 @@
+import math
+
+import pandas as pd
+
+# --- Paginazione, ordinamento e filtro lato server per le DataTable ---
+# Le tabelle usano page_action/sort_action/filter_action="custom": il browser riceve
+# solo la pagina visibile, costruita qui a partire dal DataFrame già filtrato dai dropdown.
+
+# Operatori della sintassi filter_query di Dash (i simbolici sono alias dei testuali)
+OPERATORI = [
+    ["ge ", ">="],
+    ["le ", "<="],
+    ["lt ", "<"],
+    ["gt ", ">"],
+    ["ne ", "!="],
+    ["eq ", "="],
+    ["contains "],
+    ["datestartswith "],
+]
+
+
+# Il nome della colonna va dalla "{" alla "}" che la chiude e l'operatore deve seguirlo
+# subito: cercato in tutta la parte, "le " troverebbe "{Percentuale donne}"
+def _dividi_parte_filtro(parte):
+    inizio = parte.find("{")
+    fine = parte.find("}", inizio + 1)
+    if inizio < 0 or fine < 0:
+        return None, None, None
+    nome = parte[inizio + 1:fine]
+    resto = parte[fine + 1:].lstrip()
+    for tipo in OPERATORI:
+        for operatore in tipo:
+            if resto.startswith(operatore):
+                parte_valore = resto[len(operatore):].strip()
+                if not parte_valore:
+                    return None, None, None
+                v0 = parte_valore[0]
+                if v0 == parte_valore[-1] and v0 in ("'", '"', "`") and len(parte_valore) > 1:
+                    valore = parte_valore[1:-1].replace("\\" + v0, v0)
+                elif tipo[0] in ("contains ", "datestartswith "):
+                    # operatori sul testo: il valore resta come digitato ("20", non "20.0")
+                    valore = parte_valore
+                else:
+                    try:
+                        valore = float(parte_valore)
+                    except ValueError:
+                        valore = parte_valore
+                return nome, tipo[0].strip(), valore
+    return None, None, None
+
+
+def applica_filter_query(df, filter_query):
+    if not filter_query:
+        return df
+    maschera = None
+    for parte in filter_query.split(" && "):
+        nome, operatore, valore = _dividi_parte_filtro(parte)
+        if nome not in df.columns:
+            continue
+        colonna = df[nome]
+        if isinstance(colonna.dtype, pd.CategoricalDtype):
+            # le category non ordinate ammettono solo l'uguaglianza: si confrontano i valori
+            colonna = colonna.astype(colonna.cat.categories.dtype)
+        if operatore in ("eq", "ne", "lt", "le", "gt", "ge"):
+            numerica = colonna.dtype.kind in "iufb"
+            if isinstance(valore, float) and not numerica:
+                # numero digitato in una colonna testuale: confronto sul testo
+                colonna = colonna.astype(str)
+                valore = f"{valore:g}"
+            elif isinstance(valore, str) and numerica:
+                # numero tra virgolette in una colonna numerica: confronto sul numero
+                try:
+                    valore = float(valore)
+                except ValueError:
+                    pass
+            try:
+                condizione = getattr(colonna, operatore)(valore)
+            except TypeError:
+                # valore non confrontabile con la colonna (es. testo in una colonna numerica):
+                # mai uguale, quindi solo "ne" è vera
+                condizione = pd.Series(operatore == "ne", index=colonna.index)
+        elif operatore == "contains":
+            condizione = colonna.astype(str).str.contains(str(valore), case=False, regex=False, na=False)
+        elif operatore == "datestartswith":
+            condizione = colonna.astype(str).str.startswith(str(valore), na=False)
+        else:
+            continue
+        maschera = condizione if maschera is None else maschera & condizione
+    return df if maschera is None else df[maschera.fillna(False)]
+
+
+def applica_sort_by(df, sort_by):
+    colonne = [s for s in sort_by or [] if s["column_id"] in df.columns]
+    if not colonne:
+        return df
+    return df.sort_values(
+        [s["column_id"] for s in colonne],
+        ascending=[s["direction"] == "asc" for s in colonne],
+        kind="stable",
+    )
+
+
+# Restituisce i record della pagina richiesta, il numero di pagine e la pagina effettiva
+# (riportata nell'intervallo valido se i filtri hanno ridotto le righe)
+def pagina_tabella(df, page_current, page_size, sort_by=None, filter_query="", colonne=None):
+    df = applica_filter_query(df, filter_query)
+    page_count = max(1, math.ceil(len(df) / page_size))
+    page_current = min(page_current or 0, page_count - 1)
+
+    df = applica_sort_by(df, sort_by)
+    inizio = page_current * page_size
+    pagina = df.iloc[inizio:inizio + page_size]
+    if colonne is not None:
+        pagina = pagina[colonne]
+    return pagina.to_dict("records"), page_count, page_current